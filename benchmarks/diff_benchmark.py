@@ -0,0 +1,121 @@
+"""
+Throughput of DictDiff.find_diff, against the recursive implementation it replaced.
+
+Usage:
+
+    python benchmarks/diff_benchmark.py
+
+"""
+import multiprocessing
+import random
+import sys
+import timeit
+
+from traceable_dict import DictDiff, DigestCache
+from traceable_dict._utils import key_added, key_removed, key_updated, root
+
+
+def recursive_find_diff(t1, t2, path=[root]):
+    t1_keys = set(t1.keys())
+    t2_keys = set(t2.keys())
+
+    t_keys_intersect = t2_keys.intersection(t1_keys)
+
+    t_keys_added = t2_keys - t_keys_intersect
+    t_keys_removed = t1_keys - t_keys_intersect
+
+    updates = []
+    for k in t_keys_intersect:
+
+        curr_path = path[:]
+        curr_path.append(k)
+
+        if (not isinstance(t1[k], dict)) and (not isinstance(t2[k], dict)):
+            if (t1[k] != t2[k]):
+                updates.append((tuple(curr_path), t1[k], key_updated))
+        else:
+            updates.extend(recursive_find_diff(t1[k], t2[k], curr_path))
+
+    for k in t_keys_added:
+        for leaf_path, val in DictDiff._traversal(t2[k]):
+            updates.append((tuple(path + [k] + leaf_path), None, key_added))
+
+    for k in t_keys_removed:
+        for leaf_path, val in DictDiff._traversal(t1[k]):
+            updates.append((tuple(path + [k] + leaf_path), val, key_removed))
+
+    return updates
+
+
+def wide_tree(width, depth, seed):
+    rand = random.Random(seed)
+
+    def _tree(level):
+        if level == depth:
+            return dict(('k%d' % i, rand.randint(0, 10)) for i in xrange(width))
+        return dict(('k%d' % i, _tree(level + 1)) for i in xrange(width))
+    return _tree(0)
+
+
+def deep_tree(depth, seed):
+    rand = random.Random(seed)
+
+    t = node = {}
+    for level in xrange(depth):
+        node['leaf'] = rand.randint(0, 10)
+        node['next'] = {}
+        node = node['next']
+    return t
+
+
+def run(name, t1, t2, number, digests=None):
+    assert DictDiff.find_diff(t1, t2, digests=digests) == recursive_find_diff(t1, t2)
+
+    iterative = min(timeit.repeat(lambda: DictDiff.find_diff(t1, t2, digests=digests), number=number, repeat=3))
+    recursive = min(timeit.repeat(lambda: recursive_find_diff(t1, t2), number=number, repeat=3))
+    print '%-28s recursive: %8.2f ms   iterative: %8.2f ms   speedup: %.2fx' % (
+        name, 1000 * recursive / number, 1000 * iterative / number, recursive / iterative)
+
+
+def run_parallel(name, t1, t2, number, workers):
+    pool = multiprocessing.Pool(workers)
+    try:
+        assert DictDiff.find_diff(t1, t2, workers=pool, parallel_threshold=0) == DictDiff.find_diff(t1, t2)
+
+        parallel = min(timeit.repeat(
+            lambda: DictDiff.find_diff(t1, t2, workers=pool, parallel_threshold=0), number=number, repeat=3))
+        serial = min(timeit.repeat(lambda: DictDiff.find_diff(t1, t2), number=number, repeat=3))
+    finally:
+        pool.close()
+        pool.join()
+    print '%-28s serial: %8.2f ms   %d workers: %8.2f ms   speedup: %.2fx' % (
+        name, 1000 * serial / number, workers, 1000 * parallel / number, serial / parallel)
+
+
+def _raises(func, *args):
+    try:
+        func(*args)
+    except RuntimeError:
+        return True
+    return False
+
+
+if __name__ == '__main__':
+    run('wide (10^4 leaves)', wide_tree(100, 1, 1), wide_tree(100, 1, 2), 20)
+    run('wide and nested (10^5)', wide_tree(10, 4, 1), wide_tree(10, 4, 2), 5)
+    run('deep (depth 500)', deep_tree(500, 1), deep_tree(500, 2), 20)
+
+    depth = sys.getrecursionlimit() + 1000
+    t1, t2 = deep_tree(depth, 1), deep_tree(depth, 2)
+    print '%-28s iterative: %d events   recursive: %s' % (
+        'deep (depth %d)' % depth, len(DictDiff.find_diff(t1, t2)),
+        'RuntimeError' if _raises(recursive_find_diff, t1, t2) else 'ok')
+
+    # an unchanged branch of 10^4 leaves, next to a changed one, with warm digests
+    t1 = {'unchanged': wide_tree(100, 1, 1), 'changed': wide_tree(10, 1, 1)}
+    t2 = {'unchanged': wide_tree(100, 1, 1), 'changed': wide_tree(10, 1, 2)}
+    run('unchanged branch, digests', t1, t2, 20, digests=DigestCache())
+
+    # top-level keys holding large nested dicts, compared across a process pool
+    workers = multiprocessing.cpu_count()
+    run_parallel('wide and nested (10^6)', wide_tree(100, 2, 1), wide_tree(100, 2, 2), 1, workers)
@@ -0,0 +1,71 @@
+"""
+Size and speed of TraceableDict.to_bytes and from_bytes, against pickle and JSON.
+
+Pickle is measured both on the traceable dict itself, which restores the traceable dict and its settings, and on the
+traceable dict as a plain dict, including its trace, like JSON (both with the highest protocol). JSON turns the tuple
+paths of the trace into lists, so it does not round-trip, and is measured for reference only.
+
+Usage:
+
+    python benchmarks/serialization_benchmark.py
+
+"""
+import cPickle
+import json
+import random
+import timeit
+
+from traceable_dict import TraceableDict
+
+
+def history(keys, revisions, changes, seed):
+    rand = random.Random(seed)
+
+    td = TraceableDict(dict(
+        ('service_%d' % i, {'limits': {'qps': rand.randint(0, 1000), 'burst': rand.randint(0, 100)}, 'owner': 'team_%d' % i})
+        for i in xrange(keys)))
+    td.commit(revision=1)
+
+    tracked = td.tracked()
+    for revision in xrange(2, revisions + 2):
+        for _ in xrange(changes):
+            service = 'service_%d' % rand.randint(0, keys - 1)
+            tracked[service]['limits']['qps'] = rand.randint(0, 1000)
+        td.commit(revision=revision)
+    return td
+
+
+def run(name, td, number):
+    d = dict(td)
+
+    assert TraceableDict.from_bytes(td.to_bytes()) == td
+    data = {
+        'to_bytes': td.to_bytes(),
+        'pickle': cPickle.dumps(td, cPickle.HIGHEST_PROTOCOL),
+        'pickle dict': cPickle.dumps(d, cPickle.HIGHEST_PROTOCOL),
+        'json': json.dumps(d)
+    }
+    dump = {
+        'to_bytes': lambda: td.to_bytes(),
+        'pickle': lambda: cPickle.dumps(td, cPickle.HIGHEST_PROTOCOL),
+        'pickle dict': lambda: cPickle.dumps(d, cPickle.HIGHEST_PROTOCOL),
+        'json': lambda: json.dumps(d)
+    }
+    load = {
+        'to_bytes': lambda: TraceableDict.from_bytes(data['to_bytes']),
+        'pickle': lambda: cPickle.loads(data['pickle']),
+        'pickle dict': lambda: cPickle.loads(data['pickle dict']),
+        'json': lambda: json.loads(data['json'])
+    }
+
+    print name
+    for fmt in ['to_bytes', 'pickle', 'pickle dict', 'json']:
+        dump_time = min(timeit.repeat(dump[fmt], number=number, repeat=3)) / number
+        load_time = min(timeit.repeat(load[fmt], number=number, repeat=3)) / number
+        print '    %-12s size: %9d bytes   dump: %8.2f ms   load: %8.2f ms' % (
+            fmt, len(data[fmt]), 1000 * dump_time, 1000 * load_time)
+
+
+if __name__ == '__main__':
+    run('small tree, long history (100 keys, 1000 revisions)', history(100, 1000, 3, 1), 3)
+    run('large tree, short history (10^4 keys, 10 revisions)', history(10000, 10, 100, 2), 3)
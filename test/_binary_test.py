@@ -0,0 +1,126 @@
+import unittest
+
+from traceable_dict._binary import dumps, loads, _Reader, _Writer
+from traceable_dict._event import Event
+from traceable_dict._utils import key_removed, key_added, key_updated, root, uncommitted
+
+
+_options = {
+    'uncommitted': False, 'compact_events': False, 'array_events': False, 'digests': False,
+    'keyframe_every_revisions': None, 'keyframe_every_events': None, 'retention': None
+}
+
+
+def _roundtrip(value, allow_pickle=False):
+    writer = _Writer(allow_pickle)
+    writer.value(value)
+    return _Reader(writer.getvalue(), allow_pickle).value()
+
+
+class ValueEncodingTest(unittest.TestCase):
+
+    def test_leaves(self):
+        for value in [None, True, False, 0, 1, -1, 2 ** 62, -2 ** 63, 10 ** 40, -10 ** 40, 5L,
+                      1.5, -0.0, float('inf'), '', 'value', '\x00\xff', u'', u'\u05e9', ()]:
+            decoded = _roundtrip(value)
+            self.assertEquals(decoded, value)
+            self.assertEquals(type(decoded), type(value))
+
+    def test_containers(self):
+        value = {
+            'a': [1, (2, 3), {'b': None}],
+            1: {(1, 'x'): [], 2.5: {}},
+            u'c': ((), [[]], {'d': {'e': 'f'}})
+        }
+        self.assertEquals(_roundtrip(value), value)
+        self.assertEquals(type(_roundtrip(value)['a'][1]), tuple)
+
+    def test_pickled_leaves(self):
+        value = {'set': set([1, 2]), 'frozenset': frozenset(['a'])}
+        self.assertEquals(_roundtrip(value, allow_pickle=True), value)
+
+        with self.assertRaises(TypeError) as err:
+            _roundtrip([set([1])])
+        self.assertTrue("cannot encode a value of type set without allow_pickle" in err.exception)
+
+        writer = _Writer(allow_pickle=True)
+        writer.value([value])
+        with self.assertRaises(ValueError) as err:
+            _Reader(writer.getvalue()).value()
+        self.assertTrue("cannot decode a pickled value without allow_pickle" in err.exception)
+
+    def test_deep(self):
+        value = node = {}
+        for _ in xrange(5000):
+            node['next'] = node = {}
+        node['leaf'] = [1]
+
+        decoded = _roundtrip(value)
+        for _ in xrange(5000):
+            decoded = decoded['next']
+        self.assertEquals(decoded, {'leaf': [1]})
+
+    def test_varint(self):
+        writer = _Writer()
+        for n in [0, 1, 127, 128, 300, 2 ** 64]:
+            writer.varint(n)
+        data = writer.getvalue()
+        self.assertEquals(data[:5], '\x00\x01\x7f\x80\x01')
+
+        reader = _Reader(data)
+        self.assertEquals([reader.varint() for _ in range(6)], [0, 1, 127, 128, 300, 2 ** 64])
+
+
+class BinaryFormatTest(unittest.TestCase):
+
+    def setUp(self):
+        self._trace = {
+            '2': [((root, 'a', 'b'), 1, key_updated), ((root, 'c'), None, key_added)],
+            '-1': [((root, 'a', 'b'), 0, key_updated)],
+            uncommitted: [((root, 'a'), {'b': 2}, key_removed)]
+        }
+
+    def test_roundtrip(self):
+        data = dumps({'x': 1}, [-5, -1, 2], self._trace, {'-1': {'x': 0}}, _options)
+
+        tree, revisions, trace, keyframes, options, paths = loads(data)
+        self.assertEquals(tree, {'x': 1})
+        self.assertEquals(revisions, [-5, -1, 2])
+        self.assertEquals(trace, self._trace)
+        self.assertEquals(keyframes, {'-1': {'x': 0}})
+        self.assertEquals(options, _options)
+        self.assertEquals(sorted(paths), [(root, 'a'), (root, 'a', 'b'), (root, 'c')])
+        self.assertTrue(trace['2'][0][0] is trace['-1'][0][0])
+
+    def test_paths_stored_once(self):
+        trace = {'2': [((root, 'long_key_name', 'nested_key_name'), i, key_updated) for i in range(100)]}
+        data = dumps({}, [1, 2], trace, {}, _options)
+        self.assertEquals(data.count('long_key_name'), 1)
+
+    def test_compact_events(self):
+        options = dict(_options, compact_events=True)
+        trace = {'2': [Event((root, 'a'), 1, 2)]}
+
+        _, _, trace, _, _, _ = loads(dumps({}, [1, 2], trace, {}, options))
+        self.assertTrue(isinstance(trace['2'][0], Event))
+        self.assertEquals(trace['2'], [((root, 'a'), 1, key_updated)])
+
+    def test_invalid(self):
+        data = dumps({'x': 1}, [1, 2], self._trace, {}, _options)
+
+        for invalid in ['', 'TDB', 'XYZ\x01' + data[4:]]:
+            with self.assertRaises(ValueError) as err:
+                loads(invalid)
+            self.assertTrue("not a traceable dict binary" in err.exception)
+
+        with self.assertRaises(ValueError) as err:
+            loads('TDB\x02' + data[4:])
+        self.assertTrue("unsupported traceable dict binary version 2" in err.exception)
+
+        with self.assertRaises(ValueError) as err:
+            loads(data[:-3])
+        self.assertTrue("truncated traceable dict binary" in err.exception)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,12 @@
 import unittest
 
+from copy import deepcopy
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from traceable_dict import DictDiff
 from traceable_dict._utils import key_removed, key_added, key_updated, root
 
@@ -191,6 +198,226 @@ class DiffTest(unittest.TestCase):
             "'str' object has no attribute 'keys'",
             str(e.exception))
 
+    def test_diff_order(self):
+        d1 = {'a': {'b': 1, 'c': {'d': 2, 'e': 3}}, 'f': 4, 'g': {'h': {'i': 5}}, 'j': 6}
+        d2 = {'a': {'b': 10, 'c': {'d': 2, 'x': {'y': 7}}}, 'f': 40, 'k': {'l': 8, 'm': {'n': 9}}, 'j': 6}
+
+        # the events of each nested dict are ordered by: shared keys (descending into nested dicts),
+        # then added keys, then removed keys
+        expected = []
+        for k in set(d2).intersection(set(d1)):
+            if k == 'a':
+                for k_ in set(d2['a']).intersection(set(d1['a'])):
+                    if k_ == 'b':
+                        expected.append(((root, 'a', 'b'), 1, key_updated))
+                    else:
+                        expected += [((root, 'a', 'c', 'x', 'y'), None, key_added),
+                                     ((root, 'a', 'c', 'e'), 3, key_removed)]
+            elif k == 'f':
+                expected.append(((root, 'f'), 4, key_updated))
+        expected += [((root, 'k', path[0]) + tuple(path[1:]), None, key_added)
+                     for path, _ in DictDiff._traversal(d2['k'])]
+        expected.append(((root, 'g', 'h', 'i'), 5, key_removed))
+
+        self.assertEquals(DictDiff.find_diff(d1, d2), expected)
+
+    def test_diff_deep(self):
+        import sys
+
+        d1, d2 = {}, {}
+        node1, node2 = d1, d2
+        for level in xrange(sys.getrecursionlimit() + 100):
+            node1['leaf'], node2['leaf'] = level, level
+            node1['next'], node2['next'] = {}, {}
+            node1, node2 = node1['next'], node2['next']
+        node1['leaf'], node2['leaf'] = 'old', 'new'
+
+        res = DictDiff.find_diff(d1, d2)
+        self.assertEquals(len(res), 1)
+        self.assertEquals(res[0][0][-1], 'leaf')
+        self.assertEquals(len(res[0][0]), sys.getrecursionlimit() + 102)
+        self.assertEquals(res[0][1:], ('old', key_updated))
+
+        del node2['leaf']
+        res = DictDiff.find_diff(d1, d2)
+        self.assertEquals(res[0][1:], ('old', key_removed))
+
+
+    def test_iter_diff(self):
+        import types
+
+        res = DictDiff.iter_diff(self._d1, self._d2)
+        self.assertTrue(isinstance(res, types.GeneratorType))
+        self.assertEquals(list(res), DictDiff.find_diff(self._d1, self._d2))
+        self.assertEquals(list(DictDiff.iter_diff(self._d1, self._d1)), [])
+
+        res = DictDiff.iter_diff({'a': 1}, {'a': 2}, path=[root, 'x'])
+        self.assertEquals(list(res), [((root, 'x', 'a'), 1, key_updated)])
+
+    def test_iter_diff_is_lazy(self):
+        d1 = dict(('k%d' % i, {'v': i}) for i in xrange(1000))
+        d2 = dict(('k%d' % i, {'v': -i}) for i in xrange(1000))
+
+        res = DictDiff.iter_diff(d1, d2)
+        path, value, type_ = next(res)
+        self.assertEquals(type_, key_updated)
+
+        # the rest of the dicts is compared only when the updates are consumed
+        for k in d1:
+            d1[k]['v'] = 'changed later'
+        events = list(res)
+        self.assertEquals(len(events), 999)
+        self.assertEquals(set(value for _, value, _ in events), set(['changed later']))
+
+
+class ParallelDiffTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        import random
+
+        rand = random.Random(0)
+        cls._d1 = dict(
+            ('k%d' % i, dict(('n%d' % j, {'v': rand.randint(0, 3)}) for j in xrange(20))) for i in xrange(50))
+        cls._d1.update(('leaf%d' % i, i) for i in xrange(10))
+        cls._d1['removed'] = {'a': {'b': 1}}
+
+        cls._d2 = deepcopy(cls._d1)
+        for i in xrange(50):
+            for j in xrange(20):
+                cls._d2['k%d' % i]['n%d' % j]['v'] = rand.randint(0, 3)
+        cls._d2['k7']['new'] = {'x': 1}
+        del cls._d2['k8']['n3']
+        cls._d2['leaf3'] = 'updated'
+        cls._d2['added'] = {'c': {'d': 2}}
+        del cls._d2['removed']
+        cls._d2['shared'] = cls._d1['shared'] = {'e': 1}
+
+    def setUp(self):
+        from traceable_dict import _diff
+
+        # compare across the workers even on a single CPU
+        self._cpu_count = _diff.multiprocessing.cpu_count
+        _diff.multiprocessing.cpu_count = lambda: 2
+
+    def tearDown(self):
+        from traceable_dict import _diff
+
+        _diff.multiprocessing.cpu_count = self._cpu_count
+
+    def test_same_result(self):
+        serial = DictDiff.find_diff(self._d1, self._d2)
+
+        self.assertEquals(DictDiff.find_diff(self._d1, self._d2, workers=2, parallel_threshold=0), serial)
+        self.assertEquals(DictDiff.find_diff(self._d1, self._d2, workers=2), serial)
+        self.assertEquals(DictDiff.find_diff(self._d1, self._d1, workers=2, parallel_threshold=0), [])
+        self.assertEquals(
+            DictDiff.find_diff(self._d1, self._d2, path=(root, 'x'), workers=2, parallel_threshold=0),
+            DictDiff.find_diff(self._d1, self._d2, path=(root, 'x')))
+
+    def test_pool(self):
+        import multiprocessing
+
+        pool = multiprocessing.Pool(2)
+        try:
+            self.assertEquals(
+                DictDiff.find_diff(self._d1, self._d2, workers=pool, parallel_threshold=0),
+                DictDiff.find_diff(self._d1, self._d2))
+        finally:
+            pool.close()
+            pool.join()
+
+    def test_serial_below_threshold_or_on_single_cpu(self):
+        from traceable_dict import _diff
+
+        Pool = _diff.multiprocessing.Pool
+        pools = []
+
+        def _counting_pool(*args, **kwargs):
+            pools.append(1)
+            return Pool(*args, **kwargs)
+
+        _diff.multiprocessing.Pool = _counting_pool
+        try:
+            res = DictDiff.find_diff(self._d1, self._d2, workers=2, parallel_threshold=51)
+            self.assertEquals(pools, [])
+            self.assertEquals(res, DictDiff.find_diff(self._d1, self._d2))
+
+            DictDiff.find_diff(self._d1, self._d2, workers=2, parallel_threshold=50)
+            self.assertEquals(pools, [1])
+
+            _diff.multiprocessing.cpu_count = lambda: 1
+            DictDiff.find_diff(self._d1, self._d2, workers=2, parallel_threshold=0)
+            self.assertEquals(pools, [1])
+        finally:
+            _diff.multiprocessing.Pool = Pool
+
+    def test_schema_change(self):
+        d = deepcopy(self._d1)
+        d['k3']['n5'] = 'not a dict'
+
+        with self.assertRaises(AttributeError) as e:
+            DictDiff.find_diff(self._d1, d, workers=2, parallel_threshold=0)
+        self.assertEquals("'str' object has no attribute 'keys'", str(e.exception))
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class ArrayDiffTest(unittest.TestCase):
+
+    def setUp(self):
+        self._d1 = {'a': {'w': numpy.arange(10, dtype=float)}, 'b': 1}
+
+    def test_equal_arrays(self):
+        d2 = deepcopy(self._d1)
+        self.assertEquals(DictDiff.find_diff(self._d1, d2), [])
+
+        self._d1['a']['w'][3] = numpy.nan
+        d2['a']['w'][3] = numpy.nan
+        self.assertEquals(DictDiff.find_diff(self._d1, d2), [])
+
+    def test_replaced_array(self):
+        for w in [numpy.arange(10, dtype=int), numpy.arange(11, dtype=float), range(10), 'w']:
+            d2 = deepcopy(self._d1)
+            d2['a']['w'] = w
+
+            res = DictDiff.find_diff(self._d1, d2, array_events=True)
+            self.assertEquals(len(res), 1)
+            self.assertEquals(res[0][0], (root, 'a', 'w'))
+            self.assertTrue(res[0][1] is self._d1['a']['w'])
+            self.assertEquals(res[0][2], key_updated)
+
+        res = DictDiff.find_diff({'w': 'w'}, {'w': numpy.arange(3)})
+        self.assertEquals(res, [((root, 'w'), 'w', key_updated)])
+
+    def test_changed_entries(self):
+        d2 = deepcopy(self._d1)
+        d2['a']['w'][[2, 7]] = -1
+
+        res = DictDiff.find_diff(self._d1, d2)
+        self.assertEquals(len(res), 1)
+        self.assertTrue(res[0][1] is self._d1['a']['w'])
+
+        res = DictDiff.find_diff(self._d1, d2, array_events=True)
+        self.assertEquals(
+            res,
+            [((root, 'a', 'w', (2, )), 2., key_updated), ((root, 'a', 'w', (7, )), 7., key_updated)])
+
+        d2['a']['w'][:6] = -1
+        res = DictDiff.find_diff(self._d1, d2, array_events=True)
+        self.assertEquals(len(res), 1)
+        self.assertEquals(res[0][0], (root, 'a', 'w'))
+
+    def test_multi_dimensional(self):
+        d1 = {'m': numpy.zeros((3, 4))}
+        d2 = deepcopy(d1)
+        d2['m'][1, 2] = 5
+
+        self.assertEquals(
+            DictDiff.find_diff(d1, d2, array_events=True), [((root, 'm', (1, 2)), 0., key_updated)])
+        self.assertEquals(
+            DictDiff.find_diff(d1, d2, array_events=True, workers=2, parallel_threshold=0),
+            DictDiff.find_diff(d1, d2, array_events=True))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,231 @@
+import unittest
+
+from copy import deepcopy
+
+from traceable_dict import DictDiff, DigestCache, MerkleDigests
+from traceable_dict._utils import key_updated, root
+
+
+class DigestCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self._d1 = {'a': {'b': 1, 'c': {'d': [1, 'x', (2.5, None)]}}, 'e': u'f', 1: True}
+
+    def test_equal_content(self):
+        digests = DigestCache()
+        digest = digests.digest(self._d1)
+
+        self.assertEquals(len(digest), 40)
+        self.assertEquals(digests.digest(deepcopy(self._d1)), digest)
+        self.assertEquals(DigestCache().digest(deepcopy(self._d1)), digest)
+        self.assertEquals(digests.digest({}), DigestCache().digest({}))
+
+    def test_different_content(self):
+        digests = DigestCache()
+        digest = digests.digest(self._d1)
+
+        for change in [
+                lambda d: d['a'].update({'b': 2}),
+                lambda d: d['a'].update({'b': 1L}),
+                lambda d: d['a'].update({'b': '1'}),
+                lambda d: d['a']['c'].update({'d': [1, 'x']}),
+                lambda d: d['a']['c'].update({'d': (1, 'x', (2.5, None))}),
+                lambda d: d['a'].pop('b'),
+                lambda d: d.update({'1': True}),
+                lambda d: d.update({'a': {'b': 1, 'c': {}}})]:
+            d = deepcopy(self._d1)
+            change(d)
+            self.assertNotEquals(digests.digest(d), digest)
+
+        self.assertNotEquals(digests.digest({'a': 'b,c'}), digests.digest({'a': 'b', ',': 'c'}))
+        self.assertNotEquals(digests.digest({'a': {}}), digests.digest({'a': 'dict:'}))
+
+    def test_undigestable(self):
+        digests = DigestCache()
+
+        self.assertEquals(digests.digest({'a': {'b': object()}}), None)
+        self.assertEquals(digests.digest({'a': {'b': [object()]}}), None)
+        self.assertEquals(digests.digest({'a': float('nan')}), None)
+        self.assertEquals(digests.digest({object(): 1}), None)
+
+    def test_cached(self):
+        digests = DigestCache()
+        d1 = deepcopy(self._d1)
+        digest = digests.digest(d1)
+        self.assertEquals(len(digests), 3)
+
+        combine = digests._combine
+        calls = []
+
+        def _counting_combine(node):
+            calls.append(node)
+            return combine(node)
+
+        digests._combine = _counting_combine
+        self.assertEquals(digests.digest(d1), digest)
+        self.assertEquals(digests.digest(d1['a']['c']), digests.digest({'d': [1, 'x', (2.5, None)]}))
+        self.assertEquals(len(calls), 1)
+
+        d1['a']['b'] = 2
+        self.assertEquals(digests.digest(d1), digest)
+
+        digests.invalidate(d1['a'])
+        digests.invalidate(d1)
+        self.assertNotEquals(digests.digest(d1), digest)
+
+        digests.clear()
+        self.assertEquals(len(digests), 0)
+
+    def test_deep(self):
+        import sys
+
+        d1 = node = {}
+        for level in xrange(sys.getrecursionlimit() + 100):
+            node['next'] = {}
+            node = node['next']
+
+        self.assertEquals(len(DigestCache().digest(d1)), 40)
+
+
+class MerkleDigestsTest(unittest.TestCase):
+
+    def setUp(self):
+        self._d1 = {'a': {'b': 1, 'c': {'d': [1, 'x']}}, 'e': 'f'}
+
+    def test_digest(self):
+        digests = MerkleDigests(deepcopy(self._d1))
+
+        self.assertEquals(digests.digest(), DigestCache().digest(self._d1))
+        self.assertEquals(digests.digest(path=(root, 'a', 'c')), DigestCache().digest(self._d1['a']['c']))
+        self.assertEquals(len(digests), 3)
+
+        with self.assertRaises(KeyError):
+            digests.digest(path=(root, 'x'))
+
+    def test_reserved(self):
+        d1 = deepcopy(self._d1)
+        d1['__reserved__'] = {'x': 1}
+
+        self.assertEquals(MerkleDigests(d1, ['__reserved__']).digest(), MerkleDigests(self._d1).digest())
+        self.assertNotEquals(MerkleDigests(d1).digest(), MerkleDigests(self._d1).digest())
+
+    def test_empty_dicts_are_ignored(self):
+        d1 = deepcopy(self._d1)
+        d1['a']['c']['g'] = {'h': {}}
+
+        self.assertEquals(MerkleDigests(d1).digest(), MerkleDigests(self._d1).digest())
+        self.assertEquals(DictDiff.find_diff(self._d1, d1), [])
+
+    def test_invalidate(self):
+        d1 = deepcopy(self._d1)
+        digests = MerkleDigests(d1)
+        digest = digests.digest()
+
+        d1['a']['c']['d'] = []
+        self.assertEquals(digests.digest(), digest)
+
+        digests.invalidate((root, 'a', 'c', 'd'))
+        self.assertEquals(len(digests), 0)
+        self.assertEquals(digests.digest(), MerkleDigests(deepcopy(d1)).digest())
+        self.assertNotEquals(digests.digest(), digest)
+
+        digests.invalidate((root, 'e'))
+        self.assertEquals(len(digests), 2)
+
+    def test_copy(self):
+        d1 = deepcopy(self._d1)
+        digests = MerkleDigests(d1)
+        digest = digests.digest()
+
+        d2 = dict(d1)
+        digests2 = digests.copy(d2)
+        self.assertEquals(len(digests2), 3)
+
+        d2['e'] = 'g'
+        digests2.invalidate((root, 'e'))
+        self.assertNotEquals(digests2.digest(), digest)
+        self.assertEquals(digests.digest(), digest)
+
+
+class DigestDiffTest(unittest.TestCase):
+
+    def _counting_frames(self, func):
+        calls = []
+        _frame = DictDiff._frame
+
+        def _counting_frame(t1, t2, path):
+            calls.append(path)
+            return _frame(t1, t2, path)
+
+        DictDiff._frame = staticmethod(_counting_frame)
+        try:
+            return func(), calls
+        finally:
+            DictDiff._frame = staticmethod(_frame)
+
+    def test_identical_subtrees_are_skipped(self):
+        shared = dict(('k%d' % i, {'v': i}) for i in xrange(100))
+        d1 = {'shared': shared, 'key': 'old_value'}
+        d2 = {'shared': shared, 'key': 'new_value'}
+
+        res, calls = self._counting_frames(lambda: DictDiff.find_diff(d1, d2))
+        self.assertEquals(res, [((root, 'key'), 'old_value', key_updated)])
+        self.assertEquals(calls, [(root, )])
+
+        self.assertEquals(DictDiff.find_diff(d1, d1), [])
+
+    def test_equal_digests_are_skipped(self):
+        digests = DigestCache()
+        d1 = {'same': dict(('k%d' % i, {'v': i}) for i in xrange(100)), 'changed': {'v': 1}}
+        d2 = deepcopy(d1)
+        d2['changed']['v'] = 2
+
+        res, calls = self._counting_frames(lambda: DictDiff.find_diff(d1, d2, digests=digests))
+        self.assertEquals(res, [((root, 'changed', 'v'), 1, key_updated)])
+        self.assertEquals(sorted(calls), [(root, ), (root, 'changed')])
+
+        res, calls = self._counting_frames(lambda: DictDiff.find_diff(d1, d2))
+        self.assertEquals(res, [((root, 'changed', 'v'), 1, key_updated)])
+        self.assertEquals(len(calls), 103)
+
+    def test_same_result(self):
+        d1 = {'a': {'b': 1, 'c': {'d': [1, 2]}, 'x': {'y': object()}}, 'e': {'f': 1}}
+        d2 = deepcopy(d1)
+        d2['a']['c']['d'] = [1, 2, 3]
+        d2['a']['x']['y'] = 'replaced'
+        d2['e'] = {'g': 1}
+        d2['h'] = {'i': 1}
+
+        self.assertEquals(
+            DictDiff.find_diff(d1, d2, digests=DigestCache()),
+            DictDiff.find_diff(d1, d2))
+
+    def test_pair_of_providers(self):
+        d1 = {'same': dict(('k%d' % i, {'v': i}) for i in xrange(100)), 'changed': {'v': 1}}
+        d2 = deepcopy(d1)
+        d2['changed']['v'] = 2
+
+        digests = (MerkleDigests(d1), MerkleDigests(d2))
+        res, calls = self._counting_frames(lambda: DictDiff.find_diff(d1, d2, digests=digests))
+        self.assertEquals(res, [((root, 'changed', 'v'), 1, key_updated)])
+        self.assertEquals(sorted(calls), [(root, ), (root, 'changed')])
+
+        d2['changed']['v'] = 1
+        digests[1].invalidate((root, 'changed', 'v'))
+        res, calls = self._counting_frames(lambda: DictDiff.find_diff(d1, d2, digests=digests))
+        self.assertEquals(res, [])
+        self.assertEquals(calls, [])
+
+    def test_single_merkle_digests(self):
+        d1 = {'a': {'b': 1}, 'c': {'d': 2}}
+        d2 = {'a': {'b': 10}, 'c': {'d': 2}}
+
+        digests = MerkleDigests(d1)
+        self.assertEquals(digests.digest(d2, (root, )), None)
+        self.assertEquals(digests.digest(d2['a'], (root, 'a')), None)
+        for digests in [MerkleDigests(d1), MerkleDigests(d2)]:
+            self.assertEquals(DictDiff.find_diff(d1, d2, digests=digests), [((root, 'a', 'b'), 1, key_updated)])
+
+
+if __name__ == '__main__':
+    unittest.main()
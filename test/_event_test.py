@@ -0,0 +1,74 @@
+import unittest
+
+import pickle
+
+from copy import deepcopy
+
+from traceable_dict._event import Event, event_codes, event_types, to_events, to_tuples
+from traceable_dict._utils import key_removed, key_added, key_updated, root
+
+
+class EventTest(unittest.TestCase):
+
+    def setUp(self):
+        self._events = [
+            ((root, 'a', 'b'), None, key_added),
+            ((root, 'a', 'c'), {'d': [1]}, key_removed),
+            ((root, 'e'), 1, key_updated)]
+
+    def test_codes(self):
+        self.assertEquals(event_types, (key_added, key_removed, key_updated))
+        for code, type_ in enumerate(event_types):
+            self.assertEquals(event_codes[type_], code)
+
+    def test_tuple_compatible(self):
+        for event_tuple in self._events:
+            event = Event.from_tuple(event_tuple)
+
+            self.assertEquals(event.code, event_codes[event_tuple[2]])
+            self.assertEquals(event.type, event_tuple[2])
+            self.assertEquals(event.to_tuple(), event_tuple)
+            self.assertEquals(tuple(event), event_tuple)
+            self.assertEquals(len(event), 3)
+            self.assertEquals([event[0], event[1], event[2]], list(event_tuple))
+            self.assertEquals(repr(event), repr(event_tuple))
+
+            self.assertTrue(event == event_tuple)
+            self.assertTrue(event_tuple == event)
+            self.assertFalse(event != event_tuple)
+            self.assertEquals(event, Event.from_tuple(event_tuple))
+
+        self.assertNotEquals(Event.from_tuple(self._events[0]), self._events[1])
+        self.assertNotEquals(Event.from_tuple(self._events[0]), Event.from_tuple(self._events[1]))
+        self.assertNotEquals(Event.from_tuple(self._events[0]), list(self._events[0]))
+        self.assertEquals(hash(Event.from_tuple(self._events[2])), hash(self._events[2]))
+
+    def test_slots(self):
+        event = Event.from_tuple(self._events[0])
+        with self.assertRaises(AttributeError):
+            event.other = 1
+
+    def test_converters(self):
+        events = to_events(self._events)
+        self.assertTrue(all(isinstance(event, Event) for event in events))
+        self.assertEquals(events, self._events)
+        self.assertEquals(to_events(events), events)
+
+        tuples = to_tuples(events)
+        self.assertTrue(all(type(event) is tuple for event in tuples))
+        self.assertEquals(tuples, self._events)
+        self.assertEquals(to_tuples(self._events), self._events)
+
+    def test_copy(self):
+        events = to_events(self._events)
+
+        for protocol in [0, 2]:
+            self.assertEquals(pickle.loads(pickle.dumps(events, protocol)), self._events)
+
+        copied = deepcopy(events)
+        self.assertEquals(copied, self._events)
+        self.assertFalse(copied[1].value is events[1].value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+from traceable_dict._index import TraceIndex
+from traceable_dict._utils import key_removed, key_added, key_updated, root, uncommitted
+
+
+class TraceIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self._index = TraceIndex()
+        self._index.add('1', [
+            ((root, 'a', 'b'), 1, key_updated),
+            ((root, 'c'), None, key_added),
+            ((root, 'a', 'd', 'e'), 2, key_removed)])
+
+    def test_find(self):
+        self.assertEquals(self._index.find(('a', )), {'1': [0, 2]})
+        self.assertEquals(self._index.find(('a', 'b')), {'1': [0]})
+        self.assertEquals(self._index.find(('a', 'd', 'e')), {'1': [2]})
+        self.assertEquals(self._index.find(('c', )), {'1': [1]})
+        self.assertEquals(self._index.find(('c', 'x')), {})
+        self.assertEquals(self._index.find(('x', )), {})
+
+    def test_incremental_add(self):
+        events = [((root, 'a', 'b'), 1, key_updated)]
+        self._index.add(uncommitted, events)
+
+        events.append(((root, 'a', 'f'), None, key_added))
+        self._index.add(uncommitted, events, start=1)
+
+        self.assertEquals(self._index.find(('a', )), {'1': [0, 2], uncommitted: [0, 1]})
+        self.assertEquals(self._index.find(('a', 'f')), {uncommitted: [1]})
+
+    def test_rename(self):
+        self._index.add(uncommitted, [((root, 'a', 'b'), 1, key_updated)])
+        self._index.rename(uncommitted, '2')
+
+        self.assertEquals(self._index.find(('a', 'b')), {'1': [0], '2': [0]})
+
+    def test_remove(self):
+        self._index.add('2', [((root, 'c'), 1, key_updated)])
+        self._index.remove('1')
+
+        self.assertEquals(self._index.find(('a', )), {})
+        self.assertEquals(self._index.find(('c', )), {'2': [0]})
+
+        self._index.remove('1')
+
+
+if __name__ == '__main__':
+    unittest.main()
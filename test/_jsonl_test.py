@@ -0,0 +1,113 @@
+import json
+import unittest
+
+from traceable_dict._jsonl import encode, decode, dump_header, dump_revision, load_header, load_revision
+from traceable_dict._utils import key_removed, key_added, key_updated, root
+
+
+def _roundtrip(value, allow_pickle=False):
+    return decode(json.loads(json.dumps(encode(value, allow_pickle))), allow_pickle)
+
+
+class ValueEncodingTest(unittest.TestCase):
+
+    def test_leaves(self):
+        for value in [None, True, False, 0, 1, -1, 10 ** 40, 1.5, -0.0, '', 'value', u'', u'value', u'\u05e9', '\xd7\xa9']:
+            decoded = _roundtrip(value)
+            self.assertEquals(decoded, value)
+            self.assertEquals(type(decoded), type(value))
+
+    def test_special_floats(self):
+        self.assertEquals(_roundtrip(float('inf')), float('inf'))
+        self.assertEquals(_roundtrip(float('-inf')), float('-inf'))
+        nan = _roundtrip(float('nan'))
+        self.assertTrue(nan != nan)
+        self.assertTrue('NaN' not in json.dumps(encode(float('nan'))))
+
+    def test_bytes(self):
+        self.assertEquals(_roundtrip('\x00\xff'), '\x00\xff')
+        self.assertEquals(type(_roundtrip('\x00\xff')), str)
+
+    def test_tuples(self):
+        value = [(1, 2), ((), ('a', (3, )))]
+        decoded = _roundtrip(value)
+        self.assertEquals(decoded, value)
+        self.assertEquals(type(decoded[0]), tuple)
+        self.assertEquals(type(decoded[1][1][1]), tuple)
+
+    def test_dicts(self):
+        value = {
+            'a': {'b': [1, {'c': None}]},
+            'd': {1: 'one', (1, 'x'): {2.5: []}, None: True},
+            'e': {u'f': 1, u'\u05e9': 2}
+        }
+        decoded = _roundtrip(value)
+        self.assertEquals(decoded, value)
+        self.assertEquals(encode(value['a']), {'b': [1, {'c': None}]})
+        self.assertTrue(1 in decoded['d'] and '1' not in decoded['d'])
+
+    def test_tag_keys(self):
+        value = {'__tuple__': [1, 2]}
+        self.assertEquals(_roundtrip(value), value)
+        self.assertEquals(_roundtrip({'__pickle__': 'x', 'y': 1}), {'__pickle__': 'x', 'y': 1})
+
+    def test_pickled_leaves(self):
+        value = {'set': set([1, 2]), 'frozenset': frozenset(['a'])}
+        self.assertEquals(_roundtrip(value, allow_pickle=True), value)
+
+        with self.assertRaises(TypeError) as err:
+            encode(value)
+        self.assertTrue("cannot encode a value of type set without allow_pickle" in err.exception)
+
+        with self.assertRaises(ValueError) as err:
+            decode(encode([value], allow_pickle=True))
+        self.assertTrue("cannot decode a pickled value without allow_pickle" in err.exception)
+
+
+class LinesTest(unittest.TestCase):
+
+    def test_header(self):
+        options = {'uncommitted': False, 'retention': (3, None, None, None)}
+        line = dump_header(1, {'a': (1, 2)}, None, options)
+        self.assertTrue(line.endswith('\n') and '\n' not in line[:-1])
+        self.assertEquals(load_header(line), (1, {'a': (1, 2)}, None, options))
+
+    def test_revision(self):
+        events = [
+            ((root, 'a', 1), 'old', key_updated),
+            ((root, (1, 2)), None, key_added),
+            ((root, 'b'), {'c': 1}, key_removed)
+        ]
+        line = dump_revision(5, events, {'a': {1: 'new'}})
+        self.assertTrue(line.endswith('\n') and '\n' not in line[:-1])
+
+        revision, loaded, keyframe = load_revision(line)
+        self.assertEquals(revision, 5)
+        self.assertEquals(loaded, events)
+        self.assertEquals([type(path[-1]) for path, _, _ in loaded], [int, tuple, str])
+        self.assertEquals(keyframe, {'a': {1: 'new'}})
+
+    def test_pickled_values(self):
+        line = dump_header(1, {'a': set([1])}, None, {}, allow_pickle=True)
+        with self.assertRaises(ValueError) as err:
+            load_header(line)
+        self.assertTrue("cannot decode a pickled value without allow_pickle" in err.exception)
+        self.assertEquals(load_header(line, allow_pickle=True)[1], {'a': set([1])})
+
+        line = dump_revision(2, [((root, 'a'), set([1]), key_updated)], None, allow_pickle=True)
+        with self.assertRaises(ValueError):
+            load_revision(line)
+        self.assertEquals(load_revision(line, allow_pickle=True)[1], [((root, 'a'), set([1]), key_updated)])
+
+    def test_not_a_stream(self):
+        with self.assertRaises(ValueError) as err:
+            load_header('{"format": "other"}')
+        self.assertTrue("not a traceable dict JSON lines stream" in err.exception)
+
+        with self.assertRaises(ValueError) as err:
+            load_header(dump_header(None, {}, None, {}).replace('"version": 1', '"version": 99'))
+        self.assertTrue("unsupported traceable dict JSON lines version 99" in err.exception)
+
+
+if __name__ == '__main__':
+    unittest.main()
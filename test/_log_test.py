@@ -0,0 +1,181 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from traceable_dict import LogTraceStore, TraceableDict
+from traceable_dict._utils import key_updated, root
+
+from _store_test import _TraceStoreTests
+
+
+class LogTraceStoreTest(_TraceStoreTests, unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._filename = os.path.join(self._directory, 'trace.log')
+        super(LogTraceStoreTest, self).setUp()
+
+    def tearDown(self):
+        self._trace.close()
+        shutil.rmtree(self._directory)
+
+    def _store(self):
+        return LogTraceStore(self._filename)
+
+    def _reopen(self):
+        self._trace.close()
+        self._trace = LogTraceStore(self._filename)
+        return self._trace
+
+    def test_reopen(self):
+        self._trace['2'] = [((root, 'x'), 1, key_updated)]
+        del self._trace['3']
+
+        trace = self._reopen()
+        self.assertEquals(sorted(trace), ['2', '5'])
+        self.assertEquals(trace['2'], [((root, 'x'), 1, key_updated)])
+        self.assertEquals(trace['5'], self._events['5'])
+        self.assertEquals(trace.find(('a', )), {'5': [2]})
+        self.assertEquals(trace.truncated, 0)
+
+    def test_append_only(self):
+        with open(self._filename, 'rb') as f:
+            written = f.read()
+
+        self._trace['6'] = [((root, 'x'), 1, key_updated)]
+        del self._trace['2']
+
+        with open(self._filename, 'rb') as f:
+            appended = f.read()
+        self.assertTrue(len(appended) > len(written))
+        self.assertEquals(appended[:len(written)], written)
+
+    def test_torn_tail(self):
+        size = os.path.getsize(self._filename)
+        self._trace['6'] = [((root, 'x'), 'value', key_updated)]
+        full_size = os.path.getsize(self._filename)
+        self._trace.close()
+
+        for torn_size in [size + 5, full_size - 1]:
+            with open(self._filename, 'r+b') as f:
+                f.truncate(torn_size)
+
+            trace = LogTraceStore(self._filename)
+            self.assertEquals(trace.truncated, torn_size - size)
+            self.assertEquals(os.path.getsize(self._filename), size)
+            self.assertEquals(dict(trace), self._events)
+
+            trace['6'] = [((root, 'x'), 'value', key_updated)]
+            self.assertEquals(os.path.getsize(self._filename), full_size)
+            trace.close()
+
+        self._trace = LogTraceStore(self._filename)
+        self.assertEquals(self._trace['6'], [((root, 'x'), 'value', key_updated)])
+
+    def test_damaged_tail(self):
+        size = os.path.getsize(self._filename)
+        self._trace['6'] = [((root, 'x'), 'value', key_updated)]
+        self._trace.close()
+
+        with open(self._filename, 'r+b') as f:
+            f.seek(-3, os.SEEK_END)
+            f.write('XXX')
+
+        self._trace = LogTraceStore(self._filename)
+        self.assertEquals(os.path.getsize(self._filename), size)
+        self.assertFalse('6' in self._trace)
+
+    def test_compact(self):
+        for _ in range(5):
+            self._trace['5'] = self._events['5']
+        del self._trace['3']
+        size = os.path.getsize(self._filename)
+
+        self._trace.compact()
+        self.assertTrue(os.path.getsize(self._filename) < size)
+        self.assertFalse(os.path.exists(self._filename + '.compact'))
+        self.assertEquals(sorted(self._trace), ['2', '5'])
+        self.assertEquals(self._trace['5'], self._events['5'])
+
+        trace = self._reopen()
+        self.assertEquals(dict(trace), {'2': self._events['2'], '5': self._events['5']})
+
+    def test_stats_after_reopen(self):
+        size = self._trace.events_size('5')
+
+        trace = self._reopen()
+        trace._load = None
+        self.assertEquals(trace.events_count('5'), 3)
+        self.assertEquals(trace.events_size('5'), size)
+
+    def test_not_a_log(self):
+        filename = os.path.join(self._directory, 'other')
+        with open(filename, 'wb') as f:
+            f.write('not a log')
+
+        with self.assertRaises(ValueError) as err:
+            LogTraceStore(filename)
+        self.assertTrue("not a trace log file" in str(err.exception))
+
+
+class LogTraceableDictTest(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._filename = os.path.join(self._directory, 'trace.log')
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_restart(self):
+        td1 = TraceableDict({'a': {'b': 0}, 'c': 0})
+        td1.commit(revision=1)
+        td1.attach_store(LogTraceStore(self._filename, sync=True))
+
+        for revision in range(2, 6):
+            td1.tracked()['a']['b'] = revision
+            td1.commit(revision=revision)
+
+        saved = dict((k, v) for k, v in td1.iteritems() if k != '__trace__')
+        expected = [td1.checkout(revision=revision, lazy=True).as_dict() for revision in range(1, 6)]
+        dict.__getitem__(td1, '__trace__').close()
+
+        td2 = TraceableDict(saved)
+        td2.attach_store(LogTraceStore(self._filename))
+        self.assertFalse(td2.has_uncommitted_changes)
+        self.assertEquals([td2.checkout(revision=revision).as_dict() for revision in range(1, 6)], expected)
+        self.assertEquals(td2.log(('a', 'b'))[3], {'b': 3})
+
+        td2['c'] = 6
+        td2.commit(revision=6)
+        self.assertEquals(td2.trace['6'], [((root, 'c'), 0, key_updated)])
+        td2.prune_before(3)
+        dict.__getitem__(td2, '__trace__').close()
+
+        store = LogTraceStore(self._filename)
+        self.assertEquals(sorted(store), ['4', '5', '6'])
+        store.close()
+
+    def test_checkout_fetches_replayed_revisions(self):
+        loaded = []
+
+        class CountingStore(LogTraceStore):
+            def _load(self, key):
+                loaded.append(key)
+                return super(CountingStore, self)._load(key)
+
+        td1 = TraceableDict({'a': {'b': 0}})
+        td1.commit(revision=1)
+        td1.attach_store(CountingStore(self._filename))
+        for revision in range(2, 501):
+            td1.tracked()['a']['b'] = revision
+            td1.commit(revision=revision)
+
+        self.assertEquals(td1.checkout(revision=497).as_dict(), {'a': {'b': 497}})
+        self.assertEquals(sorted(loaded), ['498', '499', '500'])
+        dict.__getitem__(td1, '__trace__').close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from traceable_dict._event import Event
+from traceable_dict._paths import PathPool
+from traceable_dict._utils import key_removed, key_added, key_updated, root
+
+
+class PathPoolTest(unittest.TestCase):
+
+    def test_intern(self):
+        pool = PathPool()
+
+        path = pool.intern((root, 'a', 'b'))
+        self.assertTrue(pool.intern(tuple([root, 'a', 'b'])) is path)
+        self.assertFalse(pool.intern((root, 'a')) is path)
+        self.assertEquals(len(pool), 2)
+        self.assertTrue((root, 'a') in pool)
+        self.assertEquals(sorted(pool), [(root, 'a'), (root, 'a', 'b')])
+
+    def test_intern_events(self):
+        pool = PathPool()
+        path = pool.intern((root, 'a', 'b'))
+
+        events = pool.intern_events([
+            (tuple([root, 'a', 'b']), 1, key_updated),
+            (tuple([root, 'c']), None, key_added),
+            Event(tuple([root, 'a', 'b']), 2, 1)])
+
+        self.assertEquals(events[:2], [((root, 'a', 'b'), 1, key_updated), ((root, 'c'), None, key_added)])
+        self.assertTrue(events[0][0] is path)
+        self.assertTrue(events[2].path is path)
+        self.assertEquals(events[2].type, key_removed)
+        self.assertEquals(len(pool), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
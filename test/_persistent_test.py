@@ -0,0 +1,71 @@
+import unittest
+
+from copy import deepcopy
+
+from traceable_dict._persistent import PathCopier
+from traceable_dict._utils import root, nested_setitem, nested_pop
+
+
+class PathCopierTest(unittest.TestCase):
+
+    def setUp(self):
+        self._d = {'a': {'b': {'c': 1, 'd': 2}}, 'e': {'f': 3}, 'g': 4}
+        self._d_orig = deepcopy(self._d)
+
+    def test_setitem(self):
+        editor = PathCopier(dict(self._d))
+        editor.setitem((root, 'a', 'b', 'c'), 10)
+        editor.setitem((root, 'a', 'new', 'x'), 5)
+        editor.setitem((root, 'g'), 40)
+
+        expected = deepcopy(self._d_orig)
+        nested_setitem(expected, (root, 'a', 'b', 'c'), 10)
+        nested_setitem(expected, (root, 'a', 'new', 'x'), 5)
+        nested_setitem(expected, (root, 'g'), 40)
+
+        self.assertEquals(editor.root, expected)
+        self.assertEquals(self._d, self._d_orig)
+        self.assertTrue(editor.root['e'] is self._d['e'])
+        self.assertFalse(editor.root['a'] is self._d['a'])
+
+    def test_pop(self):
+        editor = PathCopier(dict(self._d))
+        self.assertEquals(editor.pop((root, 'a', 'b', 'c')), 1)
+        self.assertEquals(editor.pop((root, 'e', 'f')), 3)
+
+        expected = deepcopy(self._d_orig)
+        nested_pop(expected, (root, 'a', 'b', 'c'))
+        nested_pop(expected, (root, 'e', 'f'))
+
+        self.assertEquals(editor.root, expected)
+        self.assertEquals(editor.root, {'a': {'b': {'d': 2}}, 'g': 4})
+        self.assertEquals(self._d, self._d_orig)
+
+        with self.assertRaises(KeyError):
+            editor.pop((root, 'missing', 'x'))
+
+    def test_copies_once(self):
+        editor = PathCopier(dict(self._d))
+        editor.setitem((root, 'a', 'b', 'c'), 10)
+        copied = editor.root['a']['b']
+        editor.setitem((root, 'a', 'b', 'd'), 20)
+
+        self.assertTrue(editor.root['a']['b'] is copied)
+        self.assertEquals(len(editor.owned), 3)
+
+    def test_writable(self):
+        owned = {}
+        editor = PathCopier(dict(self._d), owned)
+
+        d = editor.writable((root, 'e'))
+        d['f'] = 30
+        self.assertEquals(editor.root['e'], {'f': 30})
+        self.assertEquals(self._d['e'], {'f': 3})
+        self.assertTrue(owned[id(d)] is d)
+
+        with self.assertRaises(KeyError):
+            editor.writable((root, 'missing'), create=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
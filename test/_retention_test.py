@@ -0,0 +1,130 @@
+import sys
+import unittest
+
+from traceable_dict import RetentionPolicy
+from traceable_dict._event import Event
+from traceable_dict._retention import approximate_size
+from traceable_dict._utils import key_updated, root
+
+
+class RetentionPolicyTest(unittest.TestCase):
+
+    def setUp(self):
+        self._revisions = [1, 5, 8, 13, 21]
+        self._events = {1: 0, 5: 2, 8: 1, 13: 3, 21: 1}
+
+    def _oldest_kept(self, **limits):
+        return RetentionPolicy(**limits).oldest_kept(
+            self._revisions, self._events.get, lambda revision: 10 * self._events[revision])
+
+    def test_no_limits(self):
+        self.assertEquals(self._oldest_kept(), 1)
+        self.assertEquals(RetentionPolicy(max_revisions=1).oldest_kept([], self._events.get), None)
+
+    def test_max_revisions(self):
+        self.assertEquals(self._oldest_kept(max_revisions=2), 13)
+        self.assertEquals(self._oldest_kept(max_revisions=1), 21)
+        self.assertEquals(self._oldest_kept(max_revisions=10), 1)
+
+    def test_max_events(self):
+        self.assertEquals(self._oldest_kept(max_events=3), 13)
+        self.assertEquals(self._oldest_kept(max_events=4), 8)
+        self.assertEquals(self._oldest_kept(max_events=5), 5)
+        self.assertEquals(self._oldest_kept(max_events=7), 1)
+
+    def test_max_bytes(self):
+        self.assertEquals(self._oldest_kept(max_bytes=40), 8)
+        self.assertEquals(self._oldest_kept(max_bytes=5), 21)
+
+    def test_max_age(self):
+        self.assertEquals(self._oldest_kept(max_age=13), 8)
+        self.assertEquals(self._oldest_kept(max_age=12), 13)
+        self.assertEquals(self._oldest_kept(max_age=0), 21)
+
+    def test_combined_limits(self):
+        self.assertEquals(self._oldest_kept(max_revisions=5, max_events=3), 13)
+        self.assertEquals(self._oldest_kept(max_revisions=2, max_events=7, max_age=20), 13)
+
+    def test_only_kept_revisions_inspected(self):
+        inspected = []
+
+        def events(revision):
+            inspected.append(revision)
+            return self._events[revision]
+
+        RetentionPolicy(max_events=3).oldest_kept(self._revisions, events)
+        self.assertEquals(inspected, [21, 13])
+
+    def test_totals(self):
+        totals = (sum(self._events[revision] for revision in self._revisions[1:]),
+                  sum(10 * self._events[revision] for revision in self._revisions[1:]))
+        for limits in [{'max_events': 3}, {'max_events': 4}, {'max_bytes': 40}, {'max_bytes': 5},
+                       {'max_revisions': 4, 'max_events': 3}, {'max_age': 12, 'max_bytes': 10}]:
+            policy = RetentionPolicy(**limits)
+            self.assertEquals(
+                policy.oldest_kept(self._revisions, self._events.get, lambda revision: 10 * self._events[revision],
+                                   totals=totals),
+                self._oldest_kept(**limits))
+
+    def test_only_evicted_revisions_inspected(self):
+        inspected = []
+
+        def events(revision):
+            inspected.append(revision)
+            return self._events[revision]
+
+        self.assertEquals(RetentionPolicy(max_events=5).oldest_kept(self._revisions, events, totals=(7, 0)), 5)
+        self.assertEquals(inspected, [5])
+        self.assertEquals(RetentionPolicy(max_revisions=2).oldest_kept(self._revisions, events, totals=(7, 0)), 13)
+        self.assertEquals(inspected, [5])
+
+    def test_keyframe_bytes(self):
+        keyframes = {8: 100}
+
+        def oldest_kept(max_bytes, totals=None):
+            return RetentionPolicy(max_bytes=max_bytes).oldest_kept(
+                self._revisions, self._events.get, lambda revision: 10 * self._events[revision],
+                lambda revision: keyframes.get(revision, 0), totals)
+
+        for totals in [None, (7, 170)]:
+            self.assertEquals(oldest_kept(140, totals), 8)
+            self.assertEquals(oldest_kept(139, totals), 13)
+
+    def test_invalid_limits(self):
+        for limits in [{'max_revisions': 0}, {'max_events': -1}, {'max_bytes': '1'}]:
+            with self.assertRaises(ValueError) as err:
+                RetentionPolicy(**limits)
+            self.assertTrue("retention limit must be a positive integer or None" in err.exception)
+
+        with self.assertRaises(ValueError) as err:
+            RetentionPolicy(max_age=-1)
+        self.assertTrue("retention age must be a non-negative integer or None" in err.exception)
+
+    def test_as_dict(self):
+        policy = RetentionPolicy(max_events=10, max_age=0)
+        self.assertEquals(policy.as_dict(), {'max_revisions': None, 'max_events': 10, 'max_bytes': None, 'max_age': 0})
+        self.assertEquals(repr(policy), 'RetentionPolicy(max_age=0, max_events=10)')
+
+
+class ApproximateSizeTest(unittest.TestCase):
+
+    def test_nested(self):
+        value = {'a': [1, 2]}
+        self.assertEquals(approximate_size('a'), sys.getsizeof('a'))
+        self.assertTrue(approximate_size(value) > sys.getsizeof(value) + sys.getsizeof(value['a']))
+
+    def test_shared_objects_counted_once(self):
+        path = (root, 'a')
+        events = [(path, 1, key_updated), (path, 1, key_updated)]
+        shared = [path, root, 'a', 1, key_updated]
+        self.assertEquals(
+            approximate_size(events),
+            sum(sys.getsizeof(obj) for obj in [events] + events + shared))
+
+    def test_events(self):
+        value = 'x' * 1000
+        self.assertTrue(approximate_size([Event((root, 'a'), value, 2)]) > 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
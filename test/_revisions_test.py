@@ -0,0 +1,60 @@
+import unittest
+
+import json
+import pickle
+
+from traceable_dict import RevisionList
+
+
+class RevisionListTest(unittest.TestCase):
+
+    def setUp(self):
+        self._revisions = RevisionList([1, 5, 8, 13, 21])
+
+    def test_list_compatible(self):
+        self.assertEquals(self._revisions, [1, 5, 8, 13, 21])
+        self.assertEquals(json.loads(json.dumps(self._revisions)), [1, 5, 8, 13, 21])
+        self.assertEquals(pickle.loads(pickle.dumps(self._revisions, 2)), self._revisions)
+        self.assertEquals(self._revisions[-1], 21)
+
+    def test_contains(self):
+        for revision in [1, 5, 8, 13, 21]:
+            self.assertTrue(revision in self._revisions)
+        for revision in [0, 2, 14, 22]:
+            self.assertFalse(revision in self._revisions)
+        self.assertFalse(1 in RevisionList())
+
+    def test_index(self):
+        for i, revision in enumerate([1, 5, 8, 13, 21]):
+            self.assertEquals(self._revisions.index(revision), i)
+
+        with self.assertRaises(ValueError) as err:
+            self._revisions.index(7)
+        self.assertTrue('unknown revision 7' in err.exception)
+
+    def test_ceiling_and_floor(self):
+        self.assertEquals(self._revisions.ceiling(0), 1)
+        self.assertEquals(self._revisions.ceiling(8), 8)
+        self.assertEquals(self._revisions.ceiling(9), 13)
+        self.assertEquals(self._revisions.ceiling(22), None)
+
+        self.assertEquals(self._revisions.floor(0), None)
+        self.assertEquals(self._revisions.floor(8), 8)
+        self.assertEquals(self._revisions.floor(9), 8)
+        self.assertEquals(self._revisions.floor(22), 21)
+
+    def test_trim_front(self):
+        self.assertEquals(self._revisions.trim_front(), [1])
+        self.assertEquals(self._revisions, [5, 8, 13, 21])
+
+        self.assertEquals(self._revisions.trim_front(3), [5, 8, 13])
+        self.assertEquals(self._revisions, [21])
+        self.assertTrue(21 in self._revisions)
+        self.assertFalse(5 in self._revisions)
+
+        self.assertEquals(self._revisions.trim_front(5), [21])
+        self.assertEquals(self._revisions, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from traceable_dict import MemoryTraceStore, SqliteTraceStore
+from traceable_dict._event import Event
+from traceable_dict._index import TraceIndex
+from traceable_dict._retention import approximate_size
+from traceable_dict._store import _path_range
+from traceable_dict._utils import key_removed, key_added, key_updated, root, uncommitted
+
+
+class _TraceStoreTests(object):
+
+    def _store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self._events = {
+            '2': [((root, 'a', 'b'), 1, key_updated), ((root, 'c'), None, key_added)],
+            '3': [((root, 'a'), {'b': 2}, key_removed)],
+            '5': [((root, 'ab'), 1, key_updated), ((root, 1, 'x'), 1, key_updated), ((root, 'a', 'd', 'e'), 1, key_updated)]
+        }
+        self._trace = self._store()
+        for key, events in self._events.iteritems():
+            self._trace[key] = events
+
+    def test_mapping(self):
+        self.assertEquals(len(self._trace), 3)
+        self.assertEquals(sorted(self._trace), ['2', '3', '5'])
+        self.assertEquals(dict(self._trace), self._events)
+        self.assertTrue('3' in self._trace)
+        self.assertFalse('4' in self._trace)
+        self.assertEquals(self._trace.get('4'), None)
+
+        with self.assertRaises(KeyError):
+            self._trace['4']
+        with self.assertRaises(KeyError):
+            del self._trace['4']
+
+        self.assertEquals(self._trace.pop('3'), self._events['3'])
+        self.assertEquals(sorted(self._trace), ['2', '5'])
+
+        self._trace['2'] = self._events['3']
+        self.assertEquals(self._trace['2'], self._events['3'])
+        self.assertEquals(self._trace.find(('c', )), {})
+
+    def test_uncommitted_in_memory(self):
+        events = self._trace.setdefault(uncommitted, [])
+        events.append(((root, 'a', 'f'), None, key_added))
+
+        self.assertTrue(self._trace[uncommitted] is events)
+        self.assertEquals(len(self._trace), 4)
+        self.assertEquals(self._trace.find(('a', 'f')), {uncommitted: [0]})
+
+        self._trace['6'] = self._trace.pop(uncommitted)
+        self.assertFalse(uncommitted in self._trace)
+        self.assertEquals(self._trace.find(('a', 'f')), {'6': [0]})
+
+    def test_find(self):
+        index = TraceIndex()
+        for key, events in self._events.iteritems():
+            index.add(key, events)
+
+        for path in [('a', ), ('a', 'b'), ('a', 'd'), ('ab', ), (1, ), (1.0, 'x'), ('c', ), ('x', ), ()]:
+            self.assertEquals(self._trace.find(path), index.find(path))
+
+    def test_stats(self):
+        self._trace._load = None
+
+        for key, events in self._events.iteritems():
+            self.assertEquals(self._trace.events_count(key), len(events))
+            self.assertEquals(self._trace.events_size(key), approximate_size(list(events)))
+        self.assertEquals((self._trace.events_count('4'), self._trace.events_size('4')), (0, 0))
+
+        self._trace[uncommitted] = [((root, 'a', 'f'), None, key_added)]
+        self.assertEquals(self._trace.events_count(uncommitted), 1)
+
+    def test_compact_events(self):
+        self._trace['7'] = [Event((root, 'a', 'b'), 2, 2)]
+        self.assertEquals(self._trace['7'], [((root, 'a', 'b'), 2, key_updated)])
+        self.assertTrue(isinstance(self._trace['7'][0], Event))
+
+
+class MemoryTraceStoreTest(_TraceStoreTests, unittest.TestCase):
+
+    def _store(self):
+        return MemoryTraceStore()
+
+
+class SqliteTraceStoreTest(_TraceStoreTests, unittest.TestCase):
+
+    def _store(self):
+        return SqliteTraceStore()
+
+    def test_path_range(self):
+        start, end = _path_range(('a', 1))
+        self.assertTrue(start <= _path_range(('a', 1, 'b'))[0] < end)
+        self.assertFalse(start <= _path_range(('a', 10))[0] < end)
+        self.assertEquals(_path_range((u'a', True)), _path_range(('a', 1.0)))
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'trace.db')
+            trace = SqliteTraceStore(filename)
+            trace.update(self._events)
+            trace[uncommitted] = [((root, 'a', 'f'), None, key_added)]
+            trace.close()
+
+            trace = SqliteTraceStore(filename)
+            self.assertEquals(trace.filename, filename)
+            self.assertEquals(dict(trace), self._events)
+            self.assertEquals(trace.find(('a', 'b')), {'2': [0]})
+            trace.close()
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,19 @@
 import warnings
+import pickle
 import time
+import types
 import unittest
 import warnings
 
+from copy import deepcopy
 
-from traceable_dict import TraceableDict
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+from traceable_dict import DictDiff, TraceableDict
 
 from traceable_dict._utils import key_removed, key_added, key_updated, root, uncommitted
 
@@ -22,6 +31,24 @@ class _WarningTestMixin(object):
             self.assertTrue(msg == str(warning_list[-1].message))
 
 
+def _history(d, change, last_revision, first_revision=1, setup=None):
+    """
+    Commit a traceable dict of d as first_revision, then commit change(td, revision) as every later
+    revision up to last_revision. Returns the traceable dict and its state at every revision.
+    """
+    td = TraceableDict(d)
+    if setup is not None:
+        setup(td)
+    td.commit(revision=first_revision)
+
+    states = {first_revision: deepcopy(td.as_dict())}
+    for revision in range(first_revision + 1, last_revision + 1):
+        change(td, revision)
+        td.commit(revision=revision)
+        states[revision] = deepcopy(td.as_dict())
+    return td, states
+
+
 class TraceableTest(unittest.TestCase):
 
     @classmethod
@@ -1187,5 +1214,1816 @@ class RemoveOldestRevisionTests(unittest.TestCase):
         self.assertEquals(td1.trace, {})
 
 
+class ReadFastPathTests(unittest.TestCase):
+
+    def test_readers_are_not_traced(self):
+        from traceable_dict import _meta
+
+        calls = []
+        find_diff = _meta.DictDiff.find_diff
+
+        def _counting_find_diff(*args, **kwargs):
+            calls.append(1)
+            return find_diff(*args, **kwargs)
+
+        td1 = TraceableDict({'a': 1, 'b': {'c': 2}})
+        td1.commit(revision=1)
+
+        _meta.DictDiff.find_diff = staticmethod(_counting_find_diff)
+        try:
+            td1.items(), td1.values(), td1.keys(), list(td1.iteritems()), td1.viewkeys()
+            td1.copy(), td1.has_key('a'), td1 == {}, td1 != {}, repr(td1), str(td1)
+        finally:
+            _meta.DictDiff.find_diff = staticmethod(find_diff)
+
+        self.assertEquals(calls, [])
+        self.assertFalse(td1.has_uncommitted_changes)
+
+    def test_mutators_are_traced(self):
+        mutators = [
+            lambda td: td.__setitem__('a', 2),
+            lambda td: td.__delitem__('a'),
+            lambda td: td.pop('a'),
+            lambda td: td.setdefault('d', 3),
+            lambda td: td.update(a=2),
+            lambda td: td.clear(),
+            lambda td: td.popitem()
+        ]
+        for mutate in mutators:
+            td1 = TraceableDict({'a': 1})
+            td1.commit(revision=1)
+            mutate(td1)
+
+            self.assertTrue(td1.has_uncommitted_changes)
+            self.assertEquals(len(td1.trace[uncommitted]), 1)
+
+    def test_read_is_constant_time(self):
+        from traceable_dict import _meta
+
+        calls = []
+        find_diff = _meta.DictDiff.find_diff
+
+        def _counting_find_diff(*args, **kwargs):
+            calls.append(1)
+            return find_diff(*args, **kwargs)
+
+        td1 = TraceableDict(dict(('k%d' % i, {'v': i}) for i in range(50000)))
+        td1.commit(revision=1)
+
+        _meta.DictDiff.find_diff = staticmethod(_counting_find_diff)
+        try:
+            self.assertEquals(td1['k7'], {'v': 7})
+            self.assertEquals(td1.get('k8'), {'v': 8})
+            self.assertEquals(td1.get('missing'), None)
+            self.assertTrue('k9' in td1)
+            self.assertEquals(len(td1), 50002)
+            self.assertEquals(len(td1.keys()), 50002)
+            self.assertEquals(len(list(iter(td1))), 50002)
+        finally:
+            _meta.DictDiff.find_diff = staticmethod(find_diff)
+
+        self.assertEquals(calls, [])
+        self.assertFalse(td1.has_uncommitted_changes)
+
+
+class IncrementalTraceTests(unittest.TestCase):
+
+    def test_mutators(self):
+        td1 = TraceableDict({'a': 1, 'b': {'c': 2}, 'd': 3})
+        td1.commit(revision=1)
+
+        td1['a'] = 10
+        td1['e'] = 5
+        del td1['d']
+        self.assertEquals(td1.pop('e'), 5)
+        self.assertEquals(td1.pop('missing', None), None)
+        self.assertEquals(td1.setdefault('a', 0), 10)
+        self.assertEquals(td1.setdefault('f', {'g': 1}), {'g': 1})
+
+        self.assertEquals(
+            td1.trace[uncommitted],
+            [((root, 'a'), 1, key_updated),
+             ((root, 'e'), None, key_added),
+             ((root, 'd'), 3, key_removed),
+             ((root, 'e'), 5, key_removed),
+             ((root, 'f', 'g'), None, key_added)])
+
+        td1.commit(revision=2)
+
+        td1.update({'a': 11}, h=1)
+        td1.update([('a', 12)])
+        self.assertEquals(
+            td1.trace[uncommitted],
+            [((root, 'a'), 10, key_updated),
+             ((root, 'h'), None, key_added),
+             ((root, 'a'), 11, key_updated)])
+
+        td1.commit(revision=3)
+
+        key, value = td1.popitem()
+        self.assertNotIn(key, ['__trace__', '__revisions__'])
+        self.assertEquals(len(td1.trace[uncommitted]), len(DictDiff._traversal({key: value})))
+
+        td1.clear()
+        self.assertEquals(td1.as_dict(), {})
+        self.assertEquals(td1.revisions, [1, 2, 3])
+
+        td1.commit(revision=4)
+        self.assertEquals(td1.checkout(revision=1).as_dict(), {'a': 1, 'b': {'c': 2}, 'd': 3})
+        self.assertEquals(td1.checkout(revision=3).as_dict(), {'a': 12, 'b': {'c': 2}, 'f': {'g': 1}, 'h': 1})
+
+        with self.assertRaises(KeyError):
+            td1.popitem()
+
+    def test_write_compares_touched_keys_only(self):
+        from traceable_dict import _meta
+
+        sizes = []
+        find_diff = _meta.DictDiff.find_diff
+
+        def _sizing_find_diff(t1, t2, *args, **kwargs):
+            sizes.append(len(t1) + len(t2))
+            return find_diff(t1, t2, *args, **kwargs)
+
+        td1 = TraceableDict(dict(('k%d' % i, i) for i in range(50000)))
+        td1.commit(revision=1)
+
+        _meta.DictDiff.find_diff = staticmethod(_sizing_find_diff)
+        try:
+            td1['k1'] = 'updated'
+            td1['new'] = 'added'
+            del td1['k2']
+            td1.update(k3='updated', k4='updated')
+        finally:
+            _meta.DictDiff.find_diff = staticmethod(find_diff)
+
+        self.assertEquals(sizes, [2, 1, 1, 4])
+        self.assertEquals(len(td1.trace[uncommitted]), 5)
+
+
+class KeyframeTests(unittest.TestCase):
+
+    def _build(self, n_revisions, **policy):
+        def change(td, revision):
+            td['a'] = revision
+            if revision % 3 == 0:
+                td['b'] = {'c': revision}
+
+        return _history(
+            {'a': 0, 'b': {'c': 0}}, change, n_revisions, setup=lambda td: td.set_keyframe_policy(**policy))
+
+    def test_every_revisions(self):
+        td1, states = self._build(8, every_revisions=2)
+        self.assertEquals(td1.keyframes, [3, 5, 7])
+        self.assertNotIn('__keyframes__', td1.as_dict())
+
+        for revision in td1.revisions:
+            self.assertEquals(td1.checkout(revision=revision).as_dict(), states[revision])
+
+    def test_every_events(self):
+        td1, states = self._build(8, every_events=3)
+        self.assertEquals(td1.keyframes, [3, 6])
+
+        for revision in td1.revisions:
+            self.assertEquals(td1.checkout(revision=revision).as_dict(), states[revision])
+
+    def test_bounded_replay(self):
+        from traceable_dict import _traceable
+
+        td1, states = self._build(50, every_revisions=5)
+
+        calls = []
+        nested_setitem = _traceable.nested_setitem
+
+        def _counting_nested_setitem(*args):
+            calls.append(1)
+            return nested_setitem(*args)
+
+        _traceable.nested_setitem = _counting_nested_setitem
+        try:
+            result = td1.checkout(revision=2)
+        finally:
+            _traceable.nested_setitem = nested_setitem
+
+        self.assertEquals(result.as_dict(), states[2])
+        self.assertEquals(result.revisions, [1, 2])
+        self.assertEquals(result.keyframes, [])
+        self.assertEquals(td1.keyframes[0], 6)
+        self.assertEquals(len(calls), sum(len(td1.trace[str(r)]) for r in range(3, 7)))
+
+    def test_checkout_keeps_keyframes(self):
+        td1, states = self._build(8, every_revisions=2)
+
+        result = td1.checkout(revision=5)
+        self.assertEquals(result.keyframes, [3, 5])
+        self.assertEquals(result.checkout(revision=4).as_dict(), states[4])
+
+        result['a'] = 'new'
+        result.commit(revision=6)
+        self.assertEquals(result.keyframes, [3, 5])
+        result['a'] = 'newer'
+        result.commit(revision=7)
+        self.assertEquals(result.keyframes, [3, 5, 7])
+        self.assertEquals(td1.keyframes, [3, 5, 7])
+        self.assertEquals(td1.checkout(revision=7).as_dict(), states[7])
+
+    def test_add_and_drop_keyframes(self):
+        td1, states = self._build(6)
+        self.assertEquals(td1.keyframes, [])
+        self.assertNotIn('__keyframes__', td1)
+
+        td1.add_keyframe(revision=2)
+        td1.add_keyframe(revision=4)
+        self.assertEquals(td1.keyframes, [2, 4])
+
+        for revision in td1.revisions:
+            self.assertEquals(td1.checkout(revision=revision).as_dict(), states[revision])
+
+        td1.drop_keyframe(revision=2)
+        self.assertEquals(td1.keyframes, [4])
+        td1.drop_keyframe(revision=4)
+        self.assertEquals(td1.keyframes, [])
+        self.assertNotIn('__keyframes__', td1)
+
+        with self.assertRaises(ValueError) as err:
+            td1.drop_keyframe(revision=4)
+        self.assertTrue('no keyframe for revision 4' in err.exception)
+
+        with self.assertRaises(ValueError) as err:
+            td1.add_keyframe(revision=55)
+        self.assertTrue('unknown revision 55' in err.exception)
+
+    def test_invalid_policy(self):
+        td1 = TraceableDict({'a': 1})
+
+        with self.assertRaises(ValueError) as err:
+            td1.set_keyframe_policy(every_revisions=0)
+        self.assertTrue('keyframe policy must be a positive integer or None' in err.exception)
+
+        with self.assertRaises(ValueError) as err:
+            td1.set_keyframe_policy(every_events='10')
+        self.assertTrue('keyframe policy must be a positive integer or None' in err.exception)
+
+    def test_uncommitted_changes(self):
+        td1, states = self._build(4, every_revisions=1)
+        self.assertEquals(td1.keyframes, [2, 3, 4])
+
+        td1['a'] = 'uncommitted'
+        td1.revert()
+        self.assertEquals(td1.as_dict(), states[4])
+        self.assertEquals(td1.keyframes, [2, 3, 4])
+
+        td1 = td1 | {'a': 'piped'}
+        self.assertEquals(td1.keyframes, [2, 3, 4])
+        td1.commit(revision=5)
+        self.assertEquals(td1.keyframes, [2, 3, 4, 5])
+        self.assertEquals(td1.checkout(revision=3).as_dict(), states[3])
+
+    def test_remove_oldest_revision(self):
+        td1, states = self._build(4, every_revisions=1)
+        td1.add_keyframe(revision=1)
+        self.assertEquals(td1.keyframes, [1, 2, 3, 4])
+
+        td1.remove_oldest_revision()
+        self.assertEquals(td1.keyframes, [2, 3, 4])
+        self.assertEquals(td1.checkout(revision=2).as_dict(), states[2])
+
+
+class RevisionIndexTests(unittest.TestCase):
+
+    def test_serialized_revisions(self):
+        from traceable_dict import RevisionList
+
+        td1 = TraceableDict({'a': 1, '__trace__': {'2': [((root, 'a'), 0, key_updated)]}, '__revisions__': [1, 2]})
+        self.assertTrue(isinstance(td1.revisions, RevisionList))
+        self.assertEquals(td1.revisions, [1, 2])
+        self.assertFalse(td1.has_uncommitted_changes)
+        self.assertEquals(td1.checkout(revision=1).as_dict(), {'a': 0})
+        self.assertTrue(isinstance(td1.checkout(revision=1).revisions, RevisionList))
+
+    def test_revisions_not_shared(self):
+        td1 = TraceableDict({'a': 1})
+        td1.commit(revision=1)
+
+        td2 = td1 | {'a': 2}
+        td2.commit(revision=2)
+
+        self.assertEquals(td1.revisions, [1])
+        self.assertEquals(td2.revisions, [1, 2])
+
+    def test_long_history(self):
+        td1 = TraceableDict({'a': 0})
+        td1.commit(revision=0)
+        for revision in range(1, 2000):
+            td1['a'] = revision
+            td1.commit(revision=revision)
+
+        self.assertEquals(td1.checkout(revision=1500).as_dict(), {'a': 1500})
+        self.assertEquals(td1.checkout(revision=1500).revisions, range(1501))
+
+        for _ in range(1000):
+            td1.remove_oldest_revision()
+        self.assertEquals(td1.revisions, range(1000, 2000))
+        self.assertEquals(td1.checkout(revision=1000).as_dict(), {'a': 1000})
+
+
+class SharedCheckoutTests(unittest.TestCase):
+
+    def _build(self):
+        def change(td, revision):
+            td.tracked()['a']['b'] = revision
+            if revision % 2 == 0:
+                td['g'] = revision
+            if revision == 4:
+                td['h'] = {'i': 1}
+            if revision == 6:
+                td.tracked()['a']['c'].pop('d')
+
+        return _history({'a': {'b': 1, 'c': {'d': 2}}, 'e': {'f': [1, 2]}, 'g': 0}, change, 7)
+
+    def test_same_as_copy(self):
+        td1, states = self._build()
+
+        for revision in td1.revisions:
+            result = td1.checkout(revision=revision, shared=True)
+            self.assertEquals(result.as_dict(), states[revision])
+            self.assertEquals(result.revisions, td1.revisions[:td1.revisions.index(revision) + 1])
+            self.assertEquals(result.trace, td1.checkout(revision=revision).trace)
+
+        td1.add_keyframe(revision=5)
+        for revision in td1.revisions:
+            self.assertEquals(td1.checkout(revision=revision, shared=True).as_dict(), states[revision])
+
+    def test_shares_unchanged_subtrees(self):
+        td1, states = self._build()
+
+        result = td1.checkout(revision=3, shared=True)
+        self.assertTrue(result['e'] is td1['e'])
+        self.assertTrue(result['e']['f'] is td1['e']['f'])
+        self.assertFalse(result['a'] is td1['a'])
+        self.assertTrue(result.trace['2'] is td1.trace['2'])
+        self.assertEquals(td1.as_dict(), states[7])
+
+        result = td1.checkout(revision=3)
+        self.assertFalse(result['e'] is td1['e'])
+
+    def test_writes_do_not_leak(self):
+        td1, states = self._build()
+
+        result = td1.checkout(revision=3, shared=True)
+        result.tracked()['e']['f'] = 'updated'
+        result.tracked()['a']['c']['new'] = 1
+        del result.tracked()['a']['c']['d']
+        result.commit(revision=10)
+
+        self.assertEquals(td1.as_dict(), states[7])
+        self.assertEquals(td1.revisions, range(1, 8))
+        self.assertEquals(result.as_dict()['e'], {'f': 'updated'})
+        self.assertEquals(result.as_dict()['a']['c'], {'new': 1})
+        self.assertEquals(result.checkout(revision=3).as_dict(), states[3])
+        self.assertEquals(td1.checkout(revision=3).as_dict(), states[3])
+
+    def test_source_writes_do_not_leak(self):
+        td1, states = self._build()
+
+        result = td1.checkout(revision=3, shared=True)
+        td2 = td1 | td1.as_dict()
+        td1.tracked()['e']['f'] = 'updated'
+        td1.tracked()['a']['c']['d'] = 'updated'
+
+        self.assertEquals(result.as_dict(), states[3])
+        self.assertEquals(td2.as_dict(), states[7])
+        self.assertEquals(td1['e'], {'f': 'updated'})
+
+        td2.tracked()['e']['f'] = 'td2'
+        self.assertEquals(td1['e'], {'f': 'updated'})
+
+    def test_pipe_does_not_share_uncommitted_trace(self):
+        td1 = TraceableDict({'a': {'b': 1}, 'c': 1})
+        td1.commit(revision=1)
+        td1['c'] = 2
+
+        td2 = td1 | {'a': {'b': 1}, 'c': 3}
+        self.assertEquals(td1.trace[uncommitted], [((root, 'c'), 1, key_updated)])
+        self.assertEquals(len(td2.trace[uncommitted]), 2)
+
+        td2.tracked()['a']['b'] = 2
+        self.assertEquals(td1['a'], {'b': 1})
+
+
+class IterLogTests(unittest.TestCase):
+
+    def test_same_as_checkout(self):
+        td1 = TraceableDict({"A": {"B": {"C": 1, "D": [2, 3]}}})
+        td1.commit(revision=1)
+
+        history = [
+            {"A": {"B": {"C": 2, "D": [2, 3], "E": 4}}},
+            {"A": {"B": {"D": [2, 3, 4], "E": 4}}},
+            {"A": {"B": {"C": 5, "D": [2, 3, 4]}}, "F": 1},
+            {"A": {"B": {"C": 5}}, "F": 2},
+            {"F": 3},
+            {"A": {"B": {"E": 6}}, "F": 3},
+        ]
+        for revision, d in enumerate(history, 2):
+            td1 = td1 | d
+            td1.tracked()['F'] = revision
+            td1.tracked()['F'] = revision * 10
+            td1.commit(revision=revision)
+
+        td1 = td1 | {"A": {"B": {"C": 'uncommitted'}}}
+
+        for path in [("A",), ("A", "B"), ("A", "B", "C"), ("A", "B", "D"), ("A", "B", "E"), ("F",)]:
+            log = td1.iter_log(path)
+            self.assertTrue(isinstance(log, types.GeneratorType))
+
+            d_augmented = td1._augment(path)
+            expected = []
+            for revision in d_augmented.revisions:
+                value = d_augmented._checkout(revision=revision).as_dict()
+                expected.append((revision, value if value else {path[-1]: {}}))
+
+            self.assertEquals(list(log), expected)
+
+    def test_values_are_independent(self):
+        td1 = TraceableDict({"A": {"B": [1]}})
+        td1.commit(revision=1)
+        td1.tracked()["A"]["B"] = [1, 2]
+        td1.commit(revision=2)
+
+        log = list(td1.iter_log(("A",)))
+        log[0][1]["A"]["B"].append("changed")
+        self.assertEquals(log[1][1], {"A": {"B": [1, 2]}})
+        self.assertEquals(td1.as_dict(), {"A": {"B": [1, 2]}})
+        self.assertEquals(td1.log(("A",)), {1: {"A": {"B": [1]}}, 2: {"A": {"B": [1, 2]}}})
+
+    def test_single_pass(self):
+        td1 = TraceableDict({"hot": 0, "cold": 0})
+        td1.commit(revision=0)
+        for revision in range(1, 1000):
+            td1["hot"] = revision
+            td1.commit(revision=revision)
+
+        calls = []
+        _checkout = TraceableDict._checkout
+
+        def _counting_checkout(self, *args, **kwargs):
+            calls.append(1)
+            return _checkout(self, *args, **kwargs)
+
+        TraceableDict._checkout = _counting_checkout
+        try:
+            log = td1.iter_log(("hot",))
+            self.assertEquals(next(log), (0, {"hot": 0}))
+            self.assertEquals(list(log)[-1], (999, {"hot": 999}))
+        finally:
+            TraceableDict._checkout = _checkout
+
+        self.assertEquals(calls, [])
+
+    def test_no_revisions(self):
+        td1 = TraceableDict({"A": 1})
+        self.assertEquals(list(td1.iter_log(("A",))), [])
+
+
+def _nested_change(td, revision):
+    if revision == 2:
+        td.tracked()["A"]["B"] = 2
+        td["E"] = 2
+    elif revision == 3:
+        td.tracked()["A"]["C"]["D"] = 3
+        td["F"] = {"G": 3}
+    elif revision == 4:
+        del td["E"]
+
+
+class PathIndexTests(unittest.TestCase):
+
+    def _scan(self, td, path):
+        trace = {}
+        for revision, events in td.trace.items():
+            events_aug = [
+                ((root, ) + tuple(_path[len(path):]), value, type_)
+                for _path, value, type_ in events if _path[1:len(path) + 1] == path]
+            if events_aug:
+                trace[revision] = events_aug
+        return trace
+
+    def _build(self):
+        td1, _ = _history({"A": {"B": 1, "C": {"D": 1}}, "E": 1}, _nested_change, 3)
+        del td1["E"]
+        td1.tracked()["A"]["B"] = 4
+        return td1
+
+    def test_augment_matches_scan(self):
+        td1 = self._build()
+
+        for path in [("A",), ("A", "B"), ("A", "C"), ("A", "C", "D"), ("E",), ("F",), ("F", "G"), ("X",)]:
+            self.assertEquals(td1._augment(path).trace, self._scan(td1, path))
+
+        td1.commit(revision=4)
+        td1.remove_oldest_revision()
+        td1["E"] = 5
+
+        for path in [("A",), ("A", "B"), ("E",), ("F", "G")]:
+            self.assertEquals(td1._augment(path).trace, self._scan(td1, path))
+
+    def test_index_survives_revert(self):
+        td1 = self._build()
+        td1._augment(("A",))
+
+        td1.revert()
+        td1.tracked()["A"]["C"]["D"] = 5
+
+        self.assertEquals(td1._augment(("A", "C")).trace, self._scan(td1, ("A", "C")))
+        self.assertEquals(td1.diff(path=("A", "C")), {"C": {"D": "---3 +++5"}})
+
+    def test_index_is_not_pickled(self):
+        td1 = self._build()
+        td1.commit(revision=4)
+        td1._augment(("A",))
+
+        td2 = pickle.loads(pickle.dumps(td1))
+        self.assertEquals(td2._index, None)
+        self.assertEquals(td2.log(("A", "B")), td1.log(("A", "B")))
+
+    def test_no_base_checkout(self):
+        td1 = TraceableDict(dict(("k%d" % i, {"v": i}) for i in range(1000)))
+        td1.commit(revision=0)
+        for revision in range(1, 100):
+            td1.tracked()["k%d" % revision]["v"] = -revision
+            td1.commit(revision=revision)
+
+        calls = []
+        _checkout = TraceableDict._checkout
+
+        def _counting_checkout(self, *args, **kwargs):
+            calls.append(1)
+            return _checkout(self, *args, **kwargs)
+
+        TraceableDict._checkout = _counting_checkout
+        try:
+            d_augmented = td1._augment(("k50",))
+        finally:
+            TraceableDict._checkout = _checkout
+
+        self.assertEquals(calls, [])
+        self.assertEquals(d_augmented.revisions, [0, 50])
+        self.assertEquals(d_augmented.trace, {"50": [((root, "k50", "v"), 50, key_updated)]})
+
+
+class MerkleDigestTests(unittest.TestCase):
+
+    def _build(self, enabled=True):
+        setup = TraceableDict.enable_digests if enabled else None
+        return _history(dict(("k%d" % i, {"v": {"w": i}}) for i in range(100)), None, 1, setup=setup)[0]
+
+    def test_root_digest(self):
+        td1 = self._build()
+        td2 = self._build(enabled=False)
+
+        self.assertEquals(td1.digests is not None, True)
+        self.assertEquals(td2.digests, None)
+        self.assertEquals(td1.root_digest, td2.root_digest)
+
+        td1.tracked()["k5"]["v"]["w"] = "updated"
+        self.assertNotEquals(td1.root_digest, td2.root_digest)
+
+        td2.tracked()["k5"]["v"]["w"] = "updated"
+        self.assertEquals(td1.root_digest, td2.root_digest)
+
+        td1["k200"] = 1
+        td1.commit(revision=2)
+        del td1["k200"]
+        self.assertEquals(td1.root_digest, td2.root_digest)
+
+    def test_updated_along_path(self):
+        from traceable_dict import _digest
+
+        td1 = self._build()
+        digest = td1.root_digest
+        self.assertEquals(len(td1.digests), 201)
+
+        calls = []
+        _combine = _digest._combine
+
+        def _counting_combine(*args):
+            calls.append(1)
+            return _combine(*args)
+
+        _digest._combine = _counting_combine
+        try:
+            td1.tracked()["k5"]["v"]["w"] = "updated"
+            self.assertNotEquals(td1.root_digest, digest)
+            self.assertEquals(len(calls), 3)
+
+            td1.tracked()["k5"]["v"]["w"] = 5
+            self.assertEquals(td1.root_digest, digest)
+            self.assertEquals(len(calls), 6)
+        finally:
+            _digest._combine = _combine
+
+        self.assertEquals(td1.root_digest, TraceableDict(td1.as_dict()).root_digest)
+
+    def test_all_changes_are_seen(self):
+        td1 = self._build()
+        digest = td1.root_digest
+
+        td1.tracked()["k5"]["v"]["x"] = 1
+        td1.tracked()["k6"]["v"].pop("w")
+        td1["k100"] = 100
+        td1.pop("k8")
+        td1.update({"k9": {"v": {"w": 90}}})
+        self.assertEquals(td1.root_digest, TraceableDict(td1.as_dict()).root_digest)
+
+        td1.revert()
+        self.assertEquals(td1.root_digest, digest)
+
+        td1 = td1 | {"k0": {"v": {"w": 0}}}
+        self.assertEquals(td1.root_digest, TraceableDict({"k0": {"v": {"w": 0}}}).root_digest)
+        self.assertNotEquals(td1.digests, None)
+
+        td1.clear()
+        self.assertEquals(td1.root_digest, TraceableDict().root_digest)
+
+    def test_diff_descends_into_changed_branches(self):
+        td1 = self._build()
+        td2 = self._build()
+        td1.root_digest, td2.root_digest
+
+        td2.tracked()["k5"]["v"]["w"] = "updated"
+
+        calls = []
+        _frame = DictDiff._frame
+
+        def _counting_frame(t1, t2, path):
+            calls.append(path)
+            return _frame(t1, t2, path)
+
+        DictDiff._frame = staticmethod(_counting_frame)
+        try:
+            res = DictDiff.find_diff(td1.as_dict(), td2.as_dict(), digests=(td1.digests, td2.digests))
+        finally:
+            DictDiff._frame = staticmethod(_frame)
+
+        self.assertEquals(res, [((root, "k5", "v", "w"), 5, key_updated)])
+        self.assertEquals(sorted(calls), [(root, ), (root, "k5"), (root, "k5", "v")])
+
+        td2.revert()
+        self.assertEquals(
+            DictDiff.find_diff(td1.as_dict(), td2.as_dict(), digests=(td1.digests, td2.digests)), [])
+
+    def test_disable(self):
+        td1 = self._build()
+        digest = td1.root_digest
+
+        td1.disable_digests()
+        self.assertEquals(td1.digests, None)
+        self.assertEquals(td1.root_digest, digest)
+
+    def test_pickle(self):
+        td1 = self._build()
+        digest = td1.root_digest
+
+        td2 = pickle.loads(pickle.dumps(td1))
+        self.assertEquals(len(td2.digests), 0)
+        self.assertEquals(td2.root_digest, digest)
+
+        td2.tracked()["k5"]["v"]["w"] = "updated"
+        self.assertNotEquals(td2.root_digest, digest)
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class ArrayEventTests(unittest.TestCase):
+
+    def _build(self):
+        def change(td, revision):
+            w = td["A"]["W"].copy()
+            if revision == 2:
+                w[[3, 50]] = -1
+                td.tracked()["A"]["W"] = w
+            else:
+                w[50] = -2
+                td["A"] = {"W": w}
+
+        return _history(
+            {"A": {"W": numpy.arange(100, dtype=float)}, "B": 1}, change, 3, setup=TraceableDict.set_array_events)[0]
+
+    def _values(self, revision):
+        w = numpy.arange(100, dtype=float)
+        if revision >= 2:
+            w[[3, 50]] = -1
+        if revision >= 3:
+            w[50] = -2
+        return w
+
+    def test_trace(self):
+        td1 = self._build()
+
+        self.assertEquals(td1.trace["2"], [((root, "A", "W", (3, )), 3., key_updated),
+                                           ((root, "A", "W", (50, )), 50., key_updated)])
+        self.assertEquals(td1.trace["3"], [((root, "A", "W", (50, )), -1., key_updated)])
+
+        td2 = TraceableDict({"W": numpy.arange(3)})
+        td2.commit(revision=1)
+        td2["W"] = numpy.array([0, 1, 5])
+        self.assertEquals(len(td2.trace[uncommitted]), 1)
+        self.assertEquals(td2.trace[uncommitted][0][0], (root, "W"))
+
+    def test_checkout(self):
+        td1 = self._build()
+
+        for revision in td1.revisions:
+            for shared in [False, True]:
+                w = td1.checkout(revision=revision, shared=shared)["A"]["W"]
+                self.assertTrue(numpy.array_equal(w, self._values(revision)))
+            w = td1.checkout(revision=revision, lazy=True)["A"]["W"]
+            self.assertTrue(numpy.array_equal(w, self._values(revision)))
+
+        self.assertTrue(numpy.array_equal(td1["A"]["W"], self._values(3)))
+        self.assertTrue(td1.checkout(revision=1)._array_events)
+
+    def test_checkout_keeps_trace(self):
+        td1 = TraceableDict({"W": numpy.zeros(10)})
+        td1.set_array_events()
+        td1.commit(revision=1)
+        w = td1["W"].copy()
+        w[3] = 1
+        td1["W"] = w
+        td1.commit(revision=2)
+        td1["W"] = numpy.arange(10.) + 100
+        td1.commit(revision=3)
+
+        for _ in range(2):
+            self.assertEquals(td1.checkout(revision=1)["W"][3], 0)
+            self.assertEquals(td1.checkout(revision=2)["W"][3], 1)
+            self.assertEquals([value["W"][3] for _, value in td1.iter_log(("W", ))], [0, 1, 103])
+
+    def test_revert(self):
+        td1 = self._build()
+
+        w = td1["A"]["W"].copy()
+        w[0] = 1000
+        td1.tracked()["A"]["W"] = w
+        td1.revert()
+
+        self.assertTrue(numpy.array_equal(td1["A"]["W"], self._values(3)))
+
+    def test_log_and_diff(self):
+        td1 = self._build()
+
+        log = dict(td1.iter_log(("A", "W")))
+        for revision in td1.revisions:
+            self.assertTrue(numpy.array_equal(log[revision]["W"], self._values(revision)))
+
+        self.assertEquals(td1.diff(revision=3), {"A": {"W": {(50, ): "----1.0 +++-2.0"}}, "B": 1})
+        self.assertEquals(
+            td1.diff(revision=2, path=("A", "W")), {"W": {(3, ): "---3.0 +++-1.0", (50, ): "---50.0 +++-1.0"}})
+
+    def test_diff_of_whole_and_entry_updates(self):
+        td1 = TraceableDict({"W": numpy.zeros(4)})
+        td1.set_array_events()
+        td1.commit(revision=1)
+
+        td1["W"] = numpy.array([1., 1., 1., 0.])
+        w = td1["W"].copy()
+        w[3] = 5
+        td1["W"] = w
+        self.assertEquals(td1.diff(), {"W": "---[0. 0. 0. 0.] +++[1. 1. 1. 5.]"})
+        td1.commit(revision=2)
+        self.assertEquals(td1.diff(revision=2), {"W": "---[0. 0. 0. 0.] +++[1. 1. 1. 5.]"})
+
+        w = td1["W"].copy()
+        w[0] = 7
+        td1["W"] = w
+        td1["W"] = numpy.array([9., 9., 9., 9.])
+        self.assertEquals(td1.diff(), {"W": "---[1. 1. 1. 5.] +++[9. 9. 9. 9.]"})
+
+
+class CompactEventTests(unittest.TestCase):
+
+    def _build(self, compact):
+        setup = TraceableDict.set_compact_events if compact else None
+        return _history({"A": {"B": 1, "C": {"D": 1}}, "E": 1}, _nested_change, 4, setup=setup)[0]
+
+    def test_same_results(self):
+        from traceable_dict._event import Event
+
+        td1, td2 = self._build(compact=False), self._build(compact=True)
+
+        self.assertEquals(td2.trace, td1.trace)
+        self.assertTrue(all(isinstance(event, Event) for events in td2.trace.values() for event in events))
+
+        for revision in td1.revisions:
+            self.assertEquals(td2.checkout(revision=revision).as_dict(), td1.checkout(revision=revision).as_dict())
+            self.assertEquals(
+                td2.checkout(revision=revision, shared=True).as_dict(),
+                td1.checkout(revision=revision, shared=True).as_dict())
+            self.assertEquals(
+                td2.checkout(revision=revision, lazy=True).as_dict(),
+                td1.checkout(revision=revision, lazy=True).as_dict())
+            self.assertEquals(td2.diff(revision=revision), td1.diff(revision=revision))
+
+        for path in [("A",), ("A", "C"), ("E",), ("F", "G")]:
+            self.assertEquals(list(td2.iter_log(path)), list(td1.iter_log(path)))
+            self.assertEquals(td2._augment(path).trace, td1._augment(path).trace)
+
+        td1.tracked()["A"]["B"] = 5
+        td2.tracked()["A"]["B"] = 5
+        self.assertTrue(isinstance(td2.trace[uncommitted][0], Event))
+        self.assertEquals(td2.diff(path=("A", "B")), td1.diff(path=("A", "B")))
+
+        td1.revert()
+        td2.revert()
+        self.assertEquals(td2.as_dict(), td1.as_dict())
+
+        td2.remove_oldest_revision()
+        self.assertEquals(td2.checkout(revision=2).as_dict(), td1.checkout(revision=2).as_dict())
+
+    def test_convert(self):
+        from traceable_dict._event import Event
+
+        td1 = self._build(compact=False)
+        trace = td1.trace
+
+        td1.set_compact_events()
+        self.assertEquals(td1.trace, trace)
+        self.assertTrue(all(isinstance(event, Event) for events in td1.trace.values() for event in events))
+        self.assertTrue((td1 | {"A": {}})._compact_events)
+
+        td1.set_compact_events(False)
+        self.assertEquals(td1.trace, trace)
+        self.assertTrue(all(type(event) is tuple for events in td1.trace.values() for event in events))
+
+        td1["E"] = 5
+        self.assertEquals(type(td1.trace[uncommitted][0]), tuple)
+
+    def test_pickle(self):
+        td1 = self._build(compact=True)
+
+        td2 = pickle.loads(pickle.dumps(td1))
+        self.assertEquals(td2.trace, td1.trace)
+        self.assertEquals(td2.checkout(revision=1).as_dict(), td1.checkout(revision=1).as_dict())
+
+
+class PathInterningTests(unittest.TestCase):
+
+    def _build(self):
+        def change(td, revision):
+            td.tracked()["service"]["limits"]["qps"] = revision
+            td["other"] = revision
+
+        return _history({"service": {"limits": {"qps": 0}}, "other": 0}, change, 100, first_revision=0)[0]
+
+    def _paths(self, td):
+        return set(id(path) for events in td.trace.values() for path, _, _ in events)
+
+    def test_paths_are_shared(self):
+        td1 = self._build()
+
+        self.assertEquals(len(self._paths(td1)), 2)
+        self.assertEquals(len(td1._paths), 2)
+
+        td1.set_compact_events()
+        td1.tracked()["service"]["limits"]["qps"] = "uncommitted"
+        self.assertEquals(len(self._paths(td1)), 2)
+
+    def test_shared_by_copies(self):
+        td1 = self._build()
+
+        for td2 in [td1 | {"service": {"limits": {"qps": -1}}, "other": -1},
+                    td1.checkout(revision=50),
+                    td1.checkout(revision=50, shared=True)]:
+            self.assertTrue(td2._paths is td1._paths)
+            td2.tracked()["service"]["limits"]["qps"] = -2
+            self.assertEquals(self._paths(td2), self._paths(td1))
+
+    def test_loaded_trace_is_interned(self):
+        td1 = self._build()
+        d = dict(td1)
+        d["__trace__"] = deepcopy(dict((key, [(tuple(list(path)), value, type_) for path, value, type_ in events])
+                                      for key, events in td1.trace.items()))
+
+        td2 = TraceableDict(d)
+        self.assertEquals(td2.trace, td1.trace)
+        self.assertEquals(len(self._paths(td2)), 2)
+
+    def test_pickle(self):
+        td1 = self._build()
+
+        not_interned = TraceableDict(td1)
+        not_interned["__trace__"] = dict(
+            (key, [(tuple(list(path)), value, type_) for path, value, type_ in events])
+            for key, events in td1.trace.items())
+        self.assertEquals(len(self._paths(not_interned)), 200)
+
+        data = pickle.dumps(td1)
+        self.assertTrue(len(data) < 0.75 * len(pickle.dumps(not_interned)))
+
+        td2 = pickle.loads(data)
+        self.assertEquals(td2.trace, td1.trace)
+        self.assertEquals(len(self._paths(td2)), 2)
+        self.assertEquals(len(td2._paths), 2)
+        td2.tracked()["service"]["limits"]["qps"] = -1
+        self.assertEquals(len(self._paths(td2)), 2)
+
+
+class SquashTests(unittest.TestCase):
+
+    def _build(self):
+        changes = {
+            2: lambda td: td.tracked()["A"].update({"B": 2}),
+            3: lambda td: td.update({"E": {"F": 1}}),
+            4: lambda td: td.tracked()["A"].update({"B": 3}),
+            5: lambda td: td.pop("E"),
+            6: lambda td: td.pop("C"),
+            7: lambda td: td.update({"C": 7, "G": 7}),
+            8: lambda td: td.pop("D"),
+            9: lambda td: td.tracked()["A"].update({"B": 9}),
+        }
+        return _history({"A": {"B": 1}, "C": 1, "D": 1}, lambda td, revision: changes[revision](td), 9)
+
+    def test_net_events(self):
+        td1, states = self._build()
+        td1.squash(from_revision=2, to_revision=8)
+
+        self.assertEquals(td1.revisions, [1, 8, 9])
+        self.assertEquals(sorted(td1.trace["8"]), sorted([
+            ((root, "A", "B"), 1, key_updated),
+            ((root, "C"), 1, key_updated),
+            ((root, "G"), None, key_added),
+            ((root, "D"), 1, key_removed)]))
+        self.assertEquals(td1.trace["9"], [((root, "A", "B"), 3, key_updated)])
+
+        for revision in td1.revisions:
+            self.assertEquals(td1.checkout(revision=revision).as_dict(), states[revision])
+            self.assertEquals(td1.checkout(revision=revision, lazy=True).as_dict(), states[revision])
+        self.assertEquals(td1.log(("A", "B")), {1: {"B": 1}, 8: {"B": 3}, 9: {"B": 9}})
+
+    def test_cancelled_range(self):
+        td1, states = self._build()
+        td1.squash(from_revision=3, to_revision=5)
+
+        self.assertEquals(td1.revisions, [1, 2, 5, 6, 7, 8, 9])
+        self.assertEquals(td1.trace["5"], [((root, "A", "B"), 2, key_updated)])
+        self.assertEquals(td1.checkout(revision=2).as_dict(), states[2])
+
+        td1.squash(from_revision=5, to_revision=7)
+        self.assertEquals(td1.trace["7"], [
+            ((root, "A", "B"), 2, key_updated), ((root, "C"), 1, key_updated), ((root, "G"), None, key_added)])
+        self.assertEquals(td1.checkout(revision=2).as_dict(), states[2])
+
+    def test_add_then_remove(self):
+        td1 = TraceableDict({"A": 1})
+        td1.commit(revision=1)
+        td1["B"] = 2
+        td1.commit(revision=2)
+        del td1["B"]
+        td1.commit(revision=3)
+        td1.squash(from_revision=2, to_revision=3)
+
+        self.assertEquals(td1.revisions, [1, 3])
+        self.assertEquals(td1.trace, {})
+        self.assertEquals(td1.checkout(revision=1).as_dict(), {"A": 1})
+        self.assertEquals(td1.checkout(revision=1, lazy=True).as_dict(), {"A": 1})
+        self.assertEquals(td1.checkout(revision=1, shared=True).as_dict(), {"A": 1})
+        self.assertEquals(td1.diff(revision=3), {"A": 1})
+        self.assertEquals(td1.log(("A", )), {1: {"A": 1}})
+
+    def test_squash_from_base(self):
+        td1, states = self._build()
+        td1.squash(from_revision=1, to_revision=4)
+
+        self.assertEquals(td1.revisions, [4, 5, 6, 7, 8, 9])
+        self.assertTrue("4" not in td1.trace)
+        for revision in td1.revisions:
+            self.assertEquals(td1.checkout(revision=revision).as_dict(), states[revision])
+
+    def test_keyframes(self):
+        td1, states = self._build()
+        for revision in [3, 5, 7]:
+            td1.add_keyframe(revision)
+
+        td1.squash(from_revision=2, to_revision=5)
+        self.assertEquals(td1.keyframes, [5, 7])
+
+        td1.squash(from_revision=6, to_revision=8)
+        self.assertEquals(td1.keyframes, [5])
+
+        td1.squash(from_revision=1, to_revision=5)
+        self.assertEquals(td1.keyframes, [5])
+        for revision in td1.revisions:
+            self.assertEquals(td1.checkout(revision=revision).as_dict(), states[revision])
+
+        td1.drop_keyframe(5)
+        td1.squash(from_revision=5, to_revision=8)
+        self.assertTrue("__keyframes__" not in td1)
+
+    def test_uncommitted_and_index(self):
+        td1, states = self._build()
+        td1.log(("A", "B"))
+        td1.tracked()["A"]["B"] = "uncommitted"
+
+        td1.squash(from_revision=2, to_revision=9)
+        self.assertEquals(td1.trace["9"], [((root, "A", "B"), 1, key_updated), ((root, "C"), 1, key_updated),
+                                           ((root, "G"), None, key_added), ((root, "D"), 1, key_removed)])
+        self.assertEquals(td1.trace[uncommitted], [((root, "A", "B"), 9, key_updated)])
+        self.assertEquals(td1._augment(("A", "B")).trace, {
+            "9": [((root, "B"), 1, key_updated)], uncommitted: [((root, "B"), 9, key_updated)]})
+
+        td1.commit(revision=10)
+        self.assertEquals(td1.checkout(revision=1).as_dict(), states[1])
+        self.assertEquals(td1.checkout(revision=9).as_dict(), states[9])
+
+    def test_compact_events(self):
+        from traceable_dict._event import Event
+
+        td1, states = self._build()
+        td1.set_compact_events()
+        td1.squash(from_revision=2, to_revision=8)
+
+        self.assertTrue(all(isinstance(event, Event) for event in td1.trace["8"]))
+        self.assertEquals(td1.checkout(revision=1).as_dict(), states[1])
+
+    def test_invalid(self):
+        td1, states = self._build()
+
+        with self.assertRaises(ValueError) as err:
+            td1.squash(from_revision=2, to_revision=55)
+        self.assertTrue("unknown revision 55" in err.exception)
+
+        with self.assertRaises(ValueError) as err:
+            td1.squash(from_revision="2", to_revision=5)
+        self.assertTrue("revision must be an integer" in err.exception)
+
+        for from_revision, to_revision in [(5, 5), (5, 2)]:
+            with self.assertRaises(ValueError) as err:
+                td1.squash(from_revision=from_revision, to_revision=to_revision)
+            self.assertTrue("from_revision must be earlier than to_revision" in err.exception)
+
+        self.assertEquals(td1.revisions, range(1, 10))
+
+
+class PruneTests(unittest.TestCase):
+
+    def _build(self, count):
+        def change(td, revision):
+            td.tracked()["A"]["B"] = revision
+            if revision % 3 == 0:
+                td["C"] = revision
+
+        return _history({"A": {"B": 0}, "C": 0}, change, count)
+
+    def test_prune_before(self):
+        td1, states = self._build(10)
+        td2, _ = self._build(10)
+
+        td1.prune_before(6)
+        for _ in range(5):
+            td2.remove_oldest_revision()
+
+        self.assertEquals(td1.revisions, range(6, 11))
+        self.assertEquals(td1, td2)
+        self.assertTrue("6" not in td1.trace)
+        for revision in td1.revisions:
+            self.assertEquals(td1.checkout(revision=revision).as_dict(), states[revision])
+
+        td1.prune_before(6)
+        self.assertEquals(td1.revisions, range(6, 11))
+
+    def test_keep_last(self):
+        td1, states = self._build(10)
+
+        td1.keep_last(20)
+        self.assertEquals(td1.revisions, range(1, 11))
+
+        td1.keep_last(3)
+        self.assertEquals(td1.revisions, [8, 9, 10])
+        self.assertEquals(sorted(td1.trace.keys()), ["10", "9"])
+        self.assertEquals(td1.checkout(revision=8).as_dict(), states[8])
+
+        td1.keep_last(1)
+        self.assertEquals(td1.revisions, [10])
+        self.assertEquals(td1.trace, {})
+
+    def test_index_and_keyframes(self):
+        td1, states = self._build(10)
+        td1.log(("C", ))
+        for revision in [3, 5, 7]:
+            td1.add_keyframe(revision)
+        td1["C"] = "uncommitted"
+
+        td1.prune_before(5)
+        self.assertEquals(td1.keyframes, [5, 7])
+        self.assertEquals(td1.log(("C", )), {5: {"C": 3}, 6: {"C": 6}, 9: {"C": 9}})
+        self.assertTrue(td1.has_uncommitted_changes)
+        self.assertEquals(td1.trace[uncommitted], [((root, "C"), 9, key_updated)])
+
+        td1.keep_last(2)
+        self.assertTrue("__keyframes__" not in td1)
+        self.assertEquals(td1._augment(("C", )).trace, {uncommitted: [((root, "C"), 9, key_updated)]})
+
+    def test_invalid(self):
+        td1, _ = self._build(5)
+
+        with self.assertRaises(ValueError) as err:
+            td1.prune_before(55)
+        self.assertTrue("unknown revision 55" in err.exception)
+
+        with self.assertRaises(ValueError) as err:
+            td1.prune_before("3")
+        self.assertTrue("revision must be an integer" in err.exception)
+
+        for count in [0, "2"]:
+            with self.assertRaises(ValueError) as err:
+                td1.keep_last(count)
+            self.assertTrue("count must be a positive integer" in err.exception)
+
+        self.assertEquals(td1.revisions, range(1, 6))
+
+
+class RetentionTests(unittest.TestCase):
+
+    def _commit(self, td1, first, last):
+        for revision in range(first, last + 1):
+            td1["a"] = revision
+            if revision % 2 == 0:
+                td1["b"] = revision
+            td1.commit(revision=revision)
+
+    def test_max_revisions(self):
+        td1 = TraceableDict({"a": 0, "b": 0})
+        td1.commit(revision=0)
+        td1.set_retention_policy(max_revisions=3)
+
+        self._commit(td1, 1, 10)
+        self.assertEquals(td1.revisions, [8, 9, 10])
+        self.assertEquals(td1.checkout(revision=8).as_dict(), {"a": 8, "b": 8})
+
+    def test_max_events(self):
+        td1 = TraceableDict({"a": 0, "b": 0})
+        td1.commit(revision=0)
+        td1.set_retention_policy(max_events=4)
+
+        self._commit(td1, 1, 10)
+        self.assertEquals(td1.revisions, [8, 9, 10])
+        self.assertEquals(td1.stats()["events"], 3)
+
+    def test_max_bytes(self):
+        td1 = TraceableDict({"a": 0})
+        td1.commit(revision=0)
+        td1.set_retention_policy(max_bytes=10000)
+
+        for revision in range(1, 50):
+            td1["a"] = "x" * 1000 + str(revision)
+            td1.commit(revision=revision)
+
+        self.assertTrue(5 < len(td1.revisions) < 10)
+        self.assertTrue(td1.stats()["bytes"] <= 10000)
+        self.assertEquals(td1.checkout(revision=td1.revisions[0]).as_dict(), {"a": "x" * 1000 + str(td1.revisions[0])})
+
+    def test_max_bytes_with_keyframes(self):
+        from traceable_dict._retention import approximate_size
+
+        td1 = TraceableDict({"a": 0, "b": "y" * 5000})
+        td1.commit(revision=0)
+        td1.set_keyframe_policy(every_revisions=2)
+        td1.set_retention_policy(max_bytes=30000)
+
+        for revision in range(1, 50):
+            td1["a"] = "x" * 1000 + str(revision)
+            td1.commit(revision=revision)
+
+        keyframes = sum(approximate_size(keyframe) for keyframe in td1["__keyframes__"].values())
+        self.assertTrue(keyframes > 0)
+        self.assertTrue(td1.stats()["bytes"] <= 30000)
+        self.assertEquals(td1.stats()["bytes"], keyframes + sum(
+            approximate_size(td1.trace.get(str(revision), [])) for revision in td1.revisions[1:]))
+        self.assertEquals(td1.checkout(revision=td1.revisions[0])["a"], "x" * 1000 + str(td1.revisions[0]))
+
+    def test_commit_inspects_new_and_evicted_revisions(self):
+        td1 = TraceableDict({"a": 0, "b": 0})
+        td1.commit(revision=0)
+        td1.set_keyframe_policy(every_revisions=5)
+        td1.set_retention_policy(max_events=20, max_bytes=10 ** 6)
+        self._commit(td1, 1, 200)
+
+        inspected = []
+        events_count = td1._events_count
+
+        def _counting_events_count(revision):
+            inspected.append(revision)
+            return events_count(revision)
+
+        td1._events_count = _counting_events_count
+        self._commit(td1, 201, 202)
+        self.assertTrue(len(inspected) <= 10)
+
+        stats = td1.stats()
+        td1._history_totals = None
+        self.assertEquals(td1.stats(), stats)
+        self.assertEquals(stats["events"], 20)
+
+    def test_max_age(self):
+        td1 = TraceableDict({"a": 0})
+        td1.commit(revision=0)
+        td1.set_retention_policy(max_age=100)
+
+        for revision in [50, 120, 180, 260]:
+            td1["a"] = revision
+            td1.commit(revision=revision)
+        self.assertEquals(td1.revisions, [180, 260])
+
+    def test_enforced_on_set(self):
+        td1 = TraceableDict({"a": 0, "b": 0})
+        td1.commit(revision=0)
+        self._commit(td1, 1, 10)
+        td1.add_keyframe(revision=5)
+        td1.add_keyframe(revision=9)
+
+        td1.set_retention_policy(max_revisions=2)
+        self.assertEquals(td1.revisions, [9, 10])
+        self.assertEquals(td1.keyframes, [9])
+
+        td1.set_retention_policy()
+        self._commit(td1, 11, 15)
+        self.assertEquals(td1.revisions, range(9, 16))
+
+    def test_policy_inherited(self):
+        td1 = TraceableDict({"a": 0, "b": 0})
+        td1.commit(revision=0)
+        td1.set_retention_policy(max_revisions=2)
+
+        td2 = td1 | {"a": 1}
+        td2.commit(revision=1)
+        td2 = td2 | {"a": 2}
+        td2.commit(revision=2)
+        self.assertEquals(td2.revisions, [1, 2])
+
+        td3 = td2.checkout(revision=1)
+        td3["a"] = 3
+        td3.commit(revision=3)
+        td3["a"] = 4
+        td3.commit(revision=4)
+        self.assertEquals(td3.revisions, [3, 4])
+
+        td4 = pickle.loads(pickle.dumps(td3))
+        self.assertEquals(td4.stats()["retention"]["max_revisions"], 2)
+
+    def test_stats(self):
+        td1 = TraceableDict({"a": 0, "b": 0})
+        self.assertEquals(td1.stats(), {
+            "revisions": 0, "events": 0, "uncommitted_events": 0, "bytes": 0, "keyframes": 0, "retention": None})
+
+        td1.commit(revision=0)
+        self._commit(td1, 1, 4)
+        td1.add_keyframe(revision=2)
+        td1["c"] = 1
+        td1.set_retention_policy(max_events=100)
+
+        stats = td1.stats()
+        self.assertEquals(stats["revisions"], 5)
+        self.assertEquals(stats["events"], 6)
+        self.assertEquals(stats["uncommitted_events"], 1)
+        self.assertTrue(stats["bytes"] > 0)
+        self.assertEquals(stats["keyframes"], 1)
+        self.assertEquals(stats["retention"], {"max_revisions": None, "max_events": 100, "max_bytes": None, "max_age": None})
+
+        td1.set_compact_events()
+        self.assertEquals(td1.stats()["events"], 6)
+
+    def test_invalid(self):
+        td1 = TraceableDict({"a": 0})
+
+        with self.assertRaises(ValueError) as err:
+            td1.set_retention_policy(max_revisions=0)
+        self.assertTrue("retention limit must be a positive integer or None" in err.exception)
+        self.assertEquals(td1.stats()["retention"], None)
+
+
+class TraceStoreTests(unittest.TestCase):
+
+    def _build(self, store=None):
+        def change(td, revision):
+            td.tracked()["A"]["B"] = revision
+            if revision % 3 == 0:
+                td["C"] = revision
+            if revision % 4 == 0:
+                td.tracked()["D"]["E"] = revision
+
+        setup = (lambda td: td.attach_store(store)) if store is not None else None
+        return _history({"A": {"B": 0}, "C": 0, "D": {"E": 0}}, change, 11, setup=setup)[0]
+
+    def _stores(self):
+        from traceable_dict import MemoryTraceStore, SqliteTraceStore
+        return [MemoryTraceStore(), SqliteTraceStore()]
+
+    def _counting_store(self, loaded):
+        from traceable_dict import SqliteTraceStore
+
+        class CountingStore(SqliteTraceStore):
+            def _load(self, key):
+                loaded.append(key)
+                return super(CountingStore, self)._load(key)
+
+        return CountingStore()
+
+    def test_history(self):
+        expected = self._build()
+        for store in self._stores():
+            td1 = self._build(store)
+
+            self.assertTrue(dict.__getitem__(td1, "__trace__") is store)
+            self.assertEquals(td1.trace, expected.trace)
+            self.assertEquals(td1, expected)
+            self.assertEquals(sorted(store), sorted(expected.trace.keys()))
+            for revision in td1.revisions:
+                self.assertEquals(td1.checkout(revision=revision), expected.checkout(revision=revision))
+                self.assertEquals(
+                    td1.checkout(revision=revision, lazy=True).as_dict(),
+                    expected.checkout(revision=revision, lazy=True).as_dict())
+                self.assertEquals(td1.diff(revision=revision), expected.diff(revision=revision))
+            for revision in [4, 8]:
+                self.assertEquals(td1.diff(revision=revision, path=("D", )), expected.diff(revision=revision, path=("D", )))
+            self.assertEquals(list(td1.iter_log(("D", "E"))), list(expected.iter_log(("D", "E"))))
+
+    def test_uncommitted(self):
+        expected = self._build()
+        for store in self._stores():
+            td1 = self._build(store)
+            committed = deepcopy(expected.as_dict())
+            for td in [td1, expected]:
+                td.tracked()["D"]["E"] = "uncommitted"
+                td["F"] = 1
+
+            self.assertTrue(td1.has_uncommitted_changes)
+            self.assertEquals(td1.diff(), expected.diff())
+            self.assertEquals(list(td1.iter_log(("D", "E"))), list(expected.iter_log(("D", "E"))))
+
+            td1.revert()
+            self.assertEquals(td1.as_dict(), committed)
+            self.assertFalse(uncommitted in store)
+            self.assertTrue(dict.__getitem__(td1, "__trace__") is store)
+
+            td1.clear()
+            td1.commit(revision=12)
+            self.assertEquals(td1.checkout(revision=11).as_dict(), committed)
+            self.assertEquals(td1.checkout(revision=12).as_dict(), {})
+            self.assertTrue(dict.__getitem__(td1, "__trace__") is store)
+            expected.revert()
+
+    def test_lazy_fetch(self):
+        loaded = []
+        td1 = self._build(self._counting_store(loaded))
+        self.assertEquals(td1.log(("D", )), {1: {"D": {"E": 0}}, 4: {"D": {"E": 4}}, 8: {"D": {"E": 8}}})
+        self.assertEquals(sorted(set(loaded)), ["4", "8"])
+
+        del loaded[:]
+        self.assertEquals(td1.checkout(revision=2, lazy=True)["C"], 0)
+        self.assertEquals(sorted(set(loaded)), ["3", "6", "9"])
+
+    def test_retention_does_not_fetch(self):
+        loaded = []
+        td1 = self._build(self._counting_store(loaded))
+        td1.set_retention_policy(max_events=50, max_bytes=10 ** 6)
+        td1.set_keyframe_policy(every_events=1000)
+        for revision in range(12, 200):
+            td1["C"] = revision
+            td1.commit(revision=revision)
+
+        self.assertEquals(td1.stats()["events"], 50)
+        self.assertEquals(td1.revisions[0], 149)
+        self.assertEquals(loaded, [])
+
+    def test_history_operations(self):
+        expected = self._build()
+        for store in self._stores():
+            td1 = self._build(store)
+            for td in [td1, expected]:
+                td.squash(from_revision=3, to_revision=5)
+                td.prune_before(5)
+                td.set_retention_policy(max_revisions=6)
+                td["C"] = 12
+                td.commit(revision=12)
+
+            self.assertEquals(td1.revisions, [7, 8, 9, 10, 11, 12])
+            self.assertEquals(td1.trace, expected.trace)
+            self.assertEquals(td1.log(("A", "B")), expected.log(("A", "B")))
+            expected = self._build()
+
+    def test_pipe_moves_store(self):
+        loaded = []
+        store = self._counting_store(loaded)
+        td1 = self._build(store)
+        expected = self._build()
+
+        td2 = td1 | {"A": {"B": 0}}
+        self.assertTrue(dict.__getitem__(td2, "__trace__") is store)
+        td2["C"] = 12
+        td2.commit(revision=12)
+        self.assertEquals(loaded, [])
+        self.assertEquals(store["12"][0], ((root, "A", "B"), 11, key_updated))
+
+        with self.assertRaises(ValueError) as err:
+            td1["C"] = 13
+        self.assertTrue("the trace store was moved to the result of |" in err.exception)
+        with self.assertRaises(ValueError):
+            td1.checkout(revision=2)
+        with self.assertRaises(ValueError):
+            td1.trace
+
+        td2["C"] = 13
+        td2.commit(revision=13)
+        for revision in expected.revisions:
+            self.assertEquals(td2.checkout(revision=revision).as_dict(), expected.checkout(revision=revision).as_dict())
+
+    def test_copies_in_memory(self):
+        import copy
+        from traceable_dict import SqliteTraceStore
+
+        store = SqliteTraceStore()
+        td1 = self._build(store)
+        expected = self._build()
+
+        for td2 in [copy.copy(td1), TraceableDict(td1)]:
+            self.assertTrue(isinstance(dict.__getitem__(td2, "__trace__"), dict))
+            self.assertEquals(td2.trace, expected.trace)
+
+        td2 = TraceableDict(td1)
+        for td in [td1, td2]:
+            td["C"] = "split"
+        td2["A"] = {"B": "copy"}
+        td1.commit(revision=12)
+        td2.commit(revision=12)
+        self.assertEquals(store["12"], [((root, "C"), 9, key_updated)])
+        self.assertEquals(len(td2.trace["12"]), 2)
+        self.assertEquals(td1.checkout(revision=11), expected.checkout(revision=11))
+        self.assertEquals(td2.checkout(revision=11), expected.checkout(revision=11))
+
+        td1.detach_store()
+        self.assertTrue(isinstance(dict.__getitem__(td1, "__trace__"), dict))
+        expected["C"] = "split"
+        expected.commit(revision=12)
+        self.assertEquals(td1, expected)
+
+    def test_checkout_fetches_replayed_revisions(self):
+        loaded = []
+        store = self._counting_store(loaded)
+        td1 = self._build(store)
+        expected = self._build()
+
+        td2 = td1.checkout(revision=9)
+        self.assertEquals(sorted(set(loaded)), ["10", "11"])
+        self.assertEquals(td2, expected.checkout(revision=9))
+
+        del loaded[:]
+        td2["C"] = "checked out"
+        td2.commit(revision=12)
+        self.assertFalse("12" in store)
+        self.assertEquals(td2.checkout(revision=8).as_dict(), expected.checkout(revision=8).as_dict())
+        self.assertEquals(sorted(set(loaded)), ["9"])
+
+        td2.prune_before(5)
+        self.assertEquals(sorted(store), sorted(expected.trace.keys()))
+        self.assertEquals(td2.log(("A", "B")), dict(
+            (revision, value) for revision, value in expected.log(("A", "B")).items() if 5 <= revision <= 9))
+
+        td1.prune_before(7)
+        with self.assertRaises(ValueError) as err:
+            td2.checkout(revision=5)
+        self.assertTrue("revision 7 was removed from the trace store" in err.exception)
+
+    def test_invalid_store(self):
+        from traceable_dict import MemoryTraceStore
+
+        td1 = self._build()
+        with self.assertRaises(TypeError) as err:
+            td1.attach_store({})
+        self.assertTrue("store must be a TraceStore" in err.exception)
+
+        store = MemoryTraceStore()
+        store["1"] = []
+        with self.assertRaises(ValueError) as err:
+            td1.attach_store(store)
+        self.assertTrue("cannot attach a non-empty trace store to a traceable dict with a trace" in err.exception)
+
+        td2 = TraceableDict({"A": 1, "__revisions__": [1, 2]})
+        store = MemoryTraceStore()
+        store["3"] = []
+        with self.assertRaises(ValueError) as err:
+            td2.attach_store(store)
+        self.assertTrue("trace store holds unknown revision 3" in err.exception)
+
+
+def _serialized_change(td, revision):
+    td.tracked()["A"]["B"] = revision
+    if revision % 3 == 0:
+        td["C"] = {"nested": [revision]}
+
+
+class BinaryFormatTests(unittest.TestCase):
+
+    def _build(self):
+        return _history({"A": {"B": 0, 1: (1, 2)}, "C": {"nested": [0]}, "D": 1.5, "E": u"e"}, _serialized_change, 7)[0]
+
+    def test_roundtrip(self):
+        from traceable_dict import RevisionList
+
+        td1 = self._build()
+        td1.add_keyframe(revision=4)
+        td1.tracked()["A"][1] = None
+
+        td2 = TraceableDict.from_bytes(td1.to_bytes())
+        self.assertEquals(td2, td1)
+        self.assertEquals(td2.trace, td1.trace)
+        self.assertEquals(td2.keyframes, [4])
+        self.assertTrue(isinstance(td2.revisions, RevisionList))
+        self.assertTrue(td2.has_uncommitted_changes)
+
+        td2.commit(revision=8)
+        td1.commit(revision=8)
+        for revision in td1.revisions:
+            self.assertEquals(td2.checkout(revision=revision).as_dict(), td1.checkout(revision=revision).as_dict())
+        self.assertEquals(td2.log(("A", "B")), td1.log(("A", "B")))
+
+    def test_uncommitted_flag(self):
+        td1 = TraceableDict({"A": 1})
+        self.assertTrue(TraceableDict.from_bytes(td1.to_bytes()).has_uncommitted_changes)
+
+        td1.commit(revision=1)
+        self.assertFalse(TraceableDict.from_bytes(td1.to_bytes()).has_uncommitted_changes)
+
+    def test_settings(self):
+        from traceable_dict._event import Event
+
+        td1 = self._build()
+        td1.set_compact_events()
+        td1.set_array_events()
+        td1.enable_digests()
+        td1.set_keyframe_policy(every_revisions=5)
+        td1.set_retention_policy(max_revisions=10, max_age=100)
+
+        td2 = TraceableDict.from_bytes(td1.to_bytes())
+        self.assertTrue(td2._compact_events and td2._array_events)
+        self.assertTrue(all(isinstance(event, Event) for event in td2.trace["2"]))
+        self.assertEquals(td2.root_digest, td1.root_digest)
+        self.assertEquals(td2._keyframe_every_revisions, 5)
+        self.assertEquals(td2.stats()["retention"], td1.stats()["retention"])
+
+        td2.tracked()["A"]["B"] = "new"
+        self.assertEquals(td2.trace[uncommitted], [((root, "A", "B"), 7, key_updated)])
+        self.assertTrue(td2.trace[uncommitted][0][0] is td2.trace["7"][0][0])
+
+    def test_store(self):
+        from traceable_dict import SqliteTraceStore
+
+        td1 = self._build()
+        expected = td1.to_bytes()
+        td1.attach_store(SqliteTraceStore())
+        self.assertEquals(TraceableDict.from_bytes(td1.to_bytes()).trace, TraceableDict.from_bytes(expected).trace)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_array_leaves(self):
+        td1 = TraceableDict({"A": numpy.arange(5)})
+        td1.commit(revision=1)
+        td1["A"] = numpy.arange(6)
+        td1.commit(revision=2)
+
+        with self.assertRaises(TypeError):
+            td1.to_bytes()
+
+        td2 = TraceableDict.from_bytes(td1.to_bytes(allow_pickle=True), allow_pickle=True)
+        self.assertTrue(numpy.array_equal(td2["A"], numpy.arange(6)))
+        self.assertTrue(numpy.array_equal(td2.checkout(revision=1)["A"], numpy.arange(5)))
+
+    def test_smaller_than_pickle(self):
+        td1 = self._build()
+        self.assertTrue(len(td1.to_bytes()) < len(pickle.dumps(td1)) / 2)
+
+
+class JsonLinesTests(unittest.TestCase):
+
+    def _build(self):
+        return _history(
+            {"A": {"B": 0, 1: (1, 2)}, "C": {"nested": [0]}, ("x", 1): 1.5, "E": u"e"}, _serialized_change, 7)[0]
+
+    def test_roundtrip(self):
+        from traceable_dict import RevisionList
+
+        td1 = self._build()
+        td1.add_keyframe(revision=4)
+        td1.tracked()["A"][1] = None
+
+        lines = list(td1.iter_jsonl())
+        self.assertEquals(len(lines), 1 + 6 + 1)
+
+        td2 = TraceableDict.from_jsonl(lines)
+        self.assertEquals(td2, td1)
+        self.assertEquals(td2.trace, td1.trace)
+        self.assertEquals(td2.keyframes, [4])
+        self.assertTrue(isinstance(td2.revisions, RevisionList))
+        self.assertTrue(td2.has_uncommitted_changes)
+        self.assertEquals(td2.trace[uncommitted], [((root, "A", 1), (1, 2), key_updated)])
+
+        td2.commit(revision=8)
+        td1.commit(revision=8)
+        for revision in td1.revisions:
+            self.assertEquals(td2.checkout(revision=revision).as_dict(), td1.checkout(revision=revision).as_dict())
+        self.assertEquals(td2.log(("A", "B")), td1.log(("A", "B")))
+
+    def test_revisions_without_events(self):
+        td1 = TraceableDict({"A": 1})
+        td1.commit(revision=1)
+        td1["B"] = 2
+        td1.commit(revision=2)
+        del td1["B"]
+        td1.commit(revision=3)
+        td1.squash(from_revision=2, to_revision=3)
+        self.assertTrue("3" not in td1.trace)
+
+        td2 = TraceableDict.from_jsonl(td1.iter_jsonl())
+        self.assertEquals(td2.revisions, td1.revisions)
+        self.assertEquals(td2.trace, td1.trace)
+        self.assertFalse(td2.has_uncommitted_changes)
+
+    def test_uncommitted_flag(self):
+        td1 = TraceableDict({"A": 1})
+        td2 = TraceableDict.from_jsonl(td1.iter_jsonl())
+        self.assertTrue(td2.has_uncommitted_changes)
+        self.assertEquals(td2.revisions, [])
+
+        td1.commit(revision=1)
+        self.assertFalse(TraceableDict.from_jsonl(td1.iter_jsonl()).has_uncommitted_changes)
+
+    def test_settings(self):
+        from traceable_dict._event import Event
+
+        td1 = self._build()
+        td1.set_compact_events()
+        td1.set_array_events()
+        td1.enable_digests()
+        td1.set_keyframe_policy(every_revisions=5)
+        td1.set_retention_policy(max_revisions=10, max_age=100)
+
+        td2 = TraceableDict.from_jsonl(td1.iter_jsonl())
+        self.assertTrue(td2._compact_events and td2._array_events)
+        self.assertTrue(all(isinstance(event, Event) for event in td2.trace["2"]))
+        self.assertEquals(td2.root_digest, td1.root_digest)
+        self.assertEquals(td2._keyframe_every_revisions, 5)
+        self.assertEquals(td2.stats()["retention"], td1.stats()["retention"])
+
+        td2.tracked()["A"]["B"] = "new"
+        self.assertTrue(td2.trace[uncommitted][0][0] is td2.trace["7"][0][0])
+
+    def test_file(self):
+        import os
+        import tempfile
+
+        td1 = self._build()
+        filename = os.path.join(tempfile.mkdtemp(), "history.jsonl")
+        with open(filename, "w") as f:
+            f.writelines(td1.iter_jsonl())
+        with open(filename) as f:
+            td2 = TraceableDict.from_jsonl(f)
+        os.remove(filename)
+
+        self.assertEquals(td2, td1)
+        self.assertEquals(td2.trace, td1.trace)
+
+    def test_store(self):
+        from traceable_dict import SqliteTraceStore
+
+        td1 = self._build()
+        expected = td1.trace
+        td1.attach_store(SqliteTraceStore())
+
+        store = SqliteTraceStore()
+        td2 = TraceableDict.from_jsonl(td1.iter_jsonl(), store=store)
+        self.assertTrue(td2["__trace__"] is store)
+        self.assertEquals(dict(store), expected)
+        self.assertEquals(td2.checkout(revision=1).as_dict(), td1.checkout(revision=1).as_dict())
+
+        with self.assertRaises(ValueError) as err:
+            TraceableDict.from_jsonl(td1.iter_jsonl(), store=store)
+        self.assertTrue("cannot import into a non-empty trace store" in err.exception)
+
+    def test_invalid(self):
+        td1 = self._build()
+        lines = list(td1.iter_jsonl())
+
+        with self.assertRaises(ValueError) as err:
+            TraceableDict.from_jsonl([])
+        self.assertTrue("not a traceable dict JSON lines stream" in err.exception)
+
+        with self.assertRaises(ValueError) as err:
+            TraceableDict.from_jsonl([lines[0], lines[2], lines[1]])
+        self.assertTrue("revisions must be increasing" in err.exception)
+
+class PickleTests(unittest.TestCase):
+
+    def _build(self):
+        def change(td, revision):
+            td.tracked()["A"]["B"] = revision
+
+        td1, _ = _history({"A": {"B": 0, 1: (1, 2)}, "C": {"nested": [0]}}, change, 5)
+        td1.tracked()["C"]["nested"] = [1]
+        return td1
+
+    def test_protocols(self):
+        import cPickle
+
+        td1 = self._build()
+        for dumps, loads in [(pickle.dumps, pickle.loads), (cPickle.dumps, cPickle.loads)]:
+            for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+                td2 = loads(dumps(td1, protocol))
+                self.assertEquals(td2, td1)
+                self.assertEquals(td2.trace, td1.trace)
+                self.assertTrue(td2.has_uncommitted_changes)
+                self.assertEquals(td2.log(("A", "B")), td1.log(("A", "B")))
+
+    def test_uncommitted_flag(self):
+        td1 = TraceableDict({"A": 1})
+        td1.commit(revision=1)
+        td1["A"] = 2
+        td1.revert()
+        self.assertFalse(td1.has_uncommitted_changes)
+        self.assertFalse(pickle.loads(pickle.dumps(td1, 2)).has_uncommitted_changes)
+
+        td1 = TraceableDict({"A": 1})
+        self.assertTrue(pickle.loads(pickle.dumps(td1, 2)).has_uncommitted_changes)
+
+    def test_settings(self):
+        td1 = self._build()
+        td1.set_compact_events()
+        td1.enable_digests()
+        td1.set_retention_policy(max_revisions=10)
+
+        td2 = pickle.loads(pickle.dumps(td1, 2))
+        self.assertTrue(td2._compact_events)
+        self.assertEquals(td2.root_digest, td1.root_digest)
+        self.assertEquals(td2.stats()["retention"], td1.stats()["retention"])
+        self.assertTrue(td2.trace["2"][0][0] is td2.trace["3"][0][0])
+
+    def test_store(self):
+        from traceable_dict import SqliteTraceStore
+
+        td1 = self._build()
+        expected = td1.trace
+        td1.attach_store(SqliteTraceStore())
+
+        td2 = pickle.loads(pickle.dumps(td1, 2))
+        self.assertEquals(type(td2.trace), dict)
+        self.assertEquals(td2.trace, expected)
+
+    def test_deepcopy(self):
+        td1 = self._build()
+        td1.enable_digests()
+
+        td2 = deepcopy(td1)
+        self.assertEquals(td2, td1)
+        self.assertTrue(td2.has_uncommitted_changes)
+        self.assertTrue(td2.digests._d is td2)
+
+        td2.tracked()["A"]["B"] = "new"
+        td2.commit(revision=6)
+        self.assertEquals(td1["A"]["B"], 5)
+        self.assertEquals(td1.revisions, [1, 2, 3, 4, 5])
+        self.assertEquals(td1.trace[uncommitted], [((root, "C", "nested"), [0], key_updated)])
+
+    def test_copy(self):
+        import copy
+
+        td1 = self._build()
+        td1.enable_digests()
+        digest = td1.root_digest
+
+        td2 = copy.copy(td1)
+        self.assertEquals(td2, td1)
+        self.assertTrue(td2.has_uncommitted_changes)
+        self.assertTrue(td2["A"] is td1["A"])
+
+        td2.tracked()["A"]["B"] = "new"
+        td2.commit(revision=6)
+        self.assertEquals(td1["A"]["B"], 5)
+        self.assertEquals(td1.revisions, [1, 2, 3, 4, 5])
+        self.assertEquals(td1.trace[uncommitted], [((root, "C", "nested"), [0], key_updated)])
+        self.assertEquals(td1.root_digest, digest)
+
+    def test_from_mmap(self):
+        import mmap
+        import tempfile
+
+        td1 = self._build()
+        with tempfile.TemporaryFile() as f:
+            f.write(td1.to_bytes())
+            f.flush()
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            td2 = TraceableDict.from_bytes(data)
+            data.close()
+
+        self.assertEquals(td2, td1)
+        self.assertEquals(td2.trace, td1.trace)
+        self.assertEquals(TraceableDict.from_bytes(buffer(td1.to_bytes())), td1)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,243 @@
+import unittest
+
+from copy import deepcopy
+
+from traceable_dict import RevisionView, TraceableDict, TrackedView
+from traceable_dict._utils import key_removed, key_added, key_updated, root, uncommitted
+
+
+class TrackedViewTest(unittest.TestCase):
+
+    def setUp(self):
+        self._d1 = {'a': {'b': 1, 'c': {'d': 2}}, 'e': 3}
+
+    def test_nested_values_are_views(self):
+        td1 = TraceableDict(deepcopy(self._d1))
+        view = td1.tracked()
+
+        self.assertTrue(isinstance(view['a'], TrackedView))
+        self.assertTrue(isinstance(view['a']['c'], TrackedView))
+        self.assertEquals(view['a']['c'].path, (root, 'a', 'c'))
+        self.assertEquals(view['a']['b'], 1)
+        self.assertEquals(view['e'], 3)
+        self.assertEquals(view['a'].as_dict(), self._d1['a'])
+
+        self.assertEquals(set(view.keys()), set(['a', 'e']))
+        self.assertEquals(len(view), 2)
+        self.assertEquals(len(view['a']), 2)
+        self.assertNotIn('__trace__', view)
+
+        with self.assertRaises(KeyError):
+            view['__trace__']
+
+    def test_deep_write(self):
+        r1, r2 = 1, 2
+
+        td1 = TraceableDict(deepcopy(self._d1))
+        td1.commit(revision=r1)
+
+        view = td1.tracked()
+        view['a']['b'] = 10
+        view['a']['c']['d'] = 20
+        view['a']['c']['new'] = {'x': 1}
+        del view['a']['c']['new']['x']
+
+        self.assertTrue(td1.has_uncommitted_changes)
+        self.assertEquals(td1.as_dict(), {'a': {'b': 10, 'c': {'d': 20, 'new': {}}}, 'e': 3})
+        self.assertEquals(
+            td1.trace,
+            {uncommitted: [
+                ((root, 'a', 'b'), 1, key_updated),
+                ((root, 'a', 'c', 'd'), 2, key_updated),
+                ((root, 'a', 'c', 'new', 'x'), None, key_added),
+                ((root, 'a', 'c', 'new', 'x'), 1, key_removed)]})
+
+        td1.commit(revision=r2)
+
+        result_r1 = td1.checkout(revision=r1)
+        self.assertEquals(result_r1.as_dict(), self._d1)
+
+    def test_root_write(self):
+        td1 = TraceableDict(deepcopy(self._d1))
+        td1.commit(revision=1)
+
+        view = td1.tracked()
+        view['e'] = 4
+        del view['a']
+
+        self.assertEquals(td1.as_dict(), {'e': 4})
+        self.assertEquals(len(td1.trace[uncommitted]), 3)
+
+        with self.assertRaises(KeyError):
+            del view['__revisions__']
+
+    def test_revert(self):
+        td1 = TraceableDict(deepcopy(self._d1))
+        td1.commit(revision=1)
+
+        td1.tracked()['a']['c']['d'] = 'updated'
+        self.assertTrue(td1.has_uncommitted_changes)
+
+        td1.revert()
+        self.assertFalse(td1.has_uncommitted_changes)
+        self.assertEquals(td1.as_dict(), self._d1)
+
+    def test_write_is_path_local(self):
+        from traceable_dict import _view
+
+        sizes = []
+        find_diff = _view.DictDiff.find_diff
+
+        def _sizing_find_diff(t1, t2, *args, **kwargs):
+            sizes.append(len(t1) + len(t2))
+            return find_diff(t1, t2, *args, **kwargs)
+
+        td1 = TraceableDict(dict(('k%d' % i, {'v': {'w': i}}) for i in range(10000)))
+        td1.commit(revision=1)
+
+        _view.DictDiff.find_diff = staticmethod(_sizing_find_diff)
+        try:
+            td1.tracked()['k5']['v']['w'] = 'updated'
+        finally:
+            _view.DictDiff.find_diff = staticmethod(find_diff)
+
+        self.assertEquals(sizes, [2])
+        self.assertEquals(td1.trace[uncommitted], [((root, 'k5', 'v', 'w'), 5, key_updated)])
+
+
+class RevisionViewTest(unittest.TestCase):
+
+    def _build(self):
+        td1 = TraceableDict({'a': {'b': 1, 'c': {'d': [1, 2]}}, 'e': 3})
+        td1.commit(revision=1)
+        states = {1: deepcopy(td1.as_dict())}
+
+        td1.tracked()['a']['b'] = 2
+        td1['f'] = {'g': 1}
+        td1.commit(revision=2)
+        states[2] = deepcopy(td1.as_dict())
+
+        del td1['e']
+        td1.tracked()['a']['c']['d'] = [1, 2, 3]
+        td1.commit(revision=3)
+        states[3] = deepcopy(td1.as_dict())
+
+        td1['e'] = 'back'
+        td1.tracked()['f']['g'] = 2
+        td1.commit(revision=4)
+        states[4] = deepcopy(td1.as_dict())
+        return td1, states
+
+    def test_basic(self):
+        td1, states = self._build()
+
+        for revision in td1.revisions:
+            view = td1.checkout(revision=revision, lazy=True)
+            self.assertTrue(isinstance(view, RevisionView))
+            self.assertEquals(view.revision, revision)
+            self.assertEquals(set(view.keys()), set(states[revision].keys()))
+            self.assertEquals(len(view), len(states[revision]))
+            for key in states[revision]:
+                self.assertEquals(view[key], states[revision][key])
+            self.assertEquals(view.as_dict(), states[revision])
+            self.assertEquals(dict(view), states[revision])
+
+    def test_missing_keys(self):
+        td1, states = self._build()
+
+        view = td1.checkout(revision=1, lazy=True)
+        self.assertNotIn('f', view)
+        self.assertEquals(view.get('f'), None)
+        with self.assertRaises(KeyError):
+            view['f']
+        with self.assertRaises(KeyError):
+            view['__trace__']
+
+        view = td1.checkout(revision=3, lazy=True)
+        self.assertNotIn('e', view)
+
+    def test_values_are_copies(self):
+        td1, states = self._build()
+
+        view = td1.checkout(revision=2, lazy=True)
+        view['a']['c']['d'].append('changed')
+        view['f']['g'] = 'changed'
+
+        self.assertEquals(td1.as_dict(), states[4])
+        self.assertEquals(td1.checkout(revision=2).as_dict(), states[2])
+        self.assertEquals(view['a'], states[2]['a'])
+
+    def test_read_only(self):
+        td1, states = self._build()
+
+        view = td1.checkout(revision=2, lazy=True)
+        with self.assertRaises(TypeError):
+            view['a'] = 1
+
+    def test_follows_live_dict(self):
+        td1, states = self._build()
+        view = td1.checkout(revision=2, lazy=True)
+
+        td1['e'] = 'replaced'
+        td1.commit(revision=5)
+        td1.tracked()['a']['b'] = 'uncommitted'
+
+        self.assertEquals(view.as_dict(), states[2])
+
+    def test_keyframes(self):
+        td1, states = self._build()
+        td1.add_keyframe(revision=3)
+
+        for revision in td1.revisions:
+            self.assertEquals(td1.checkout(revision=revision, lazy=True).as_dict(), states[revision])
+
+    def test_invalid_revision(self):
+        td1, states = self._build()
+
+        with self.assertRaises(ValueError) as err:
+            td1.checkout(revision=55, lazy=True)
+        self.assertTrue('unknown revision 55' in err.exception)
+
+        with self.assertRaises(ValueError) as err:
+            td1.checkout(revision='1', lazy=True)
+        self.assertTrue('revision must be an integer' in err.exception)
+
+    def test_pruned_revision(self):
+        td1, states = self._build()
+        view = td1.checkout(revision=2, lazy=True)
+
+        td1.remove_oldest_revision()
+        td1.remove_oldest_revision()
+        with self.assertRaises(ValueError) as err:
+            view['a']
+        self.assertTrue('unknown revision 2' in err.exception)
+        with self.assertRaises(ValueError):
+            view.as_dict()
+
+    def test_only_path_events_are_replayed(self):
+        from traceable_dict import _traceable
+
+        td1 = TraceableDict(dict(('k%d' % i, 0) for i in range(1000)))
+        td1.commit(revision=0)
+        for revision in range(1, 100):
+            td1['k%d' % revision] = revision
+            td1.commit(revision=revision)
+
+        calls = []
+        nested_setitem = _traceable.nested_setitem
+
+        def _counting_nested_setitem(*args):
+            calls.append(1)
+            return nested_setitem(*args)
+
+        _traceable.nested_setitem = _counting_nested_setitem
+        try:
+            self.assertEquals(td1.checkout(revision=0, lazy=True)['k50'], 0)
+        finally:
+            _traceable.nested_setitem = nested_setitem
+
+        self.assertEquals(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
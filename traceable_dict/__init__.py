@@ -6,10 +6,40 @@ from _diff import DictDiff
 __all__ += ['DictDiff']
 
 
+from _digest import DigestCache, MerkleDigests
+
+__all__ += ['DigestCache', 'MerkleDigests']
+
+
+from _retention import RetentionPolicy
+
+__all__ += ['RetentionPolicy']
+
+
+from _log import LogTraceStore
+
+__all__ += ['LogTraceStore']
+
+
+from _revisions import RevisionList
+
+__all__ += ['RevisionList']
+
+
+from _store import TraceStore, MemoryTraceStore, SqliteTraceStore
+
+__all__ += ['TraceStore', 'MemoryTraceStore', 'SqliteTraceStore']
+
+
 from _traceable import TraceableDict
 
 __all__ += ['TraceableDict']
 
 
+from _view import RevisionView, TrackedView
+
+__all__ += ['RevisionView', 'TrackedView']
+
+
 
 
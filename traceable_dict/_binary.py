@@ -0,0 +1,347 @@
+import cPickle
+import struct
+
+from _event import Event, event_codes, event_types
+from _utils import root, uncommitted
+
+__all__ = []
+
+
+_magic = 'TDB'
+
+_version = 1
+
+_double = struct.Struct('<d')
+
+_no_key = object()
+
+_sized_tags = frozenset('srildLtuP')
+
+_options = (
+    'uncommitted', 'compact_events', 'array_events', 'digests',
+    'keyframe_every_revisions', 'keyframe_every_events', 'retention')
+
+
+def _zigzag(n):
+    return 2 * n if n >= 0 else -2 * n - 1
+
+
+def _unzigzag(n):
+    return n // 2 if n % 2 == 0 else -(n + 1) // 2
+
+
+class _Writer(object):
+
+    def __init__(self, allow_pickle=False):
+        self.chunks = []
+        self.strings = {}
+        self.allow_pickle = allow_pickle
+
+    def varint(self, n):
+        chunks = self.chunks
+        while n >= 0x80:
+            chunks.append(chr((n & 0x7f) | 0x80))
+            n >>= 7
+        chunks.append(chr(n))
+
+    def value(self, value):
+        """
+        Write a value in the typed leaf encoding: a one-letter type tag, followed by the value.
+        A str that was already written is written as a reference to its first occurrence.
+        Containers are written iteratively, so deeply nested values do not hit the recursion limit.
+        Values of other types than None, bool, int, long, float, str, unicode, tuple, list and dict
+        are pickled if allow_pickle is set, and raise TypeError otherwise.
+        """
+        chunks, strings, varint = self.chunks, self.strings, self.varint
+        stack = [value]
+        while stack:
+            value = stack.pop()
+            type_ = type(value)
+            if type_ is str:
+                ref = strings.get(value)
+                if ref is None:
+                    strings[value] = len(strings)
+                    chunks.append('s')
+                    varint(len(value))
+                    chunks.append(value)
+                else:
+                    chunks.append('r')
+                    varint(ref)
+            elif type_ is int:
+                chunks.append('i')
+                varint(2 * value if value >= 0 else -2 * value - 1)
+            elif type_ is dict:
+                chunks.append('d')
+                varint(len(value))
+                items = []
+                for item in value.iteritems():
+                    items.extend(item)
+                stack.extend(reversed(items))
+            elif type_ is list or type_ is tuple:
+                chunks.append('L' if type_ is list else 't')
+                varint(len(value))
+                stack.extend(reversed(value))
+            elif value is None:
+                chunks.append('N')
+            elif type_ is bool:
+                chunks.append('T' if value else 'F')
+            elif type_ is long:
+                chunks.append('l')
+                varint(_zigzag(value))
+            elif type_ is float:
+                chunks.append('f')
+                chunks.append(_double.pack(value))
+            elif type_ is unicode:
+                value = value.encode('utf-8')
+                chunks.append('u')
+                varint(len(value))
+                chunks.append(value)
+            else:
+                if not self.allow_pickle:
+                    raise TypeError("cannot encode a value of type %s without allow_pickle" % type_.__name__)
+                value = cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+                chunks.append('P')
+                varint(len(value))
+                chunks.append(value)
+
+    def getvalue(self):
+        return ''.join(self.chunks)
+
+
+class _Reader(object):
+
+    def __init__(self, data, allow_pickle=False):
+        self.data = data
+        self.pos = 0
+        self.strings = []
+        self.allow_pickle = allow_pickle
+
+    def varint(self):
+        data, pos = self.data, self.pos
+        n, shift = 0, 0
+        while True:
+            if pos >= len(data):
+                raise ValueError("truncated traceable dict binary")
+            byte = ord(data[pos])
+            pos += 1
+            n |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        self.pos = pos
+        return n
+
+    def bytes(self, size):
+        start = self.pos
+        self.pos += size
+        if self.pos > len(self.data):
+            raise ValueError("truncated traceable dict binary")
+        return self.data[start:self.pos]
+
+    def value(self):
+        data, pos, strings = self.data, self.pos, self.strings
+        frames = []
+        try:
+            while True:
+                tag = data[pos]
+                pos += 1
+                if tag in _sized_tags:
+                    size = ord(data[pos])
+                    pos += 1
+                    if size >= 0x80:
+                        self.pos = pos - 1
+                        size = self.varint()
+                        pos = self.pos
+
+                    if tag == 's':
+                        value = data[pos:pos + size]
+                        pos += size
+                        strings.append(value)
+                    elif tag == 'r':
+                        value = strings[size]
+                    elif tag == 'i':
+                        value = int(_unzigzag(size))
+                    elif tag == 'd' or tag == 'L' or tag == 't':
+                        if size:
+                            frames.append([{} if tag == 'd' else [], size, _no_key, tag])
+                            continue
+                        value = {} if tag == 'd' else [] if tag == 'L' else ()
+                    else:
+                        self.pos = pos
+                        value = self._sized_leaf(tag, size)
+                        pos = self.pos
+                elif tag == 'N':
+                    value = None
+                elif tag == 'T':
+                    value = True
+                elif tag == 'F':
+                    value = False
+                elif tag == 'f':
+                    value, = _double.unpack(data[pos:pos + 8])
+                    pos += 8
+                else:
+                    raise ValueError("unknown value tag %r in traceable dict binary" % tag)
+
+                while True:
+                    if not frames:
+                        if pos > len(data):
+                            raise ValueError("truncated traceable dict binary")
+                        self.pos = pos
+                        return value
+
+                    frame = frames[-1]
+                    if frame[3] == 'd':
+                        if frame[2] is _no_key:
+                            frame[2] = value
+                            break
+                        frame[0][frame[2]] = value
+                        frame[2] = _no_key
+                    else:
+                        frame[0].append(value)
+
+                    frame[1] -= 1
+                    if frame[1]:
+                        break
+                    frames.pop()
+                    value = tuple(frame[0]) if frame[3] == 't' else frame[0]
+
+        except (IndexError, struct.error):
+            raise ValueError("truncated traceable dict binary")
+
+    def _sized_leaf(self, tag, size):
+        if tag == 'l':
+            return long(_unzigzag(size))
+        if tag == 'u':
+            return self.bytes(size).decode('utf-8')
+        if not self.allow_pickle:
+            raise ValueError("cannot decode a pickled value without allow_pickle")
+        return cPickle.loads(self.bytes(size))
+
+
+def dumps(tree, revisions, trace, keyframes, options, allow_pickle=False):
+    """
+    Encode a traceable dict in the versioned binary format.
+
+    The format starts with the magic string 'TDB' and a version byte, followed by the options,
+    the working tree, the revisions (the first revision and then the gaps between consecutive
+    revisions, as varints), the table of the distinct paths of the trace events, the trace events
+    (each with the varint id of its path, its type code and its old value), and the keyframes.
+
+    Params:
+    -------
+    tree: dict,
+        The working tree.
+    revisions: list,
+        The sorted revisions.
+    trace: dict,
+        The trace, mapping trace keys to lists of trace events.
+    keyframes: dict,
+        The keyframes, mapping revision keys to snapshots.
+    options: dict,
+        The settings of the traceable dict (see _options), stored by position.
+    allow_pickle: bool,
+        Whether values of other types than the encoded ones are pickled.
+
+    Returns:
+    -------
+    data: str,
+        The encoded traceable dict.
+    """
+    writer = _Writer(allow_pickle)
+    writer.chunks.append(_magic + chr(_version))
+    writer.value(tuple(options[name] for name in _options))
+    writer.value(tree)
+
+    writer.varint(len(revisions))
+    previous = None
+    for revision in revisions:
+        writer.varint(_zigzag(revision) if previous is None else revision - previous)
+        previous = revision
+
+    paths = {}
+    for events in trace.itervalues():
+        for event in events:
+            paths.setdefault(event[0], len(paths))
+    writer.varint(len(paths))
+    for path, _ in sorted(paths.iteritems(), key=lambda item: item[1]):
+        writer.value(tuple(path[1:]))
+
+    writer.varint(len(trace))
+    for key, events in trace.iteritems():
+        writer.varint(0 if key == uncommitted else _zigzag(int(key)) + 1)
+        writer.varint(len(events))
+        for event in events:
+            path, value, type_ = event
+            writer.varint(paths[path])
+            writer.chunks.append(chr(event_codes[type_]))
+            writer.value(value)
+
+    writer.varint(len(keyframes))
+    for key, snapshot in keyframes.iteritems():
+        writer.varint(_zigzag(int(key)))
+        writer.value(snapshot)
+
+    return writer.getvalue()
+
+
+__all__ += ['dumps']
+
+
+def loads(data, allow_pickle=False):
+    """
+    Decode a traceable dict from the versioned binary format (see dumps).
+    Leaf strings are sliced directly out of the data, so a buffer or a memory-mapped file is
+    decoded without being copied into a string first.
+
+    Params:
+    -------
+    data: str, buffer or mmap,
+        The encoded traceable dict.
+    allow_pickle: bool,
+        Whether pickled values are loaded (unpickling runs arbitrary code).
+
+    Returns:
+    -------
+    tree, revisions, trace, keyframes, options, paths: tuple,
+        The decoded parts of the traceable dict, where paths lists the distinct paths of the trace
+        events (each shared by all the events on the path).
+    """
+    if data[:len(_magic)] != _magic or len(data) <= len(_magic):
+        raise ValueError("not a traceable dict binary")
+    version = ord(data[len(_magic)])
+    if version > _version:
+        raise ValueError("unsupported traceable dict binary version %d" % version)
+
+    reader = _Reader(data, allow_pickle)
+    reader.pos = len(_magic) + 1
+    options = dict(zip(_options, reader.value()))
+    compact_events = options['compact_events']
+    tree = reader.value()
+
+    revisions = []
+    for i in xrange(reader.varint()):
+        gap = reader.varint()
+        revisions.append(_unzigzag(gap) if i == 0 else revisions[-1] + gap)
+
+    paths = [(root, ) + reader.value() for _ in xrange(reader.varint())]
+
+    trace = {}
+    for _ in xrange(reader.varint()):
+        key = reader.varint()
+        key = uncommitted if key == 0 else str(_unzigzag(key - 1))
+        events = trace[key] = []
+        for _ in xrange(reader.varint()):
+            path = paths[reader.varint()]
+            code = ord(reader.bytes(1))
+            value = reader.value()
+            events.append(Event(path, value, code) if compact_events else (path, value, event_types[code]))
+
+    keyframes = {}
+    for _ in xrange(reader.varint()):
+        key = str(_unzigzag(reader.varint()))
+        keyframes[key] = reader.value()
+
+    return tree, revisions, trace, keyframes, options, paths
+
+
+__all__ += ['loads']
@@ -1,8 +1,23 @@
+import multiprocessing
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from _utils import key_added, key_removed, key_updated, root
 
 __all__ = []
 
 
+_array_types = (numpy.ndarray, ) if numpy is not None else ()
+
+
+def _diff_task(args):
+    t1, t2, path, array_events = args
+    return DictDiff.find_diff(t1, t2, path, array_events=array_events)
+
+
 class DictDiff(object):
     """
     Deep nested difference of dicts, identifying added, removed and changed keys.
@@ -14,6 +29,10 @@ class DictDiff(object):
         2. if a value of a leaf changes from non-dict to dict, this is a scheme change.
            Which is not supported here.
 
+    NumPy array leaves (when NumPy is installed) are compared by their shape, dtype and entries.
+    An array replaced by an array of the same shape and dtype can optionally be traced by the
+    changed entries only, each under the path of the array followed by the index of the entry.
+
     Example:
 
         >>> from traceable_dict import DictDiff
@@ -28,9 +47,15 @@ class DictDiff(object):
     """
    
     @staticmethod
-    def find_diff(t1, t2, path=[root]):
+    def find_diff(t1, t2, path=[root], digests=None, array_events=False, workers=None, parallel_threshold=256):
         """
         Find deep nested difference in dicts.
+
+        Given workers, the nested dicts under the top-level keys are compared across a pool of
+        processes, and the updates are merged in the order of the serial comparison. Every nested
+        dict is sent to a worker process, so this pays off only for large nested dicts, on more than
+        one CPU. On a single CPU, or with fewer top-level keys than parallel_threshold, the
+        comparison stays serial.
         
         Params:
         -------
@@ -38,42 +63,231 @@ class DictDiff(object):
             Original dictionary.
         t2: dict,
             Other dictionary, to compare to.
+        digests: DigestCache or MerkleDigests (or a pair of those),
+            Optional provider of nested dict digests, used to skip the nested dicts
+            with equal content. A pair holds separate providers for t1 and t2. A MerkleDigests
+            digests only the dict it was built for, so the other dict is given a provider of its
+            own in a pair (a single MerkleDigests skips none of the nested dicts of the other dict).
+        array_events: bool,
+            If True, an array leaf replaced by an array of the same shape and dtype is traced by
+            its changed entries, unless more than half of its entries changed.
+        workers: int or multiprocessing.Pool,
+            Optional number of worker processes (or a pool of them) to compare the nested
+            dicts under the top-level keys with.
+        parallel_threshold: int,
+            The minimal number of top-level nested dicts to compare for the comparison to be
+            split across the workers (below it, the comparison stays serial).
 
         Returns:
         -------
         updates: list,
             List of updates that happened while in the transition from t1 to t2.
         """
-        t1_keys = set(t1.keys())
-        t2_keys = set(t2.keys())
-        
-        t_keys_intersect = t2_keys.intersection(t1_keys)
-        
-        t_keys_added = t2_keys - t_keys_intersect
-        t_keys_removed = t1_keys - t_keys_intersect
-        
-        updates = []
-        for k in t_keys_intersect:
-            
-            curr_path = path[:]
-            curr_path.append(k)
-            
-            if (not isinstance(t1[k], dict)) and (not isinstance(t2[k], dict)):
-                if (t1[k] != t2[k]):
-                    updates.append((tuple(curr_path), t1[k], key_updated))
+        if workers is not None and DictDiff._parallel(t1, t2, parallel_threshold):
+            return DictDiff._parallel_diff(
+                t1, t2, tuple(path), digests, array_events, workers, parallel_threshold)
+        return list(DictDiff.iter_diff(t1, t2, path, digests, array_events))
+
+    @staticmethod
+    def iter_diff(t1, t2, path=[root], digests=None, array_events=False):
+        """
+        Find deep nested difference in dicts, yielding the updates one at a time as they are found.
+        Only the pending state of the nested dicts being compared is held in memory, so the diff can
+        be streamed to a file or a socket. The dicts must not change while the diff is consumed.
+
+        Values that are the very same object are never compared, so unchanged subtrees shared by
+        both dicts are skipped. Given a digests provider, nested dicts with equal digests are
+        skipped as well, so comparing two traceable dicts that keep Merkle digests descends only
+        into the branches that differ.
+
+        Example:
+
+            >>> from traceable_dict import DictDiff
+            >>>
+            >>> d1 = {'key': {'nested_key': 'old_value'}}
+            >>> d2 = {'key': {'nested_key': 'new_value'}}
+            >>>
+            >>> for update in DictDiff.iter_diff(d1, d2):
+            ...     print update
+            (('_root_', 'key', 'nested_key'), 'old_value', '__u__')
+
+        Params:
+        -------
+        t1 : dict,
+            Original dictionary.
+        t2: dict,
+            Other dictionary, to compare to.
+        digests: DigestCache or MerkleDigests (or a pair of those),
+            Optional provider of nested dict digests, used to skip the nested dicts
+            with equal content. A pair holds separate providers for t1 and t2. A MerkleDigests
+            digests only the dict it was built for, so the other dict is given a provider of its
+            own in a pair (a single MerkleDigests skips none of the nested dicts of the other dict).
+        array_events: bool,
+            If True, an array leaf replaced by an array of the same shape and dtype is traced by
+            its changed entries, unless more than half of its entries changed.
+
+        Returns:
+        -------
+        updates: generator,
+            Generator of the updates that happened while in the transition from t1 to t2,
+            in the order of find_diff.
+        """
+        if t1 is t2:
+            return
+        if digests is not None and DictDiff._same_digest(digests, t1, t2, tuple(path)):
+            return
+
+        stack = [DictDiff._frame(t1, t2, tuple(path))]
+        while stack:
+            t1_, t2_, path_, keys, keys_added, keys_removed = stack[-1]
+
+            for k in keys:
+                updates = DictDiff._key_diff(t1_[k], t2_[k], path_ + (k, ), digests, array_events)
+                if updates is None:
+                    stack.append(DictDiff._frame(t1_[k], t2_[k], path_ + (k, )))
+                    break
+                for update in updates:
+                    yield update
+
             else:
-                updates.extend(DictDiff.find_diff(t1[k], t2[k], curr_path))
+                stack.pop()
+                for update in DictDiff._added_and_removed(t1_, t2_, path_, keys_added, keys_removed):
+                    yield update
+
+    @staticmethod
+    def _parallel_diff(t1, t2, path, digests, array_events, workers, parallel_threshold):
+        if t1 is t2:
+            return []
+        if digests is not None and DictDiff._same_digest(digests, t1, t2, path):
+            return []
 
-        for k in t_keys_added:
-            for leaf_path, val in DictDiff._traversal(t2[k]):
-                updates.append((tuple(path + [k] + leaf_path), None, key_added))
+        # the updates of each top-level key, in the order of the serial comparison: either leaf
+        # updates, or the position of a nested comparison in the tasks
+        chunks, tasks = [], []
+        t1, t2, path, keys, keys_added, keys_removed = DictDiff._frame(t1, t2, path)
+        for k in keys:
+            updates = DictDiff._key_diff(t1[k], t2[k], path + (k, ), digests, array_events)
+            if updates is None:
+                chunks.append(len(tasks))
+                tasks.append((t1[k], t2[k], path + (k, ), array_events))
+            elif updates:
+                chunks.append(updates)
 
-        for k in t_keys_removed:
-            for leaf_path, val in DictDiff._traversal(t1[k]):
-                updates.append((tuple(path + [k] + leaf_path), val, key_removed))
+        if len(tasks) < parallel_threshold:
+            results = map(_diff_task, tasks)
+        elif isinstance(workers, int):
+            pool = multiprocessing.Pool(workers)
+            try:
+                results = pool.map(_diff_task, tasks)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = workers.map(_diff_task, tasks)
 
+        updates = []
+        for chunk in chunks:
+            updates.extend(results[chunk] if isinstance(chunk, int) else chunk)
+        updates.extend(DictDiff._added_and_removed(t1, t2, path, keys_added, keys_removed))
         return updates
 
+    @staticmethod
+    def _parallel(t1, t2, parallel_threshold):
+        return multiprocessing.cpu_count() > 1 and min(len(t1), len(t2)) >= parallel_threshold
+
+    @staticmethod
+    def _key_diff(v1, v2, path, digests, array_events):
+        """
+        Compare the values of a key found in both dicts: return the updates of a leaf, or None if
+        the values are nested dicts to descend into.
+        """
+        if v1 is v2:
+            return []
+
+        if (not isinstance(v1, dict)) and (not isinstance(v2, dict)):
+            if isinstance(v1, _array_types) or isinstance(v2, _array_types):
+                return DictDiff._array_diff(v1, v2, path, array_events)
+            return [(path, v1, key_updated)] if v1 != v2 else []
+        if digests is not None and DictDiff._same_digest(digests, v1, v2, path):
+            return []
+        return None
+
+    @staticmethod
+    def _added_and_removed(t1, t2, path, keys_added, keys_removed):
+        """
+        Yield the updates of the leaves under the keys added to a dict, and then under the keys
+        removed from it.
+        """
+        for k in keys_added:
+            for leaf_path, val in DictDiff._leaves(t2[k], path + (k, )):
+                yield (leaf_path, None, key_added)
+
+        for k in keys_removed:
+            for leaf_path, val in DictDiff._leaves(t1[k], path + (k, )):
+                yield (leaf_path, val, key_removed)
+
+    @staticmethod
+    def _array_diff(v1, v2, path, array_events):
+        """
+        Find the updates of an array leaf, comparing all of its entries at once.
+        """
+        if not (isinstance(v1, _array_types) and isinstance(v2, _array_types)
+                and v1.shape == v2.shape and v1.dtype == v2.dtype):
+            return [(path, v1, key_updated)]
+
+        changed = numpy.asarray(v1 != v2)
+        if changed.shape != v1.shape:
+            return [(path, v1, key_updated)]
+        if numpy.issubdtype(v1.dtype, numpy.inexact):
+            changed &= ~(numpy.isnan(v1) & numpy.isnan(v2))
+
+        count = numpy.count_nonzero(changed)
+        if count == 0:
+            return []
+        if not array_events or 2 * count > changed.size:
+            return [(path, v1, key_updated)]
+
+        indices = [tuple(int(i) for i in index) for index in numpy.argwhere(changed)]
+        return [(path + (index, ), v1[index], key_updated) for index in indices]
+
+    @staticmethod
+    def _same_digest(digests, t1, t2, path):
+        if not (isinstance(t1, dict) and isinstance(t2, dict)):
+            return False
+        digests1, digests2 = digests if isinstance(digests, tuple) else (digests, digests)
+        digest = digests1.digest(t1, path)
+        return digest is not None and digest == digests2.digest(t2, path)
+
+    @staticmethod
+    def _frame(t1, t2, path):
+        """
+        The pending state of a pair of nested dicts: their path, an iterator over their shared keys
+        (consumed as the diff descends) and their added and removed keys.
+        """
+        t1_keys = set(t1.keys())
+        t2_keys = set(t2.keys())
+
+        t_keys_intersect = t2_keys.intersection(t1_keys)
+
+        return (
+            t1, t2, path, iter(t_keys_intersect),
+            t2_keys - t_keys_intersect, t1_keys - t_keys_intersect)
+
+    @staticmethod
+    def _leaves(t, path):
+        """
+        Performs lazy tree traversal over all leafs in the tree, in the order of _traversal, with
+        full tuple paths that extend a given path.
+        """
+        stack = [(t, path)]
+        while stack:
+            node, path_ = stack.pop()
+            if not isinstance(node, dict):
+                yield path_, node
+                continue
+            for k in node.keys():
+                stack.append((node[k], path_ + (k, )))
+
     @staticmethod
     def _traversal(t):
         """
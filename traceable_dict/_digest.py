@@ -0,0 +1,273 @@
+import hashlib
+
+from _utils import root
+
+__all__ = []
+
+
+_scalar_types = (bool, int, long, float, str, unicode, type(None))
+
+_sequence_types = (list, tuple)
+
+
+def _token(v):
+    """
+    Return an unambiguous string encoding of a leaf value, or None if the value cannot be encoded
+    (so that equal tokens always mean equal values).
+    """
+    if type(v) in _scalar_types:
+        if v != v:
+            return None
+        token = '%s:%r' % (type(v).__name__, v)
+    elif type(v) in _sequence_types:
+        tokens = [_token(item) for item in v]
+        if None in tokens:
+            return None
+        token = '%s:%s' % (type(v).__name__, ''.join(tokens))
+    else:
+        return None
+    return '%d#%s' % (len(token), token)
+
+
+_empty_digest = hashlib.sha1('').hexdigest()
+
+
+def _combine(items, child_digest):
+    """
+    Return the digest of a dict from the tokens of its keys and leaf values, and the digests of its
+    nested dicts. Like the trace, nested dicts without leaf values are ignored.
+    """
+    entries = []
+    for k, v in items:
+        if isinstance(v, dict):
+            digest = child_digest(k)
+            if digest == _empty_digest:
+                continue
+            token = None if digest is None else 'dict:' + digest
+        else:
+            token = _token(v)
+
+        key_token = _token(k)
+        if key_token is None or token is None:
+            return None
+        entries.append(key_token + token)
+
+    entries.sort()
+    return hashlib.sha1(''.join(entries)).hexdigest()
+
+
+class DigestCache(object):
+    """
+    Content digests of nested dicts, cached by the identity of each nested dict.
+
+    Two nested dicts with the same digest hold equal content, so DictDiff can rule out an unchanged
+    subtree in O(1) once its digest is cached, instead of comparing all of its leaves.
+    A nested dict without a digest (holding leaf values of types other than numbers, strings, None
+    and lists or tuples of those) is always compared leaf by leaf.
+
+    The cached digest of a dict is not updated when the dict (or any dict nested inside it) changes
+    in place, so either the cached documents are never changed in place, or the changed dicts are
+    invalidated. The cache keeps a reference to every dict it digests, until it is cleared.
+
+    Example:
+
+        >>> from traceable_dict import DictDiff, DigestCache
+        >>>
+        >>> digests = DigestCache()
+        >>> d1 = {'unchanged': {'nested_key': 'value'}, 'changed': 'old_value'}
+        >>> d2 = {'unchanged': {'nested_key': 'value'}, 'changed': 'new_value'}
+        >>>
+        >>> digests.digest(d1['unchanged']) == digests.digest(d2['unchanged'])
+        True
+        >>> DictDiff.find_diff(d1, d2, digests=digests)
+        [(('_root_', 'changed'), 'old_value', '__u__')]
+
+    """
+
+    def __init__(self):
+        self._digests = {}
+
+    def __len__(self):
+        return len(self._digests)
+
+    def digest(self, obj, path=None):
+        """
+        Return the content digest of a nested dict.
+
+        Params:
+        -------
+        obj : dict,
+            The nested dict to digest.
+        path: tuple,
+            The path of the nested dict (unused, as digests are cached by identity).
+
+        Returns:
+        -------
+        digest: str,
+            The content digest, or None if the dict holds values that cannot be digested.
+        """
+        stack = [(obj, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if self._cached(node):
+                continue
+
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((v, False) for v in node.itervalues() if isinstance(v, dict))
+                continue
+
+            self._digests[id(node)] = (node, self._combine(node))
+
+        return self._digests[id(obj)][1]
+
+    def invalidate(self, obj):
+        """
+        Drop the cached digest of a nested dict, after it changed in place.
+        The digests of the dicts it is nested in must be invalidated as well.
+        """
+        self._digests.pop(id(obj), None)
+
+    def clear(self):
+        """
+        Drop all cached digests.
+        """
+        self._digests.clear()
+
+    def _cached(self, obj):
+        cached = self._digests.get(id(obj))
+        return cached is not None and cached[0] is obj
+
+    def _combine(self, node):
+        return _combine(node.iteritems(), lambda k: self._digests[id(node[k])][1])
+
+
+__all__ += ['DigestCache']
+
+
+class MerkleDigests(object):
+    """
+    Merkle tree of the content digests of the nested dicts of one dict, cached by path.
+
+    The digest of a nested dict is computed from the digests of the dicts nested in it, so after a
+    change only the digests along the changed path are dropped (see invalidate) and recomputed,
+    and all other cached digests stay valid. A traceable dict keeps its Merkle tree up to date
+    with every traced change (see TraceableDict.enable_digests).
+
+    Example:
+
+        >>> from traceable_dict import MerkleDigests
+        >>>
+        >>> d1 = {'a': {'b': 1}, 'c': {'d': 2}}
+        >>> digests = MerkleDigests(d1)
+        >>> digest = digests.digest()
+        >>>
+        >>> d1['a']['b'] = 10
+        >>> digests.invalidate(('_root_', 'a', 'b'))
+        >>> digests.digest() == digest
+        False
+        >>> digests.digest(path=('_root_', 'a')) == MerkleDigests({'b': 10}).digest()
+        True
+
+    """
+
+    def __init__(self, d, reserved=()):
+        """
+        Params:
+        -------
+        d : dict,
+            The root dict to digest.
+        reserved: list,
+            Keys of the root dict that are ignored.
+        """
+        self._d = d
+        self._reserved = frozenset(reserved)
+        self._digests = {}
+
+    def __len__(self):
+        return len(self._digests)
+
+    def __getstate__(self):
+        return {'_d': self._d, '_reserved': self._reserved, '_digests': {}}
+
+    def digest(self, obj=None, path=(root, )):
+        """
+        Return the content digest of the nested dict at a path.
+
+        Params:
+        -------
+        obj : dict,
+            The nested dict at the path, if already at hand (otherwise it is looked up).
+            A dict that is not the one at the path of the digested dict is not digested.
+        path: tuple,
+            The nested path of the dict, starting at the root.
+
+        Returns:
+        -------
+        digest: str,
+            The content digest, or None if the dict holds values that cannot be digested (or is not
+            the one at the path).
+        """
+        path = tuple(path)
+        if obj is not None and not self._holds(obj, path):
+            return None
+        if path in self._digests:
+            return self._digests[path]
+
+        if obj is None:
+            obj = self._d
+            for k in path[1:]:
+                obj = obj[k]
+
+        stack = [(obj, path, False)]
+        while stack:
+            node, path_, expanded = stack.pop()
+            if path_ in self._digests:
+                continue
+
+            if not expanded:
+                stack.append((node, path_, True))
+                stack.extend(
+                    (v, path_ + (k, ), False) for k, v in self._items(node, path_) if isinstance(v, dict))
+                continue
+
+            self._digests[path_] = _combine(self._items(node, path_), lambda k: self._digests[path_ + (k, )])
+
+        return self._digests[path]
+
+    def copy(self, d):
+        """
+        Return a copy of the cached digests, for a copy of the digested dict.
+        """
+        result = MerkleDigests(d, self._reserved)
+        result._digests = dict(self._digests)
+        return result
+
+    def invalidate(self, path):
+        """
+        Drop the cached digests along a changed path, from the changed value up to the root.
+        """
+        for i in xrange(len(path), 0, -1):
+            self._digests.pop(tuple(path[:i]), None)
+
+    def clear(self):
+        """
+        Drop all cached digests.
+        """
+        self._digests.clear()
+
+    def _holds(self, obj, path):
+        node = self._d
+        for k in path[1:]:
+            if not isinstance(node, dict) or k not in node:
+                return False
+            node = node[k]
+        return node is obj
+
+    def _items(self, node, path):
+        if len(path) == 1 and self._reserved:
+            return ((k, v) for k, v in node.iteritems() if k not in self._reserved)
+        return node.iteritems()
+
+
+__all__ += ['MerkleDigests']
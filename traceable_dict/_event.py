@@ -0,0 +1,116 @@
+import copy
+
+from _utils import key_added, key_removed, key_updated
+
+__all__ = []
+
+
+event_types = (key_added, key_removed, key_updated)
+
+__all__ += ['event_types']
+
+
+event_codes = dict((type_, code) for code, type_ in enumerate(event_types))
+
+__all__ += ['event_codes']
+
+
+class Event(object):
+    """
+    Compact record of a trace event, holding its path, its old value and a small-int code of its
+    type (the position of the type in event_types).
+
+    An Event unpacks, indexes and compares exactly like the (path, value, type) tuple it replaces,
+    so it can be stored in the trace in place of the tuple.
+
+    Example:
+
+        >>> from traceable_dict._event import Event
+        >>>
+        >>> event = Event.from_tuple((('_root_', 'key'), 'old_value', '__u__'))
+        >>> event.code
+        2
+        >>> path, value, type_ = event
+        >>> type_
+        '__u__'
+        >>> event == (('_root_', 'key'), 'old_value', '__u__')
+        True
+
+    """
+
+    __slots__ = ('path', 'value', 'code')
+
+    def __init__(self, path, value, code):
+        self.path = path
+        self.value = value
+        self.code = code
+
+    @classmethod
+    def from_tuple(cls, event):
+        """
+        Return the compact record of a (path, value, type) trace event.
+        """
+        path, value, type_ = event
+        return cls(path, value, event_codes[type_])
+
+    def to_tuple(self):
+        """
+        Return the (path, value, type) tuple of the trace event.
+        """
+        return self.path, self.value, event_types[self.code]
+
+    @property
+    def type(self):
+        return event_types[self.code]
+
+    def __iter__(self):
+        return iter(self.to_tuple())
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, i):
+        return self.to_tuple()[i]
+
+    def __eq__(self, other):
+        if isinstance(other, Event):
+            return self.code == other.code and self.path == other.path and self.value == other.value
+        return isinstance(other, tuple) and self.to_tuple() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.to_tuple())
+
+    def __reduce__(self):
+        return Event, (self.path, self.value, self.code)
+
+    def __deepcopy__(self, memo):
+        return Event(self.path, copy.deepcopy(self.value, memo), self.code)
+
+    def __repr__(self):
+        return repr(self.to_tuple())
+
+
+__all__ += ['Event']
+
+
+def to_events(events):
+    """
+    Convert a list of trace events to compact Event records.
+    """
+    return [event if isinstance(event, Event) else Event.from_tuple(event) for event in events]
+
+
+__all__ += ['to_events']
+
+
+def to_tuples(events):
+    """
+    Convert a list of trace events to (path, value, type) tuples.
+    """
+    return [event.to_tuple() if isinstance(event, Event) else event for event in events]
+
+
+__all__ += ['to_tuples']
@@ -0,0 +1,97 @@
+__all__ = []
+
+
+class _Node(object):
+
+    __slots__ = ('children', 'events')
+
+    def __init__(self):
+        self.children = {}
+        self.events = {}
+
+
+class TraceIndex(object):
+    """
+    Prefix index (trie) over the trace of a traceable dict.
+    Maps every nested path to the revisions, and the offsets inside each revision, of the trace
+    events found under it. Path-scoped queries therefore cost time proportional to the matching
+    events, and not to the whole history.
+
+    Example:
+
+        >>> from traceable_dict._index import TraceIndex
+        >>>
+        >>> index = TraceIndex()
+        >>> index.add('2', [(('_root_', 'a', 'b'), 1, '__u__'), (('_root_', 'c'), None, '__a__')])
+        >>> index.add('3', [(('_root_', 'a', 'd'), None, '__a__')])
+        >>> sorted(index.find(('a', )).items())
+        [('2', [0]), ('3', [0])]
+        >>> index.find(('c', ))
+        {'2': [1]}
+
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._nodes = {}
+
+    def add(self, key, events, start=0):
+        """
+        Index the trace events of a revision.
+
+        Params:
+        -------
+        key: str,
+            The trace key of the revision.
+        events: list,
+            The trace events of the revision.
+        start: int,
+            The offset of the first event to index (events before it are already indexed).
+        """
+        nodes = self._nodes.setdefault(key, set())
+        for offset in xrange(start, len(events)):
+            node = self._root
+            for k in events[offset][0][1:]:
+                node = node.children.get(k) or node.children.setdefault(k, _Node())
+                node.events.setdefault(key, []).append(offset)
+                nodes.add(node)
+
+    def remove(self, key):
+        """
+        Drop the trace events of a revision from the index.
+        """
+        for node in self._nodes.pop(key, ()):
+            node.events.pop(key, None)
+
+    def rename(self, key, new_key):
+        """
+        Move the trace events of a revision to a new trace key (on commit).
+        """
+        nodes = self._nodes.pop(key, set())
+        for node in nodes:
+            node.events[new_key] = node.events.pop(key)
+        self._nodes[new_key] = nodes
+
+    def find(self, path):
+        """
+        Find the trace events under a nested path.
+
+        Params:
+        -------
+        path: tuple,
+            The nested path inside the dictionary (without the root key).
+
+        Returns:
+        -------
+        events: dict,
+            Mapping from trace key to the sorted offsets of the events under the path.
+        """
+        node = self._root
+        for k in path:
+            node = node.children.get(k)
+            if node is None:
+                return {}
+        return node.events
+
+
+__all__ += ['TraceIndex']
@@ -0,0 +1,170 @@
+import base64
+import cPickle
+import json
+import math
+
+from _utils import root
+
+__all__ = []
+
+
+_format = 'traceable_dict'
+
+_version = 1
+
+_tags = frozenset(['__tuple__', '__dict__', '__float__', '__bytes__', '__unicode__', '__pickle__'])
+
+
+def _is_plain(s):
+    """
+    Return whether a string is written as a plain JSON string: a JSON string is decoded as str
+    when it is ASCII, and as unicode otherwise, so only ASCII str and non-ASCII unicode round-trip.
+    """
+    try:
+        s.encode('ascii') if isinstance(s, unicode) else s.decode('ascii')
+    except UnicodeError:
+        return isinstance(s, unicode)
+    return isinstance(s, str)
+
+
+def encode(value, allow_pickle=False):
+    """
+    Return the JSON representation of a value.
+    Values that JSON cannot represent faithfully are wrapped in an object with a single tag key:
+    tuples ('__tuple__'), dicts with keys other than plain strings or with tag keys ('__dict__', as a
+    list of key-value pairs), infinite and NaN floats ('__float__'), non-ASCII str ('__bytes__', in
+    base64), ASCII unicode ('__unicode__') and, if allow_pickle is set, values of any other type
+    ('__pickle__', in base64). Otherwise, values of any other type raise TypeError.
+    """
+    type_ = type(value)
+    if value is None or type_ in (bool, int, long):
+        return value
+    if type_ is str or type_ is unicode:
+        if _is_plain(value):
+            return value
+        if type_ is str:
+            return {'__bytes__': base64.b64encode(value)}
+        return {'__unicode__': value}
+    if type_ is float:
+        if math.isinf(value) or math.isnan(value):
+            return {'__float__': repr(value)}
+        return value
+    if type_ is list:
+        return [encode(item, allow_pickle) for item in value]
+    if type_ is tuple:
+        return {'__tuple__': [encode(item, allow_pickle) for item in value]}
+    if type_ is dict:
+        if all(type(k) in (str, unicode) and _is_plain(k) and k not in _tags for k in value):
+            return dict((k, encode(v, allow_pickle)) for k, v in value.iteritems())
+        return {'__dict__': [[encode(k, allow_pickle), encode(v, allow_pickle)] for k, v in value.iteritems()]}
+    if not allow_pickle:
+        raise TypeError("cannot encode a value of type %s without allow_pickle" % type_.__name__)
+    return {'__pickle__': base64.b64encode(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))}
+
+
+__all__ += ['encode']
+
+
+def decode(obj, allow_pickle=False):
+    """
+    Return the value of a JSON representation produced by encode.
+    JSON strings are decoded as str when they are ASCII, and as unicode otherwise.
+    Unpickling runs arbitrary code, so pickled values raise ValueError unless allow_pickle is set.
+    """
+    if isinstance(obj, unicode):
+        try:
+            return obj.encode('ascii')
+        except UnicodeError:
+            return obj
+    if isinstance(obj, list):
+        return [decode(item, allow_pickle) for item in obj]
+    if isinstance(obj, dict):
+        if len(obj) == 1:
+            (tag, tagged), = obj.items()
+            if tag == '__tuple__':
+                return tuple(decode(item, allow_pickle) for item in tagged)
+            if tag == '__dict__':
+                return dict((decode(k, allow_pickle), decode(v, allow_pickle)) for k, v in tagged)
+            if tag == '__float__':
+                return float(tagged)
+            if tag == '__bytes__':
+                return base64.b64decode(tagged)
+            if tag == '__unicode__':
+                return unicode(tagged)
+            if tag == '__pickle__':
+                if not allow_pickle:
+                    raise ValueError("cannot decode a pickled value without allow_pickle")
+                return cPickle.loads(base64.b64decode(tagged))
+        return dict((decode(k, allow_pickle), decode(v, allow_pickle)) for k, v in obj.iteritems())
+    return obj
+
+
+__all__ += ['decode']
+
+
+def dump_header(revision, tree, keyframe, options, allow_pickle=False):
+    """
+    Return the header line of a JSON lines stream: the snapshot of the working tree, the oldest
+    revision (and its keyframe, if any) and the settings of the traceable dict.
+    """
+    return json.dumps({
+        'format': _format,
+        'version': _version,
+        'revision': revision,
+        'tree': encode(tree, allow_pickle),
+        'keyframe': encode(keyframe, allow_pickle),
+        'options': encode(options)
+    }, sort_keys=True) + '\n'
+
+
+__all__ += ['dump_header']
+
+
+def dump_revision(revision, events, keyframe, allow_pickle=False):
+    """
+    Return the line of a revision in a JSON lines stream: its trace events, with their paths as
+    lists of encoded keys (without the root key), and its keyframe, if any.
+    The uncommitted changes are written as the line of revision null.
+    """
+    return json.dumps({
+        'revision': revision,
+        'events': [
+            [[encode(k, allow_pickle) for k in path[1:]], encode(value, allow_pickle), type_]
+            for path, value, type_ in events],
+        'keyframe': encode(keyframe, allow_pickle)
+    }, sort_keys=True) + '\n'
+
+
+__all__ += ['dump_revision']
+
+
+def load_header(line, allow_pickle=False):
+    """
+    Return the oldest revision, the working tree, the keyframe of the oldest revision and the
+    settings from the header line of a JSON lines stream.
+    """
+    header = json.loads(line)
+    if not isinstance(header, dict) or header.get('format') != _format:
+        raise ValueError("not a traceable dict JSON lines stream")
+    if header['version'] > _version:
+        raise ValueError("unsupported traceable dict JSON lines version %d" % header['version'])
+    return (header['revision'], decode(header['tree'], allow_pickle), decode(header['keyframe'], allow_pickle),
+            decode(header['options']))
+
+
+__all__ += ['load_header']
+
+
+def load_revision(line, allow_pickle=False):
+    """
+    Return the revision, the trace events and the keyframe from the line of a revision in a JSON
+    lines stream.
+    """
+    obj = json.loads(line)
+    events = [
+        ((root, ) + tuple(decode(k, allow_pickle) for k in path), decode(value, allow_pickle), str(type_))
+        for path, value, type_ in obj['events']]
+    return obj['revision'], events, decode(obj['keyframe'], allow_pickle)
+
+
+__all__ += ['load_revision']
@@ -0,0 +1,238 @@
+import cPickle
+import mmap
+import os
+import struct
+import zlib
+
+from _index import TraceIndex
+from _retention import approximate_size
+from _store import TraceStore
+
+__all__ = []
+
+
+_magic = 'TDLOG\x01'
+
+_header = struct.Struct('<BHIII')
+
+_put, _delete = 1, 2
+
+
+class LogTraceStore(TraceStore):
+    """
+    Trace store keeping the events of the committed revisions in an append-only log file, so that
+    a commit writes only the events of the new revision, and the history survives restarts.
+
+    Every record holds the trace key, the paths and the approximate size of the events, and the
+    events of a revision (or marks a revision as removed), and a CRC32 checksum. The paths and the
+    size are read when the log is opened, to index the events under every nested path and to count
+    them, while the events themselves are read through a memory map, only when a revision is
+    replayed or holds events under a queried path.
+    When the log is opened, a torn or damaged record at its end (left by a crash during a write)
+    is dropped, and the file is truncated to the last complete record.
+
+    Removed revisions keep their records until the log is compacted (see compact).
+
+    Example:
+
+        >>> import os, tempfile
+        >>> from traceable_dict import LogTraceStore
+        >>>
+        >>> filename = os.path.join(tempfile.mkdtemp(), 'trace.log')
+        >>> store = LogTraceStore(filename)
+        >>> store['2'] = [(('_root_', 'a', 'b'), 1, '__u__'), (('_root_', 'c'), None, '__a__')]
+        >>> store.close()
+        >>>
+        >>> store = LogTraceStore(filename)
+        >>> store['2']
+        [(('_root_', 'a', 'b'), 1, '__u__'), (('_root_', 'c'), None, '__a__')]
+        >>> store.find(('c', ))
+        {'2': [1]}
+        >>> store.close()
+        >>> os.remove(filename)
+
+    """
+
+    def __init__(self, filename, sync=False):
+        """
+        Params:
+        -------
+        filename: str,
+            The path of the log file (created if missing).
+        sync: bool,
+            Whether every record is flushed to the disk (with fsync) before the write returns.
+        """
+        super(LogTraceStore, self).__init__()
+        self._filename = filename
+        self._sync = sync
+        self._open()
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def truncated(self):
+        """
+        The number of bytes of the torn tail dropped when the log was opened.
+        """
+        return self._truncated
+
+    def close(self):
+        """
+        Close the log file.
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def compact(self):
+        """
+        Rewrite the log with only the records of the stored revisions, dropping the records of
+        removed and overwritten revisions. The compacted log replaces the original file atomically.
+        """
+        compacted = self._filename + '.compact'
+        with open(compacted, 'wb') as f:
+            f.write(_magic)
+            view = self._view()
+            for key, (start, end, _, _) in sorted(self._records.iteritems()):
+                f.write(view[start:end])
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.close()
+        os.rename(compacted, self._filename)
+        self._open()
+
+    def _open(self):
+        if not os.path.exists(self._filename) or os.path.getsize(self._filename) == 0:
+            with open(self._filename, 'wb') as f:
+                f.write(_magic)
+
+        self._file = open(self._filename, 'r+b')
+        self._map = None
+        self._records = {}
+        self._index = TraceIndex()
+        self._truncated = 0
+
+        if self._file.read(len(_magic)) != _magic:
+            self._file.close()
+            raise ValueError("not a trace log file: %s" % self._filename)
+
+        self._recover()
+
+    def _recover(self):
+        size = os.fstat(self._file.fileno()).st_size
+        view = self._view()
+
+        offset = len(_magic)
+        while offset < size:
+            record = self._read_record(view, offset, size)
+            if record is None:
+                break
+            type_, key, paths, events_size, end = record
+            if type_ == _put:
+                paths, approximate = cPickle.loads(paths)
+                self._index_record(key, offset, end, events_size, paths, approximate)
+            else:
+                self._unindex_record(key)
+            offset = end
+
+        if offset < size:
+            self._truncated = size - offset
+            self._remap(None)
+            self._file.truncate(offset)
+            self._file.flush()
+        self._file.seek(offset)
+
+    def _read_record(self, view, offset, size):
+        if offset + _header.size > size:
+            return None
+        type_, key_size, paths_size, events_size, crc = _header.unpack(view[offset:offset + _header.size])
+
+        start = offset + _header.size
+        end = start + key_size + paths_size + events_size
+        if type_ not in (_put, _delete) or end > size:
+            return None
+
+        body = view[start:end]
+        if zlib.crc32(body) & 0xffffffff != crc:
+            return None
+        return type_, body[:key_size], body[key_size:key_size + paths_size], events_size, end
+
+    def _index_record(self, key, start, end, events_size, paths, size):
+        self._unindex_record(key)
+        self._records[key] = (start, end, end - events_size, (len(paths), size))
+        self._index.add(key, [(path, ) for path in paths])
+
+    def _unindex_record(self, key):
+        if self._records.pop(key, None) is None:
+            return False
+        self._index.remove(key)
+        return True
+
+    def _append(self, type_, key, paths='', events=''):
+        body = key + paths + events
+        record = _header.pack(type_, len(key), len(paths), len(events), zlib.crc32(body) & 0xffffffff) + body
+
+        start = self._file.tell()
+        self._file.write(record)
+        self._file.flush()
+        if self._sync:
+            os.fsync(self._file.fileno())
+        return start, start + len(record)
+
+    def _view(self):
+        size = os.fstat(self._file.fileno()).st_size
+        if self._map is None or len(self._map) < size:
+            self._remap(size)
+        return self._map
+
+    def _remap(self, size):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if size:
+            self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+
+    def _load(self, key):
+        record = self._records.get(key)
+        if record is None:
+            return None
+        _, end, events_start, _ = record
+        return cPickle.loads(self._view()[events_start:end])
+
+    def _save(self, key, events):
+        paths = [event[0] for event in events]
+        size = approximate_size(events)
+        events_data = cPickle.dumps(events, cPickle.HIGHEST_PROTOCOL)
+        start, end = self._append(_put, key, cPickle.dumps((paths, size), cPickle.HIGHEST_PROTOCOL), events_data)
+        self._index_record(key, start, end, len(events_data), paths, size)
+
+    def _delete(self, key):
+        if key not in self._records:
+            return False
+        self._append(_delete, key)
+        return self._unindex_record(key)
+
+    def _has(self, key):
+        return key in self._records
+
+    def _keys(self):
+        return self._records.keys()
+
+    def _count(self):
+        return len(self._records)
+
+    def _find(self, path):
+        return dict((key, list(offsets)) for key, offsets in self._index.find(path).iteritems())
+
+    def _stats(self, key):
+        record = self._records.get(key)
+        if record is None:
+            return None
+        return record[3]
+
+
+__all__ += ['LogTraceStore']
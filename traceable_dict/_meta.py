@@ -4,51 +4,65 @@ from _diff import DictDiff
 __all__ = []
 
 
+def _key_arg(self, key, *args, **kwargs):
+    return [key]
+
+
+def _update_args(self, *args, **kwargs):
+    if args and not hasattr(args[0], 'keys'):
+        return None
+    keys = list(args[0].keys()) if args else []
+    return keys + list(kwargs.keys())
+
+
 class TraceableMeta(type):
     """
     Meta class for tracable dict, using the DictDiff service class.
+
+    Only the mutators listed in TOUCHED_KEYS are wrapped, so that every change they
+    perform is recorded into the trace. All other methods inherited from dict (the
+    readers) are left untouched, so reading from a traceable dict costs exactly what
+    reading from a plain dict costs.
+
+    Each wrapped mutator only compares the keys it touches, as returned by its entry
+    in TOUCHED_KEYS, so a write costs as much as the values it replaces and not as much
+    as the whole dict. A mutator mapped to None touches every key. clear and popitem
+    are not wrapped, as the traceable dict implements them on top of the traced
+    _update and pop.
     """
 
-    EXCLUDE_CLASS_ATTR = [
-        '__class__',
-        '__new__',
-        '__init__',
-        '__dict__',
-        '__metaclass__',
-        '__getattribute__',
-        '__setattr__'
-    ]
-
-    INCLUDE_CHILD_ATTR = [
-        '_update'
-    ]
-
-    def wrapper(self, func):
+    TOUCHED_KEYS = {
+        '__delitem__': _key_arg,
+        '__setitem__': _key_arg,
+        'pop': _key_arg,
+        'setdefault': _key_arg,
+        'update': _update_args,
+        '_update': None
+    }
+
+    def wrapper(self, func, touched_keys=None):
         def wrapped(self, *args, **kwargs):
-            before = self.as_dict()
+            keys = touched_keys(self, *args, **kwargs) if touched_keys else None
+
+            before = self._snapshot(keys)
             res = func(self, *args, **kwargs)
-            after = self.as_dict()
+            after = self._snapshot(keys)
             
-            trace = DictDiff.find_diff(before, after)
+            trace = DictDiff.find_diff(before, after, array_events=self._array_events)
             if len(trace) > 0:
                 self.update_trace(trace)
             return res
+        wrapped._traced = True
         return wrapped
 
     def __init__(cls, classname, bases, class_dict):
-        for attr_name in dir(cls):
+        for attr_name, touched_keys in TraceableMeta.TOUCHED_KEYS.items():
 
-            if attr_name in TraceableMeta.EXCLUDE_CLASS_ATTR:
+            attr = getattr(cls, attr_name, None)
+            if attr is None or getattr(attr, '_traced', False):
                 continue
 
-            is_base_attr = any([hasattr(base, attr_name) for base in bases])
-            if is_base_attr or attr_name in TraceableMeta.INCLUDE_CHILD_ATTR:
-
-                attr = getattr(cls, attr_name)
-
-                if hasattr(attr, '__call__'):
-                    attr = cls.wrapper(attr)
-                    setattr(cls, attr_name, attr)
+            setattr(cls, attr_name, cls.wrapper(attr, touched_keys))
 
         super(TraceableMeta, cls).__init__(classname, bases, class_dict)
 
@@ -0,0 +1,70 @@
+__all__ = []
+
+
+class PathPool(object):
+    """
+    Intern pool of the nested paths of trace events.
+
+    A hot key is updated in many revisions, and each update comes with a fresh path tuple.
+    Interning replaces every path with a canonical tuple shared by all the events on the same path,
+    so each distinct path is stored once. Serializers that keep track of shared objects, such as
+    pickle and copy.deepcopy, then also write each path once and refer back to it.
+
+    Example:
+
+        >>> from traceable_dict._paths import PathPool
+        >>>
+        >>> pool = PathPool()
+        >>> path = pool.intern(('_root_', 'service', 'limits', 'qps'))
+        >>> pool.intern(('_root_', 'service', 'limits', 'qps')) is path
+        True
+        >>> len(pool)
+        1
+
+    """
+
+    def __init__(self):
+        self._paths = {}
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, path):
+        return path in self._paths
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def intern(self, path):
+        """
+        Return the canonical tuple of a path.
+
+        Params:
+        -------
+        path: tuple,
+            The nested path (including the root key).
+
+        Returns:
+        -------
+        path: tuple,
+            The canonical tuple equal to the path, shared by all the events on the path.
+        """
+        return self._paths.setdefault(path, path)
+
+    def intern_events(self, events):
+        """
+        Return a list of trace events, with their paths interned.
+        Compact event records (which are not tuples) have their path replaced in place.
+        """
+        interned = []
+        for event in events:
+            if isinstance(event, tuple):
+                path, value, type_ = event
+                event = (self.intern(path), value, type_)
+            else:
+                event.path = self.intern(event.path)
+            interned.append(event)
+        return interned
+
+
+__all__ += ['PathPool']
@@ -0,0 +1,108 @@
+import copy
+
+from _utils import root
+
+__all__ = []
+
+
+class PathCopier(object):
+    """
+    Copy-on-write editor of a nested dict.
+
+    Edits never change a nested dict the editor does not own. Instead, the dicts along the edited
+    path are copied (shallowly) the first time they are written to, and all other subtrees stay
+    shared with the original dict. The result is a structurally shared version of the original,
+    which costs only as much as the paths that differ.
+    A non-dict value along the edited path (such as an array whose entry is edited) is copied with
+    copy.copy.
+
+    Example:
+
+        >>> from traceable_dict._persistent import PathCopier
+        >>>
+        >>> d1 = {'a': {'b': 1}, 'c': {'d': 2}}
+        >>> editor = PathCopier(dict(d1))
+        >>> editor.setitem(('_root_', 'a', 'b'), 10)
+        >>> editor.root
+        {'a': {'b': 10}, 'c': {'d': 2}}
+        >>> d1
+        {'a': {'b': 1}, 'c': {'d': 2}}
+        >>> editor.root['c'] is d1['c']
+        True
+
+    """
+
+    def __init__(self, d, owned=None):
+        """
+        Params:
+        -------
+        d : dict,
+            The root dict to edit, which is always owned by the editor.
+        owned: dict,
+            The nested values already owned by the editor (and safe to change in place), by id.
+            The values are kept referenced, so that their ids are never reused by other objects.
+        """
+        self.root = d
+        self.owned = owned if owned is not None else {}
+        self.owned[id(d)] = d
+
+    def writable(self, nested_k, create=True):
+        """
+        Return an owned dict at a nested path, copying the dicts along the path as needed.
+
+        Params:
+        -------
+        nested_k : tuple,
+            The nested path of the dict.
+        create: bool,
+            Whether missing dicts along the path are created (otherwise KeyError is raised).
+        """
+        return self._chain(nested_k, create)[-1][0]
+
+    def setitem(self, nested_k, v):
+        """
+        Set the value at a nested path.
+        """
+        self.writable(nested_k[:-1])[nested_k[-1]] = v
+
+    def pop(self, nested_k):
+        """
+        Pop the value at a nested path, removing the dicts emptied along the way.
+        """
+        chain = self._chain(nested_k[:-1], create=False)
+
+        d, k = chain.pop()
+        v = d.pop(nested_k[-1])
+        while chain and not d:
+            parent, parent_k = chain.pop()
+            parent.pop(k)
+            d, k = parent, parent_k
+        return v
+
+    def _chain(self, nested_k, create):
+        chain = [(self.root, None)]
+        d = self.root
+        for k in nested_k:
+            if k == root:
+                continue
+
+            if k in d and id(d[k]) in self.owned:
+                child = d[k]
+            else:
+                if k not in d and not create:
+                    raise KeyError(k)
+                if k not in d:
+                    child = {}
+                elif isinstance(d[k], dict):
+                    child = dict(d[k])
+                else:
+                    child = copy.copy(d[k])
+                dict.__setitem__(d, k, child)
+                self.owned[id(child)] = child
+
+            chain.append((child, k))
+            d = child
+        return chain
+
+
+__all__ += ['PathCopier']
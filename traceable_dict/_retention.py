@@ -0,0 +1,176 @@
+import bisect
+import sys
+
+from _event import Event
+
+__all__ = []
+
+
+def approximate_size(obj):
+    """
+    Return the approximate memory footprint of an object in bytes, including the objects it holds.
+    Objects held more than once are counted once.
+    """
+    size, seen, stack = 0, set(), [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.iterkeys())
+            stack.extend(obj.itervalues())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, Event):
+            stack.extend((obj.path, obj.value))
+    return size
+
+
+__all__ += ['approximate_size']
+
+
+class RetentionPolicy(object):
+    """
+    Limits on the history kept by a traceable dict.
+    When a limit is exceeded, the oldest revisions are evicted until the history is within all
+    limits again. The latest revision is always kept.
+
+    Example:
+
+        >>> from traceable_dict import RetentionPolicy
+        >>>
+        >>> policy = RetentionPolicy(max_revisions=3)
+        >>> policy.oldest_kept([1, 2, 3, 4, 5], events=lambda revision: 1)
+        3
+        >>> RetentionPolicy(max_age=10).oldest_kept([1, 5, 12, 20], events=lambda revision: 1)
+        12
+
+    """
+
+    def __init__(self, max_revisions=None, max_events=None, max_bytes=None, max_age=None):
+        """
+        Params:
+        -------
+        max_revisions: int,
+            The maximal number of stored revisions (None for no limit).
+        max_events: int,
+            The maximal number of committed trace events (None for no limit).
+        max_bytes: int,
+            The maximal approximate size of the committed trace events and of the keyframes, in bytes
+            (None for no limit).
+        max_age: int,
+            The maximal distance of the oldest stored revision from the latest one, in revision
+            numbers (None for no limit).
+        """
+        for limit in [max_revisions, max_events, max_bytes]:
+            if limit is not None and (type(limit) != int or limit <= 0):
+                raise ValueError("retention limit must be a positive integer or None")
+        if max_age is not None and (type(max_age) != int or max_age < 0):
+            raise ValueError("retention age must be a non-negative integer or None")
+
+        self.max_revisions = max_revisions
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def as_dict(self):
+        return {
+            'max_revisions': self.max_revisions,
+            'max_events': self.max_events,
+            'max_bytes': self.max_bytes,
+            'max_age': self.max_age
+        }
+
+    def limits(self):
+        """
+        Return the limits of the policy, in the order of the constructor arguments.
+        """
+        return self.max_revisions, self.max_events, self.max_bytes, self.max_age
+
+    def oldest_kept(self, revisions, events, event_bytes=None, keyframe_bytes=None, totals=None):
+        """
+        Return the oldest revision to keep.
+        The trace events of a revision are dropped with the revisions before it, and its keyframe
+        with the revision itself. Without totals, only the revisions that are kept are inspected,
+        newest first. Given the totals of the whole history, only the revisions that are evicted are
+        inspected, oldest first, so that a policy kept on every commit costs only the evicted revisions.
+
+        Params:
+        -------
+        revisions: list,
+            The sorted stored revisions.
+        events: function,
+            Returns the number of trace events of a revision.
+        event_bytes: function,
+            Returns the approximate size of the trace events of a revision, in bytes
+            (required for max_bytes).
+        keyframe_bytes: function,
+            Returns the approximate size of the keyframe of a revision, in bytes (0 if it has none).
+        totals: tuple,
+            The number and the approximate size of the trace events of all the revisions but the
+            oldest one, the size including all the keyframes.
+
+        Returns:
+        -------
+        revision: int,
+            The oldest revision within all limits, or None if there are no revisions.
+        """
+        if not revisions:
+            return None
+
+        position = 0
+        if self.max_revisions is not None:
+            position = max(position, len(revisions) - self.max_revisions)
+        if self.max_age is not None:
+            position = max(position, bisect.bisect_left(revisions, revisions[-1] - self.max_age))
+
+        if self.max_events is None and self.max_bytes is None:
+            return revisions[position]
+
+        if keyframe_bytes is None:
+            keyframe_bytes = lambda revision: 0
+
+        def size(i):
+            # the events and the bytes dropped when revisions[i] becomes the oldest revision
+            if self.max_bytes is None:
+                return events(revisions[i]), 0
+            return events(revisions[i]), event_bytes(revisions[i]) + keyframe_bytes(revisions[i - 1])
+
+        if totals is None:
+            total_events, total_bytes = 0, 0
+            if self.max_bytes is not None:
+                total_bytes = keyframe_bytes(revisions[-1])
+            for i in xrange(len(revisions) - 1, position, -1):
+                events_, bytes_ = size(i)
+                total_events += events_
+                total_bytes += bytes_
+                if self._exceeded(total_events, total_bytes):
+                    return revisions[i]
+            return revisions[position]
+
+        total_events, total_bytes = totals
+        for i in xrange(1, position + 1):
+            events_, bytes_ = size(i)
+            total_events -= events_
+            total_bytes -= bytes_
+        while position < len(revisions) - 1 and self._exceeded(total_events, total_bytes):
+            position += 1
+            events_, bytes_ = size(position)
+            total_events -= events_
+            total_bytes -= bytes_
+        return revisions[position]
+
+    def _exceeded(self, total_events, total_bytes):
+        if self.max_events is not None and total_events > self.max_events:
+            return True
+        return self.max_bytes is not None and total_bytes > self.max_bytes
+
+    def __repr__(self):
+        limits = ', '.join('%s=%r' % item for item in sorted(self.as_dict().items()) if item[1] is not None)
+        return 'RetentionPolicy(%s)' % limits
+
+
+__all__ += ['RetentionPolicy']
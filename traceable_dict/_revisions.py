@@ -0,0 +1,87 @@
+import bisect
+
+__all__ = []
+
+
+class RevisionList(list):
+    """
+    Sorted list of revision numbers, indexed by bisection.
+
+    A RevisionList is a plain list for all other purposes, so it serializes (and compares) exactly
+    like the '__revisions__' list it replaces.
+
+    Example:
+
+        >>> from traceable_dict._revisions import RevisionList
+        >>>
+        >>> revisions = RevisionList([1, 5, 8, 13])
+        >>> 8 in revisions
+        True
+        >>> revisions.index(8)
+        2
+        >>> revisions.ceiling(6)
+        8
+        >>> revisions.trim_front(2)
+        [1, 5]
+        >>> revisions
+        [8, 13]
+
+    """
+
+    def __contains__(self, revision):
+        i = bisect.bisect_left(self, revision)
+        return i != len(self) and self[i] == revision
+
+    def index(self, revision):
+        """
+        Return the position of a revision in the list.
+
+        Params:
+        -------
+        revision: int,
+            The revision number to locate.
+
+        Returns:
+        -------
+        position: int,
+            Position of the revision, raises ValueError if the revision is unknown.
+        """
+        i = bisect.bisect_left(self, revision)
+        if i == len(self) or self[i] != revision:
+            raise ValueError("unknown revision %s" % revision)
+        return i
+
+    def ceiling(self, revision):
+        """
+        Return the earliest revision at or after the given revision, or None if there is none.
+        """
+        i = bisect.bisect_left(self, revision)
+        return self[i] if i != len(self) else None
+
+    def floor(self, revision):
+        """
+        Return the latest revision at or before the given revision, or None if there is none.
+        """
+        i = bisect.bisect_right(self, revision)
+        return self[i - 1] if i else None
+
+    def trim_front(self, count=1):
+        """
+        Remove the oldest revisions, in a single slice deletion.
+
+        Params:
+        -------
+        count: int,
+            The number of revisions to remove.
+
+        Returns:
+        -------
+        removed: list,
+            The removed revisions.
+        """
+        removed = self[:count]
+        del self[:count]
+        return removed
+
+
+__all__ += ['RevisionList']
@@ -0,0 +1,413 @@
+import collections
+import cPickle
+import sqlite3
+
+from _index import TraceIndex
+from _retention import approximate_size
+from _utils import uncommitted
+
+__all__ = []
+
+
+class TraceStore(collections.MutableMapping):
+    """
+    Storage of the trace of a traceable dict: a mapping from trace keys (the revision numbers as
+    strings, and '_uncommitted_') to the lists of trace events of the revisions.
+
+    The uncommitted events are extended in place on every traced change, so they are always kept
+    in memory. A subclass stores the events of the committed revisions (see _load, _save, _delete,
+    _has, _keys and _count), and finds the stored events under a nested path (see _find), so that
+    the events of a revision are only fetched when the revision is replayed or holds events under
+    a queried path. A subclass should also keep the number and the size of the events of every
+    revision (see _stats), so that retention policies and statistics never fetch the events.
+    """
+
+    def __init__(self):
+        self._uncommitted = None
+
+    def __getitem__(self, key):
+        if key == uncommitted:
+            if self._uncommitted is None:
+                raise KeyError(key)
+            return self._uncommitted
+
+        events = self._load(key)
+        if events is None:
+            raise KeyError(key)
+        return events
+
+    def __setitem__(self, key, events):
+        if key == uncommitted:
+            self._uncommitted = events
+        else:
+            self._save(key, list(events))
+
+    def __delitem__(self, key):
+        if key == uncommitted:
+            if self._uncommitted is None:
+                raise KeyError(key)
+            self._uncommitted = None
+        elif not self._delete(key):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key == uncommitted:
+            return self._uncommitted is not None
+        return self._has(key)
+
+    def __iter__(self):
+        if self._uncommitted is not None:
+            yield uncommitted
+        for key in self._keys():
+            yield key
+
+    def __len__(self):
+        return int(self._uncommitted is not None) + self._count()
+
+    def find(self, path):
+        """
+        Find the trace events under a nested path.
+
+        Params:
+        -------
+        path: tuple,
+            The nested path inside the dictionary (without the root key).
+
+        Returns:
+        -------
+        events: dict,
+            Mapping from trace key to the sorted offsets of the events under the path.
+        """
+        path = tuple(path)
+        if not path:
+            return {}
+
+        found = self._find(path)
+        if self._uncommitted:
+            offsets = [
+                offset for offset, event in enumerate(self._uncommitted)
+                if tuple(event[0][1:len(path) + 1]) == path]
+            if offsets:
+                found[uncommitted] = offsets
+        return found
+
+    def events_count(self, key):
+        """
+        Return the number of trace events stored under a trace key (0 if there are none).
+        """
+        return self._key_stats(key)[0]
+
+    def events_size(self, key):
+        """
+        Return the approximate size of the trace events stored under a trace key, in bytes
+        (see traceable_dict._retention.approximate_size), or 0 if there are none.
+        """
+        return self._key_stats(key)[1]
+
+    def _key_stats(self, key):
+        if key == uncommitted:
+            if self._uncommitted is None:
+                return 0, 0
+            return len(self._uncommitted), approximate_size(self._uncommitted)
+
+        stats = self._stats(key)
+        return stats if stats is not None else (0, 0)
+
+    def _load(self, key):
+        raise NotImplementedError
+
+    def _save(self, key, events):
+        raise NotImplementedError
+
+    def _delete(self, key):
+        raise NotImplementedError
+
+    def _has(self, key):
+        raise NotImplementedError
+
+    def _keys(self):
+        raise NotImplementedError
+
+    def _count(self):
+        raise NotImplementedError
+
+    def _find(self, path):
+        raise NotImplementedError
+
+    def _stats(self, key):
+        """
+        Return the number and the approximate size of the events of a revision (None if it is not
+        stored). This default implementation fetches the events.
+        """
+        events = self._load(key)
+        if events is None:
+            return None
+        return len(events), approximate_size(events)
+
+
+__all__ += ['TraceStore']
+
+
+class MemoryTraceStore(TraceStore):
+    """
+    Trace store keeping the events of the committed revisions in memory, with a prefix index over
+    their paths.
+
+    Example:
+
+        >>> from traceable_dict import MemoryTraceStore
+        >>>
+        >>> store = MemoryTraceStore()
+        >>> store['2'] = [(('_root_', 'a', 'b'), 1, '__u__'), (('_root_', 'c'), None, '__a__')]
+        >>> store.find(('a', ))
+        {'2': [0]}
+
+    """
+
+    def __init__(self):
+        super(MemoryTraceStore, self).__init__()
+        self._revisions = {}
+        self._sizes = {}
+        self._index = TraceIndex()
+
+    def _load(self, key):
+        return self._revisions.get(key)
+
+    def _save(self, key, events):
+        self._delete(key)
+        self._revisions[key] = events
+        self._sizes[key] = approximate_size(events)
+        self._index.add(key, events)
+
+    def _delete(self, key):
+        if key not in self._revisions:
+            return False
+        del self._revisions[key]
+        del self._sizes[key]
+        self._index.remove(key)
+        return True
+
+    def _has(self, key):
+        return key in self._revisions
+
+    def _keys(self):
+        return self._revisions.keys()
+
+    def _count(self):
+        return len(self._revisions)
+
+    def _find(self, path):
+        return dict((key, list(offsets)) for key, offsets in self._index.find(path).iteritems())
+
+    def _stats(self, key):
+        if key not in self._revisions:
+            return None
+        return len(self._revisions[key]), self._sizes[key]
+
+
+__all__ += ['MemoryTraceStore']
+
+
+class OverlayTraceStore(TraceStore):
+    """
+    Trace store reading the events of some revisions from another trace store, while the events
+    written to it are kept in memory and the other store is never changed.
+    The result of a checkout of a traceable dict with a trace store reads its history this way, so
+    the events of a revision are still fetched only when needed.
+    """
+
+    def __init__(self, base, keys):
+        """
+        Params:
+        -------
+        base: TraceStore,
+            The trace store to read from.
+        keys: list,
+            The trace keys of the revisions read from the base store.
+        """
+        super(OverlayTraceStore, self).__init__()
+        self._base = base
+        self._base_keys = set(keys)
+        self._overlay = MemoryTraceStore()
+
+    def _load(self, key):
+        if key not in self._base_keys:
+            return self._overlay._load(key)
+        events = self._base.get(key)
+        if events is None:
+            raise ValueError("revision %s was removed from the trace store" % key)
+        return events
+
+    def _save(self, key, events):
+        self._base_keys.discard(key)
+        self._overlay._save(key, events)
+
+    def _delete(self, key):
+        if key in self._base_keys:
+            self._base_keys.remove(key)
+            return True
+        return self._overlay._delete(key)
+
+    def _has(self, key):
+        return key in self._base_keys or self._overlay._has(key)
+
+    def _keys(self):
+        return list(self._base_keys) + self._overlay._keys()
+
+    def _count(self):
+        return len(self._base_keys) + self._overlay._count()
+
+    def _find(self, path):
+        found = dict(
+            (key, offsets) for key, offsets in self._base.find(path).iteritems() if key in self._base_keys)
+        found.update(self._overlay._find(path))
+        return found
+
+    def _stats(self, key):
+        if key in self._base_keys:
+            return self._base.events_count(key), self._base.events_size(key)
+        return self._overlay._stats(key)
+
+
+__all__ += ['OverlayTraceStore']
+
+
+class MovedTraceStore(TraceStore):
+    """
+    Trace store left in a traceable dict whose trace store was taken over by the result of |.
+    The history belongs to the result, so every access to the trace fails.
+    """
+
+    def _moved(self, *args):
+        raise ValueError("the trace store was moved to the result of |")
+
+    __getitem__ = __setitem__ = __delitem__ = __contains__ = __iter__ = __len__ = _moved
+    find = events_count = events_size = _moved
+
+
+__all__ += ['MovedTraceStore']
+
+
+def _path_token(k):
+    """
+    Return a string encoding of a key of a nested path, equal for keys that are equal in a dict.
+    """
+    if isinstance(k, float) and k.is_integer():
+        k = int(k)
+    if isinstance(k, (bool, int, long)):
+        return 'i%d' % k
+    if isinstance(k, unicode):
+        try:
+            k = k.encode('ascii')
+        except UnicodeError:
+            pass
+    return repr(k)
+
+
+def _path_range(path):
+    """
+    Return the range of the encoded paths that start with a nested path.
+    The keys of an encoded path are separated by '\\x01', which their encoding never contains.
+    """
+    prefix = ''.join(_path_token(k) + '\x01' for k in path)
+    return prefix, prefix[:-1] + '\x02' if prefix else '\x02'
+
+
+class SqliteTraceStore(TraceStore):
+    """
+    Trace store keeping the events of the committed revisions in a SQLite database, so that only
+    the working tree of a traceable dict stays in memory.
+    The events of each revision are stored as a single pickled blob, along with their number and
+    size, and an indexed table of their encoded paths, so the events under a nested path are found
+    with a single range query.
+
+    Example:
+
+        >>> from traceable_dict import SqliteTraceStore
+        >>>
+        >>> store = SqliteTraceStore(':memory:')
+        >>> store['2'] = [(('_root_', 'a', 'b'), 1, '__u__'), (('_root_', 'c'), None, '__a__')]
+        >>> store['2']
+        [(('_root_', 'a', 'b'), 1, '__u__'), (('_root_', 'c'), None, '__a__')]
+        >>> store.find(('c', ))
+        {'2': [1]}
+
+    """
+
+    def __init__(self, filename=':memory:'):
+        """
+        Params:
+        -------
+        filename: str,
+            The path of the database file (':memory:' for a database in memory).
+        """
+        super(SqliteTraceStore, self).__init__()
+        self._filename = filename
+        self._connection = sqlite3.connect(filename)
+        self._connection.text_factory = str
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS revisions '
+                '(key TEXT PRIMARY KEY, events BLOB, count INTEGER, size INTEGER)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS paths (path TEXT, key TEXT, offset INTEGER)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS paths_path ON paths (path)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS paths_key ON paths (key)')
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def close(self):
+        """
+        Close the connection to the database.
+        """
+        self._connection.close()
+
+    def _load(self, key):
+        row = self._connection.execute('SELECT events FROM revisions WHERE key = ?', (key, )).fetchone()
+        if row is None:
+            return None
+        return cPickle.loads(str(row[0]))
+
+    def _save(self, key, events):
+        with self._connection:
+            self._delete_rows(key)
+            self._connection.execute(
+                'INSERT INTO revisions (key, events, count, size) VALUES (?, ?, ?, ?)',
+                (key, sqlite3.Binary(cPickle.dumps(events, cPickle.HIGHEST_PROTOCOL)),
+                 len(events), approximate_size(events)))
+            self._connection.executemany(
+                'INSERT INTO paths VALUES (?, ?, ?)',
+                ((_path_range(event[0][1:])[0], key, offset) for offset, event in enumerate(events)))
+
+    def _delete(self, key):
+        with self._connection:
+            return self._delete_rows(key)
+
+    def _delete_rows(self, key):
+        self._connection.execute('DELETE FROM paths WHERE key = ?', (key, ))
+        return self._connection.execute('DELETE FROM revisions WHERE key = ?', (key, )).rowcount > 0
+
+    def _has(self, key):
+        return self._connection.execute('SELECT 1 FROM revisions WHERE key = ?', (key, )).fetchone() is not None
+
+    def _keys(self):
+        return [key for key, in self._connection.execute('SELECT key FROM revisions')]
+
+    def _count(self):
+        return self._connection.execute('SELECT COUNT(*) FROM revisions').fetchone()[0]
+
+    def _find(self, path):
+        found = {}
+        rows = self._connection.execute(
+            'SELECT key, offset FROM paths WHERE path >= ? AND path < ? ORDER BY key, offset', _path_range(path))
+        for key, offset in rows:
+            found.setdefault(key, []).append(offset)
+        return found
+
+    def _stats(self, key):
+        return self._connection.execute('SELECT count, size FROM revisions WHERE key = ?', (key, )).fetchone()
+
+
+__all__ += ['SqliteTraceStore']
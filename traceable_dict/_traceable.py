@@ -1,7 +1,21 @@
+import collections
 import copy
+import copy_reg
+import itertools
 import warnings
 
+import _binary
+import _jsonl
+from _digest import MerkleDigests
+from _event import Event, event_types, to_events, to_tuples
+from _index import TraceIndex
 from _meta import TraceableMeta
+from _paths import PathPool
+from _persistent import PathCopier
+from _retention import RetentionPolicy, approximate_size
+from _revisions import RevisionList
+from _store import MovedTraceStore, OverlayTraceStore, TraceStore
+from _view import RevisionView, TrackedView
 from _utils import key_added, key_removed, key_updated, root, uncommitted
 from _utils import nested_getitem, nested_setitem, nested_pop
 
@@ -9,8 +23,87 @@ __all__ = []
 
 _trace_key = '__trace__'
 _revisions_key = '__revisions__'
+_keyframes_key = '__keyframes__'
 
-_keys = [_trace_key, _revisions_key]
+_keys = [_trace_key, _revisions_key, _keyframes_key]
+
+_undo = {
+    key_added: lambda d, k, v: nested_pop(d, k),
+    key_removed: lambda d, k, v: nested_setitem(d, k, v),
+    key_updated: lambda d, k, v: nested_setitem(d, k, v)
+}
+
+_redo = {
+    key_added: lambda d, k, v: nested_setitem(d, k, v),
+    key_removed: lambda d, k, v: nested_pop(d, k),
+    key_updated: lambda d, k, v: nested_setitem(d, k, v)
+}
+
+# undo copying the old values, so that entries of an array written back by later events never
+# change the values stored in the trace
+_undo_copy = {
+    key_added: lambda d, k, v: nested_pop(d, k),
+    key_removed: lambda d, k, v: nested_setitem(d, k, copy.deepcopy(v)),
+    key_updated: lambda d, k, v: nested_setitem(d, k, copy.deepcopy(v))
+}
+
+
+def _net_events(events):
+    """
+    Compose consecutive events into one net event per path, ordered by the first event on the path.
+    The net event keeps the earliest old value, and an add that is later removed cancels out.
+    """
+    first, last = collections.OrderedDict(), {}
+    for path, value, type_ in events:
+        if path not in first:
+            first[path] = (type_ != key_added, value)
+        last[path] = type_
+
+    net = []
+    for path, (existed, value) in first.iteritems():
+        exists = last[path] != key_removed
+        if existed and exists:
+            net.append((path, value, key_updated))
+        elif existed:
+            net.append((path, value, key_removed))
+        elif exists:
+            net.append((path, None, key_added))
+    return net
+
+
+def _fold_nested_events(events):
+    """
+    Fold the events under a path that has an event of its own (such as the changed entries of an
+    array that was also replaced as a whole) into the first event of that path, so that every value
+    is shown once by a diff. The folded event keeps the old value from before all of those events.
+    """
+    paths = set(event[0] for event in events)
+    folded, earlier = collections.OrderedDict(), {}
+    for event in events:
+        path, value, type_ = event
+        outer = next((path[:i] for i in xrange(2, len(path)) if path[:i] in paths), None)
+        if outer is None and path not in folded:
+            if path in earlier:
+                # undo the changes under the path made before its first event
+                box = {path[-1]: copy.deepcopy(value)}
+                _replay(_undo_copy, box, ((path_[len(path) - 1:], value_, type__)
+                                          for path_, value_, type__ in reversed(earlier.pop(path))))
+                value = box.get(path[-1])
+            folded[path] = [(path, value, type_)]
+        elif outer is None:
+            folded[path].append(event)
+        elif outer not in folded:
+            earlier.setdefault(outer, []).append(event)
+    return _net_events(itertools.chain.from_iterable(folded.itervalues()))
+
+
+def _replay(update_dict, d, events):
+    for event in events:
+        if type(event) is Event:
+            update_dict[event_types[event.code]](d, event.path, event.value)
+        else:
+            path, value, type_ = event
+            update_dict[type_](d, path, value)
 
 
 class TraceableDict(dict):
@@ -71,13 +164,50 @@ class TraceableDict(dict):
     __metaclass__ = TraceableMeta
 
     def __init__(self, *args, **kwargs):
+        self._array_events = False
+
         super(TraceableDict, self).__init__(*args, **kwargs)
         self.setdefault(_trace_key, {})
-        self.setdefault(_revisions_key, [])
+        self[_revisions_key] = RevisionList(self.get(_revisions_key, []))
 
-        self._has_uncommitted_changes = False
+        if _keyframes_key in self:
+            self[_keyframes_key] = dict(self[_keyframes_key])
 
-        if (not self.revisions) or (uncommitted in self.trace):
+        self._has_uncommitted_changes = False
+        self._keyframe_every_revisions = None
+        self._keyframe_every_events = None
+        self._retention = None
+
+        self._owned = None
+        self._index = None
+        self._digests = None
+        self._compact_events = False
+        self._paths = None
+        self._history_totals = None
+
+        if args and isinstance(args[0], TraceableDict):
+            self._keyframe_every_revisions = args[0]._keyframe_every_revisions
+            self._keyframe_every_events = args[0]._keyframe_every_events
+            self._retention = args[0]._retention
+            # the nested values are shared with the copied dict, so both copy them on write
+            self._owned = {}
+            args[0]._owned = {}
+            self._array_events = args[0]._array_events
+            self._compact_events = args[0]._compact_events
+            self._paths = args[0]._paths
+            if args[0]._digests is not None:
+                self._digests = args[0]._digests.copy(self)
+            if isinstance(self[_trace_key], TraceStore):
+                # the trace store keeps the history of the copied dict, so the copy holds its own
+                trace = dict(self[_trace_key])
+                if uncommitted in trace:
+                    trace[uncommitted] = list(trace[uncommitted])
+                self[_trace_key] = trace
+
+        if self._paths is None:
+            self._intern_paths()
+
+        if (not self.revisions) or (uncommitted in self[_trace_key]):
             self._has_uncommitted_changes = True
 
     def __or__(self, other):
@@ -85,6 +215,8 @@ class TraceableDict(dict):
         Pipes one dictionary to another, in order to suggest that the first dictionary was updated
         to the value of the second one.
         This change is considered as a traceable change.
+        With a trace store (see attach_store), the result takes over the store, so the result replaces
+        this dictionary (as in D1 = D1 | d2), which can no longer change or read its history.
         
          Example:
             >>> from traceable_dict import TraceableDict
@@ -112,10 +244,236 @@ class TraceableDict(dict):
         -------
             TraceableDict object
         """
-        res = TraceableDict(self)
+        trace = self[_trace_key]
+        if isinstance(trace, TraceStore):
+            self[_trace_key] = {}
+            res = TraceableDict(self)
+            res[_trace_key] = trace
+            res._has_uncommitted_changes = self._has_uncommitted_changes
+            self[_trace_key] = MovedTraceStore()
+        else:
+            res = TraceableDict(self)
         res._update(other)
         return res
 
+    def __reduce_ex__(self, protocol):
+        """
+        Pickle the items of the traceable dict within its state, rather than as items set after the
+        object is created, so that the items and the attributes are restored together (see
+        __setstate__), under every pickle protocol and by copy.deepcopy.
+        A trace held by a trace store is pickled as a dict.
+        """
+        items = dict(self)
+        if isinstance(items[_trace_key], TraceStore):
+            items[_trace_key] = dict(items[_trace_key])
+        return copy_reg.__newobj__, (type(self), ), (items, self.__getstate__())
+
+    def __copy__(self):
+        """
+        Return a copy sharing the nested values of the traceable dict, which are copied on write
+        (like the result of |). The copy holds its trace in memory.
+        """
+        result = type(self)(self)
+        trace = dict(result[_trace_key])
+        if uncommitted in trace:
+            trace[uncommitted] = list(trace[uncommitted])
+        result[_trace_key] = trace
+        result._has_uncommitted_changes = self._has_uncommitted_changes
+        return result
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('_owned', None)
+        state.pop('_index', None)
+        state.pop('_paths', None)
+        state.pop('_history_totals', None)
+        return state
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            items, state = state
+            dict.update(self, items)
+        self.__dict__.update(state)
+        self._owned = None
+        self._index = None
+        self._history_totals = None
+        self._intern_paths()
+
+    def to_bytes(self, allow_pickle=False):
+        """
+        Serialize the traceable dict, including its history and its settings, in a compact
+        versioned binary format (see traceable_dict._binary): every distinct path of the trace is
+        stored once, revision numbers are stored as varints, and leaf values are stored with a type
+        tag. Leaves of other types than numbers, strings, None, lists, tuples and dicts raise
+        TypeError, unless allow_pickle is set, in which case they are pickled.
+        Unlike JSON, tuple paths and non-string keys round-trip unchanged.
+
+        Params:
+        -------
+            allow_pickle: bool,
+                   Whether leaves of other types are pickled.
+        Returns:
+        -------
+            data: str,
+                The serialized traceable dict.
+        """
+        return _binary.dumps(
+            self.as_dict(), self.revisions, self[_trace_key], self.get(_keyframes_key, {}), self._options(),
+            allow_pickle)
+
+    @classmethod
+    def from_bytes(cls, data, allow_pickle=False):
+        """
+        Load a traceable dict serialized by to_bytes.
+        The decoded parts are assembled directly, without the checks of the constructor.
+        The data may also be a buffer or a memory-mapped file, which is decoded in place, without
+        reading it into a string first.
+        Loading a pickled leaf runs arbitrary code, so data holding pickled leaves raises
+        ValueError, unless allow_pickle is set (only for data from a trusted source).
+
+        Params:
+        -------
+            data: str, buffer or mmap,
+                   The serialized traceable dict.
+            allow_pickle: bool,
+                   Whether pickled leaves are loaded.
+        Returns:
+        -------
+            TraceableDict object
+        """
+        tree, revisions, trace, keyframes, options, paths = _binary.loads(data, allow_pickle)
+
+        result = cls.__new__(cls)
+        dict.update(result, tree)
+        dict.__setitem__(result, _trace_key, trace)
+        dict.__setitem__(result, _revisions_key, RevisionList(revisions))
+        if keyframes:
+            dict.__setitem__(result, _keyframes_key, keyframes)
+
+        result._owned = None
+        result._index = None
+        result._history_totals = None
+        result._set_options(options)
+        result._paths = PathPool()
+        for path in paths:
+            result._paths.intern(path)
+        return result
+
+    def iter_jsonl(self, allow_pickle=False):
+        """
+        Export the traceable dict, including its history and its settings, as a stream of JSON
+        lines (see traceable_dict._jsonl): a header line with the working tree, the oldest revision
+        and the settings, followed by one line per later revision with its trace events, and a last
+        line with the uncommitted events, if any.
+        The lines are generated one revision at a time, so the events of a trace store are fetched
+        only while their line is written.
+        Paths are written as lists of keys, and tuples, non-string keys and values that JSON
+        cannot represent are written with a typed encoding, so they round-trip unchanged.
+        Values of other types than numbers, strings, None, lists, tuples and dicts raise TypeError,
+        unless allow_pickle is set, in which case they are pickled.
+
+        Example:
+            >>> from traceable_dict import TraceableDict
+            >>>
+            >>> D1 = TraceableDict({('x', 1): 'old_value'})
+            >>> D1.commit(revision=1)
+            >>> D1[('x', 1)] = 'new_value'
+            >>> D1.commit(revision=2)
+            >>>
+            >>> for line in D1.iter_jsonl():
+            ...     print line,
+            {"format": "traceable_dict", "keyframe": null, "options": {...}, "revision": 1, "tree": {"__dict__": [[{"__tuple__": ["x", 1]}, "new_value"]]}, "version": 1}
+            {"events": [[[{"__tuple__": ["x", 1]}], "old_value", "__u__"]], "keyframe": null, "revision": 2}
+
+        Params:
+        -------
+            allow_pickle: bool,
+                   Whether values of other types are pickled.
+        Returns:
+        -------
+            lines: generator,
+                The JSON lines, each ending with a newline.
+        """
+        trace = self[_trace_key]
+        keyframes = self.get(_keyframes_key, {})
+        revisions = self.revisions
+
+        base = revisions[0] if revisions else None
+        yield _jsonl.dump_header(base, self.as_dict(), keyframes.get(str(base)), self._options(), allow_pickle)
+
+        for revision in revisions[1:]:
+            key = str(revision)
+            yield _jsonl.dump_revision(revision, trace.get(key, []), keyframes.get(key), allow_pickle)
+
+        if uncommitted in trace:
+            yield _jsonl.dump_revision(None, trace[uncommitted], None, allow_pickle)
+
+    @classmethod
+    def from_jsonl(cls, lines, store=None, allow_pickle=False):
+        """
+        Import a traceable dict exported by iter_jsonl.
+        The lines are read one at a time, so with a trace store, the events of only one revision
+        are held in memory at any time.
+        Loading a pickled value runs arbitrary code, so a stream holding pickled values raises
+        ValueError, unless allow_pickle is set (only for streams from a trusted source).
+
+        Params:
+        -------
+            lines: iterable,
+                   The JSON lines (such as an open file).
+            store: TraceStore,
+                   An empty trace store to import the trace into (None to keep it in memory).
+            allow_pickle: bool,
+                   Whether pickled values are loaded.
+        Returns:
+        -------
+            TraceableDict object
+        """
+        lines = iter(lines)
+        header = next(lines, None)
+        if header is None:
+            raise ValueError("not a traceable dict JSON lines stream")
+        base, tree, keyframe, options = _jsonl.load_header(header, allow_pickle)
+
+        result = cls(tree)
+        if store is not None:
+            if len(store) > 0:
+                raise ValueError("cannot import into a non-empty trace store")
+            result.attach_store(store)
+
+        trace = result[_trace_key]
+        revisions = result.revisions
+        keyframes = {}
+        if base is not None:
+            revisions.append(base)
+            if keyframe is not None:
+                keyframes[str(base)] = keyframe
+
+        for line in lines:
+            if not line.strip():
+                continue
+            revision, events, keyframe = _jsonl.load_revision(line, allow_pickle)
+            events = result._paths.intern_events(events)
+            if options['compact_events']:
+                events = to_events(events)
+
+            if revision is None:
+                trace[uncommitted] = events
+                continue
+            if not revisions or revision <= revisions[-1]:
+                raise ValueError("revisions must be increasing")
+            revisions.append(revision)
+            if events:
+                trace[str(revision)] = events
+            if keyframe is not None:
+                keyframes[str(revision)] = keyframe
+
+        if keyframes:
+            result[_keyframes_key] = keyframes
+        result._index = None
+        result._set_options(options)
+        return result
+
     def commit(self, revision):
         """
         Commit the current changes into a new revision.
@@ -138,27 +496,56 @@ class TraceableDict(dict):
         if self.revisions and (revision <= self.revisions[-1]):
             raise ValueError("cannot commit to earlier revision")
 
-        if self.trace:
+        if uncommitted in self[_trace_key]:
             self[_trace_key][str(revision)] = self[_trace_key].pop(uncommitted)
+            index = self._indexed()
+            if index is not None:
+                index.rename(uncommitted, str(revision))
 
         self._has_uncommitted_changes = False
         self[_revisions_key].append(revision)
 
+        keyframe_due = self._is_keyframe_due()
+        if keyframe_due:
+            self[_keyframes_key] = self.get(_keyframes_key, {})
+            self[_keyframes_key][str(revision)] = copy.deepcopy(self.as_dict())
+
+        if self._history_totals is not None and len(self.revisions) > 1:
+            self._history_totals[0] += self._events_count(revision)
+            self._history_totals[1] += self._events_bytes(revision)
+            if keyframe_due:
+                self._history_totals[1] += self._keyframe_bytes(revision)
+
+        self._apply_retention()
+
     def revert(self):
         """
         Revert un-commited changes (performed in-place on the current object).
         """
         if self.revisions and self.has_uncommitted_changes:
-            result = self._checkout(self.revisions[-1])
-
+            events = self[_trace_key].pop(uncommitted, [])
+            index = self._indexed()
+            if index is not None:
+                index.remove(uncommitted)
+            if self._digests is not None:
+                for path, _, _ in events:
+                    self._digests.invalidate(path)
+
+            dict_ = copy.deepcopy(self.as_dict())
+            _replay(_undo, dict_, reversed(events))
+
+            trace, revisions, keyframes = self[_trace_key], self.revisions, self.get(_keyframes_key)
             super(TraceableDict, self).clear()
-            super(TraceableDict, self).__init__(result)
+            super(TraceableDict, self).__init__(dict_)
 
-            self[_trace_key] = result.trace
-            self[_revisions_key] = result.revisions
+            self[_trace_key] = trace
+            self[_revisions_key] = revisions
+            if keyframes:
+                self[_keyframes_key] = keyframes
             self._has_uncommitted_changes = False
+            self._owned = None
 
-    def checkout(self, revision):
+    def checkout(self, revision, shared=False, lazy=False):
         """
         Update dict to a specific stored revision.
             
@@ -166,15 +553,29 @@ class TraceableDict(dict):
         -------
             revision: int,
                    The revision number to update to.
+            shared: bool,
+                   If True, the result shares all unchanged subtrees (and the history) with this
+                   dictionary, and only the paths that differ between the two revisions are copied.
+                   Writes made through the result's tracked() view copy the paths they change, so
+                   they never affect this dictionary.
+            lazy: bool,
+                   If True, return a read-only view of the revision instead, which resolves the
+                   historical value of a key only when it is accessed.
         Returns:
         -------
-            TraceableDict object
+            TraceableDict object (or RevisionView object, if lazy)
         """
         if not self.revisions:
             raise Exception("no revisions available. you must commit an initial revision first.")
         if self._has_uncommitted_changes:
             raise Exception("dictionary has uncommitted changes. you must commit or revert first.")
-        return self._checkout(revision)
+        if lazy:
+            if type(revision) != int:
+                raise ValueError("revision must be an integer")
+            if revision not in self.revisions:
+                raise ValueError("unknown revision %s" % revision)
+            return RevisionView(self, revision)
+        return self._checkout(revision, shared=shared)
 
     def log(self, path):
         """
@@ -189,18 +590,52 @@ class TraceableDict(dict):
             result: dict, 
                 The log of dictionary values, per-revision.
         """
-        d_augmented = self._augment(path)
-
         result = {}
-        for revision in d_augmented.revisions:
-            value = d_augmented._checkout(revision=revision).as_dict()
-            value = value if value else {path[-1]: {}}
-
+        for revision, value in self.iter_log(path):
             result.update({revision: value})
             print 'changeset:   %s' % revision
             print 'value:       %s\n\n' % value
         return result
 
+    def iter_log(self, path):
+        """
+        Iterate over the commit logs over the different revisions, without displaying them.
+        The history of the path is walked once backward and once forward, so the values are
+        yielded one revision at a time.
+
+        Params:
+        -------
+            path: tuple,
+               The nested path inside the dictionary to follow.
+        Returns:
+        -------
+            generator of (revision, value) tuples, ordered by revision.
+        """
+        d_augmented = self._augment(path)
+        revisions = d_augmented.revisions
+        if not revisions:
+            return
+
+        value = copy.deepcopy(d_augmented.as_dict())
+        if d_augmented.has_uncommitted_changes:
+            for path_, value_before, type_ in reversed(d_augmented[_trace_key][uncommitted]):
+                _undo_copy[type_](value, path_, value_before)
+
+        redo_log = []
+        for revision in reversed(revisions[1:]):
+            redo = []
+            for path_, value_before, type_ in reversed(d_augmented[_trace_key][str(revision)]):
+                redo.append((path_, nested_getitem(value, path_), type_))
+                _undo_copy[type_](value, path_, value_before)
+            redo_log.append((revision, redo))
+
+        yield revisions[0], copy.deepcopy(value) if value else {path[-1]: {}}
+
+        for revision, redo in reversed(redo_log):
+            for path_, value_after, type_ in reversed(redo):
+                _redo[type_](value, path_, value_after)
+            yield revision, copy.deepcopy(value) if value else {path[-1]: {}}
+
     def diff(self, revision=None, path=None):
         """
         Show changes between revisions, or latest revision and working tree.
@@ -227,12 +662,12 @@ class TraceableDict(dict):
             if not d.has_uncommitted_changes:
                 return
             revision = uncommitted
-            events = d.trace[str(revision)]
+            events = d[_trace_key][str(revision)]
 
         else:
             if revision not in d.revisions:
                 raise ValueError("unknown revision %s" % revision)
-            events = d.trace[str(revision)]
+            events = d[_trace_key].get(str(revision), [])
             d = d._checkout(revision=revision)
 
         _diff_dict = {
@@ -243,14 +678,103 @@ class TraceableDict(dict):
 
         d_diff = copy.deepcopy(d.as_dict())
 
-        for event in events:
+        arrays = {}
+        for event in _fold_nested_events(events):
             _path, value_before, type_ = event
-            value = nested_getitem(d_diff, _path)
+            parent = nested_getitem(d_diff, _path[:-1])
+            if _path[:-1] in arrays or not isinstance(parent, dict):
+                # the changed entries of an array are shown by their index
+                if _path[:-1] not in arrays:
+                    arrays[_path[:-1]] = parent
+                    nested_setitem(d_diff, _path[:-1], {})
+                value = arrays[_path[:-1]][_path[-1]]
+            else:
+                value = nested_getitem(d_diff, _path)
 
             nested_setitem(d_diff, _path, _diff_dict[type_](value_before, value))
 
         return d_diff
 
+    def set_keyframe_policy(self, every_revisions=None, every_events=None):
+        """
+        Store a full snapshot of the dictionary (a keyframe) on commit, every given number of
+        revisions or of trace events since the last keyframe.
+        A checkout starts from the nearest keyframe at or after the requested revision, so it
+        only replays a bounded number of deltas.
+
+        Params:
+        -------
+            every_revisions: int,
+                   The number of committed revisions between keyframes (None to disable).
+            every_events: int,
+                   The number of trace events between keyframes (None to disable).
+        """
+        for every in [every_revisions, every_events]:
+            if every is not None and (type(every) != int or every <= 0):
+                raise ValueError("keyframe policy must be a positive integer or None")
+
+        self._keyframe_every_revisions = every_revisions
+        self._keyframe_every_events = every_events
+
+    def set_retention_policy(self, max_revisions=None, max_events=None, max_bytes=None, max_age=None):
+        """
+        Bound the history kept by the traceable dict. Whenever a limit is exceeded on commit, the
+        oldest revisions are evicted (see prune_before) until the history is within all limits.
+        The policy is enforced right away as well.
+
+        Params:
+        -------
+            max_revisions: int,
+                   The maximal number of stored revisions (None for no limit).
+            max_events: int,
+                   The maximal number of committed trace events (None for no limit).
+            max_bytes: int,
+                   The maximal approximate size of the committed trace events and of the keyframes,
+                   in bytes (None for no limit).
+            max_age: int,
+                   The maximal distance of the oldest stored revision from the latest one, in revision
+                   numbers (None for no limit).
+        """
+        limits = [max_revisions, max_events, max_bytes, max_age]
+        if all(limit is None for limit in limits):
+            self._retention = None
+            return
+
+        self._retention = RetentionPolicy(*limits)
+        self._apply_retention()
+
+    def add_keyframe(self, revision):
+        """
+        Store a full snapshot of the dictionary at a specific stored revision.
+
+        Params:
+        -------
+            revision: int,
+                   The revision number to snapshot.
+        """
+        snapshot = self._checkout(revision).as_dict()
+
+        self[_keyframes_key] = self.get(_keyframes_key, {})
+        self[_keyframes_key][str(revision)] = snapshot
+        self._history_totals = None
+
+    def drop_keyframe(self, revision):
+        """
+        Drop the stored snapshot of the dictionary at a specific revision.
+
+        Params:
+        -------
+            revision: int,
+                   The revision number of the keyframe to drop.
+        """
+        if str(revision) not in self.get(_keyframes_key, {}):
+            raise ValueError("no keyframe for revision %s" % revision)
+
+        self[_keyframes_key].pop(str(revision))
+        if not self[_keyframes_key]:
+            self.pop(_keyframes_key)
+        self._history_totals = None
+
     def remove_oldest_revision(self):
         """
         Removing the oldest revision of the traceable dict.
@@ -258,11 +782,238 @@ class TraceableDict(dict):
         if len(self.revisions) <= 1:
             return
 
-        self[_revisions_key].pop(0)
+        self.prune_before(self.revisions[1])
+
+    def prune_before(self, revision):
+        """
+        Remove all the revisions before a specific revision, which becomes the oldest revision.
+        The history is trimmed in a single pass, in time proportional to the removed trace events.
+
+        Params:
+        -------
+            revision: int,
+                   The oldest revision to keep.
+        """
+        if type(revision) != int:
+            raise ValueError("revision must be an integer")
+
+        count = self[_revisions_key].index(revision)
+        if count == 0:
+            return
+
+        removed = self[_revisions_key].trim_front(count)
+        totals = self._history_totals
+
+        index = self._indexed()
+        for revision_key in [str(removed_revision) for removed_revision in removed[1:]] + [str(revision)]:
+            if revision_key in self[_trace_key]:
+                if totals is not None:
+                    totals[0] -= self._events_count(revision_key)
+                    totals[1] -= self._events_bytes(revision_key)
+                del self[_trace_key][revision_key]
+                if index is not None:
+                    index.remove(revision_key)
+
+        keyframes = self.get(_keyframes_key, {})
+        for removed_revision in removed:
+            if totals is not None and str(removed_revision) in keyframes:
+                totals[1] -= self._keyframe_bytes(removed_revision)
+            keyframes.pop(str(removed_revision), None)
+        if _keyframes_key in self and not keyframes:
+            self.pop(_keyframes_key)
+
+    def keep_last(self, count):
+        """
+        Remove all but the latest revisions of the traceable dict.
+
+        Params:
+        -------
+            count: int,
+                   The number of latest revisions to keep.
+        """
+        if type(count) != int or count < 1:
+            raise ValueError("count must be a positive integer")
+
+        if len(self.revisions) > count:
+            self.prune_before(self.revisions[-count])
+
+    def squash(self, from_revision, to_revision):
+        """
+        Merge a range of revisions into its last revision, with a single net change per path.
+        Repeated updates of a path collapse into one update from the earliest old value, and a key
+        added and later removed within the range leaves no trace. The revisions before the last one
+        in the range can no longer be checked out.
+
+        Params:
+        -------
+            from_revision: int,
+                   The first revision in the range.
+            to_revision: int,
+                   The last revision in the range, which holds the merged changes.
+        """
+        for revision in [from_revision, to_revision]:
+            if type(revision) != int:
+                raise ValueError("revision must be an integer")
+            if revision not in self.revisions:
+                raise ValueError("unknown revision %s" % revision)
+        if from_revision >= to_revision:
+            raise ValueError("from_revision must be earlier than to_revision")
+
+        start = self.revisions.index(from_revision)
+        end = self.revisions.index(to_revision)
+        squashed = [str(revision) for revision in self.revisions[start:end + 1]]
+
+        events = []
+        if start > 0:
+            events = _net_events(itertools.chain.from_iterable(
+                self[_trace_key].get(revision, []) for revision in squashed))
+            if self._compact_events:
+                events = to_events(events)
+
+        index = self._indexed()
+        keyframes = self.get(_keyframes_key, {})
+        for revision in squashed:
+            if revision in self[_trace_key]:
+                del self[_trace_key][revision]
+            if index is not None:
+                index.remove(revision)
+            if revision != squashed[-1]:
+                keyframes.pop(revision, None)
+        if _keyframes_key in self and not keyframes:
+            self.pop(_keyframes_key)
+
+        if events:
+            self[_trace_key][squashed[-1]] = events
+            if index is not None:
+                index.add(squashed[-1], events)
+
+        del self[_revisions_key][start:end]
+        self._history_totals = None
+
+    def set_array_events(self, enabled=True):
+        """
+        Trace an array leaf (a NumPy array) replaced by an array of the same shape and dtype by the
+        changed entries only, each under the path of the array followed by the index of the entry,
+        instead of storing the whole old array. An array with more than half of its entries
+        changed is still traced as a whole.
+
+        Params:
+        -------
+            enabled: bool,
+                   Whether the changed entries of array leaves are traced.
+        """
+        self._array_events = enabled
+
+    def set_compact_events(self, enabled=True):
+        """
+        Store the trace events as compact Event records (see traceable_dict._event), with
+        small-int type codes, instead of (path, value, type) tuples. An Event unpacks and compares
+        exactly like the tuple it replaces. The events already in the trace are converted.
+
+        Params:
+        -------
+            enabled: bool,
+                   Whether the trace events are stored as Event records.
+        """
+        self._compact_events = enabled
+
+        convert = to_events if enabled else to_tuples
+        for key, events in self[_trace_key].items():
+            self[_trace_key][key] = convert(events)
+        self._history_totals = None
+
+    def attach_store(self, store):
+        """
+        Move the trace into an external trace store (see traceable_dict._store), such as a
+        SqliteTraceStore or a LogTraceStore, so that the events of the committed revisions are no
+        longer kept in memory.
+        The events of a revision are fetched from the store only when the revision is replayed, or
+        holds events under a path passed to log, diff or a lazy checkout. The number and the size of
+        the events of a revision are kept by the store, for retention policies and stats.
+        The result of | takes over the store, while other copies of the traceable dict (such as
+        copy.copy) hold their trace in memory. The result of checkout fetches the events of its
+        revisions from the store as well, and keeps the revisions committed to it in memory.
+
+        A traceable dict without a trace of its own (such as one restored from its working tree and
+        its revisions, after a restart) takes over the trace already held by the store.
+
+        Params:
+        -------
+            store: TraceStore,
+                   The trace store.
+        """
+        if not isinstance(store, TraceStore):
+            raise TypeError("store must be a TraceStore")
+
+        if len(store) > 0:
+            if self[_trace_key]:
+                raise ValueError("cannot attach a non-empty trace store to a traceable dict with a trace")
+            for key in store:
+                if key != uncommitted and (int(key) not in self.revisions or int(key) == self.revisions[0]):
+                    raise ValueError("trace store holds unknown revision %s" % key)
+        else:
+            for key, events in self[_trace_key].items():
+                store[key] = events
+
+        self[_trace_key] = store
+        self._index = None
+        self._history_totals = None
+        self._has_uncommitted_changes = (not self.revisions) or (uncommitted in store)
+
+    def detach_store(self):
+        """
+        Move the trace back from its external trace store into memory.
+        """
+        if isinstance(self[_trace_key], TraceStore):
+            self[_trace_key] = dict(self[_trace_key])
+            self._intern_paths()
+            self._history_totals = None
+
+    def enable_digests(self):
+        """
+        Keep a Merkle tree of content digests of the nested dicts, updated along the changed path
+        on every traced change. Two traceable dicts keeping digests are then compared by root_digest
+        in O(1), and DictDiff.find_diff(d1, d2, digests=(D1.digests, D2.digests)) descends only into
+        the branches that differ.
+        Only traced changes are seen, so nested dicts must not be changed in place other than
+        through tracked().
+        """
+        if self._digests is None:
+            self._digests = MerkleDigests(self, _keys)
+
+    def disable_digests(self):
+        """
+        Stop keeping the Merkle tree of content digests.
+        """
+        self._digests = None
+
+    def tracked(self):
+        """
+        Return a tracking view of the dictionary.
+        Nested dict values read through the view come back as tracking views too, so that
+        deep writes such as D.tracked()['a']['b'] = 1 are traced under their full path,
+        at a cost proportional to the depth of the path.
 
-        base_revision = str(self.revisions[0])
-        if base_revision in self.trace.keys():
-            self[_trace_key].pop(base_revision)
+        Returns:
+        -------
+            TrackedView object
+        """
+        return TrackedView(self)
+
+    def clear(self):
+        """
+        Remove all items, leaving the trace keys in place.
+        """
+        self._update({})
+
+    def popitem(self):
+        """
+        Remove and return an arbitrary (key, value) pair, leaving the trace keys in place.
+        """
+        for key in self.iterkeys():
+            if key not in _keys:
+                return key, self.pop(key)
+        raise KeyError('popitem(): dictionary is empty')
 
     def as_dict(self):
         """
@@ -271,6 +1022,28 @@ class TraceableDict(dict):
         frozen = dict(self)
         return dict((k, frozen[k]) for k in frozen if k not in _keys)
 
+    def stats(self):
+        """
+        Return statistics of the history stored in the traceable dict.
+
+        Returns:
+        -------
+            stats: dict,
+                   The number of stored revisions, of committed and of uncommitted trace events,
+                   the approximate size of the committed trace events and of the keyframes in bytes,
+                   the number of keyframes and the limits of the retention policy (None if there is
+                   no policy).
+        """
+        events, bytes_ = self._totals()
+        return {
+            'revisions': len(self.revisions),
+            'events': events,
+            'uncommitted_events': len(self[_trace_key].get(uncommitted, [])),
+            'bytes': bytes_,
+            'keyframes': len(self.get(_keyframes_key, {})),
+            'retention': self._retention.as_dict() if self._retention is not None else None
+        }
+
     @property
     def trace(self):
         return dict(self[_trace_key])
@@ -279,61 +1052,293 @@ class TraceableDict(dict):
     def revisions(self):
         return self[_revisions_key]
 
+    @property
+    def keyframes(self):
+        return sorted(int(revision) for revision in self.get(_keyframes_key, {}))
+
     @property
     def has_uncommitted_changes(self):
         return self._has_uncommitted_changes
 
+    @property
+    def digests(self):
+        return self._digests
+
+    @property
+    def root_digest(self):
+        digests = self._digests if self._digests is not None else MerkleDigests(self, _keys)
+        return digests.digest()
+
     def update_trace(self, trace):
+        if self._digests is not None:
+            for path, _, _ in trace:
+                self._digests.invalidate(path)
+
         if not self.revisions:
             return
 
-        self[_trace_key].setdefault(uncommitted, [])
-        self[_trace_key][uncommitted].extend(trace)
+        trace = self._paths.intern_events(trace)
+
+        events = self[_trace_key].setdefault(uncommitted, [])
+        start = len(events)
+        events.extend(to_events(trace) if self._compact_events else trace)
         self._has_uncommitted_changes = True
 
+        index = self._indexed()
+        if index is not None:
+            index.add(uncommitted, events, start)
+
+    def _options(self):
+        return {
+            'uncommitted': self._has_uncommitted_changes,
+            'compact_events': self._compact_events,
+            'array_events': self._array_events,
+            'digests': self._digests is not None,
+            'keyframe_every_revisions': self._keyframe_every_revisions,
+            'keyframe_every_events': self._keyframe_every_events,
+            'retention': self._retention.limits() if self._retention is not None else None
+        }
+
+    def _set_options(self, options):
+        self._array_events = options['array_events']
+        self._has_uncommitted_changes = options['uncommitted']
+        self._keyframe_every_revisions = options['keyframe_every_revisions']
+        self._keyframe_every_events = options['keyframe_every_events']
+        self._retention = RetentionPolicy(*options['retention']) if options['retention'] else None
+        self._digests = MerkleDigests(self, _keys) if options['digests'] else None
+        self._compact_events = options['compact_events']
+
+    def _snapshot(self, keys=None):
+        if keys is None:
+            return self.as_dict()
+        return dict((k, dict.__getitem__(self, k)) for k in keys if k in self and k not in _keys)
+
+    def _writable(self, path):
+        if self._owned is None:
+            d = self
+            for k in path[1:]:
+                d = d[k]
+            return d
+        return PathCopier(self, self._owned).writable(path, create=False)
+
     def _update(self, other):
-        trace = self.trace
+        trace = self[_trace_key]
+        if not isinstance(trace, TraceStore):
+            trace = dict(trace)
+        if uncommitted in trace:
+            trace[uncommitted] = list(trace[uncommitted])
         revisions = self.revisions
+        keyframes = self.get(_keyframes_key)
         super(TraceableDict, self).clear()
         super(TraceableDict, self).__init__(other)
         self[_trace_key] = trace
         self[_revisions_key] = revisions
+        if keyframes:
+            self[_keyframes_key] = dict(keyframes)
+        else:
+            super(TraceableDict, self).pop(_keyframes_key, None)
 
-    def _checkout(self, revision):
-        if type(revision) != int:
-            raise ValueError("revision must be an integer")
+    def _intern_paths(self):
+        self._paths = PathPool()
+        self._history_totals = None
+        if isinstance(self[_trace_key], TraceStore):
+            return
+        for key, events in self[_trace_key].items():
+            self[_trace_key][key] = self._paths.intern_events(events)
+
+    def _indexed(self):
+        if self._index is None or self._index[0] is not self[_trace_key]:
+            return None
+        return self._index[1]
+
+    def _trace_index(self):
+        if isinstance(self[_trace_key], TraceStore):
+            return self[_trace_key]
+
+        index = self._indexed()
+        if index is None:
+            index = TraceIndex()
+            for key, events in self[_trace_key].iteritems():
+                index.add(key, events)
+            self._index = (self[_trace_key], index)
+        return index
+
+    def _path_events(self, revision, path, keyframe=None):
+        found = self._trace_index().find(path[1:])
+
+        revisions = sorted(
+            (int(key) for key in found
+             if key != uncommitted and int(key) > revision and (keyframe is None or int(key) <= keyframe)),
+            reverse=True)
+        keys = [str(revision_) for revision_ in revisions]
+        if keyframe is None and self.has_uncommitted_changes and uncommitted in found:
+            keys.insert(0, uncommitted)
+
+        for key in keys:
+            events = self[_trace_key][key]
+            for offset in reversed(found[key]):
+                yield events[offset]
+
+    def _is_keyframe_due(self):
+        if self._keyframe_every_revisions is None and self._keyframe_every_events is None:
+            return False
+
+        keyframes = self.get(_keyframes_key, {})
+
+        revisions_since, events_since = 0, 0
+        for i in xrange(len(self.revisions) - 1, 0, -1):
+            revision = self.revisions[i]
+            if str(revision) in keyframes:
+                break
+            revisions_since += 1
+            events_since += self._events_count(revision)
+
+        if self._keyframe_every_revisions is not None and revisions_since >= self._keyframe_every_revisions:
+            return True
+        return self._keyframe_every_events is not None and events_since >= self._keyframe_every_events
+
+    def _events_count(self, revision):
+        if isinstance(self[_trace_key], TraceStore):
+            return self[_trace_key].events_count(str(revision))
+        return len(self[_trace_key].get(str(revision), []))
+
+    def _events_bytes(self, revision):
+        if isinstance(self[_trace_key], TraceStore):
+            return self[_trace_key].events_size(str(revision))
+        return approximate_size(self[_trace_key].get(str(revision), []))
+
+    def _keyframe_bytes(self, revision):
+        return approximate_size(self.get(_keyframes_key, {}).get(str(revision), {}))
+
+    def _totals(self):
+        # the number and the size of the committed events, plus the size of the keyframes, kept up
+        # to date on commit and prune (and recounted after other changes of the history)
+        if self._history_totals is None:
+            revisions = self.revisions[1:]
+            self._history_totals = [
+                sum(self._events_count(revision) for revision in revisions),
+                sum(self._events_bytes(revision) for revision in revisions) +
+                sum(self._keyframe_bytes(revision) for revision in self.get(_keyframes_key, {}))]
+        return self._history_totals
+
+    def _apply_retention(self):
+        if self._retention is None:
+            return
+
+        totals = None
+        if self._retention.max_events is not None or self._retention.max_bytes is not None:
+            totals = self._totals()
+        oldest = self._retention.oldest_kept(
+            self.revisions, self._events_count, self._events_bytes, self._keyframe_bytes, totals)
+        if oldest is not None and oldest != self.revisions[0]:
+            self.prune_before(oldest)
+
+    def _nearest_keyframe(self, revision):
+        keyframes = RevisionList(sorted(
+            int(revision_) for revision_ in self.get(_keyframes_key, {})
+            if int(revision_) in self.revisions))
+        return keyframes.ceiling(revision)
+
+    def _replay_source(self, revision):
+        position = self.revisions.index(revision)
+        later_revisions = self.revisions[position + 1:]
+
+        keyframe = self._nearest_keyframe(revision)
+        if keyframe is not None:
+            base = self[_keyframes_key][str(keyframe)]
+            later_revisions = self.revisions[position + 1:self.revisions.index(keyframe) + 1]
+            events_lists = []
+        else:
+            base = self.as_dict()
+            events_lists = [self[_trace_key][uncommitted]] if self.has_uncommitted_changes else []
+
+        events_lists += [self[_trace_key].get(str(revision_), []) for revision_ in reversed(later_revisions)]
+        return base, itertools.chain.from_iterable(reversed(events) for events in events_lists)
+
+    def _value_at(self, revision, path):
         if revision not in self.revisions:
             raise ValueError("unknown revision %s" % revision)
 
-        revisions = list(self.revisions)
-        trace = copy.deepcopy(self.trace)
-        dict_ = copy.deepcopy(self.as_dict())
+        keyframe = self._nearest_keyframe(revision)
+        if keyframe is not None:
+            base = self[_keyframes_key][str(keyframe)]
+        else:
+            base = self._snapshot(keys=path[1:2])
 
-        _update_dict = {
-            key_added: lambda d, k, v: nested_pop(d, k),
-            key_removed: lambda d, k, v: nested_setitem(d, k, v),
-            key_updated: lambda d, k, v: nested_setitem(d, k, v)
-        }
+        value = base
+        for k in path[1:]:
+            if not isinstance(value, dict) or k not in value:
+                value = {}
+                break
+            value = value[k]
+        else:
+            value = {path[-1]: copy.deepcopy(value)}
 
-        if self.has_uncommitted_changes:
-            _uncommitted = self.trace[uncommitted]
-            [_update_dict[type_](dict_, path, value) for path, value, type_ in _uncommitted]
-            trace.pop(uncommitted)
+        depth = len(path)
+        for _path, value_before, type_ in self._path_events(revision, path, keyframe):
+            _undo[type_](value, (root, path[-1]) + _path[depth:], copy.deepcopy(value_before))
 
-        for revision_ in reversed(self.revisions):
-            if revision_ <= revision:
-                break
+        if path[-1] not in value:
+            raise KeyError(path[-1])
+        return value[path[-1]]
+
+    def _checkout(self, revision, shared=False):
+        if type(revision) != int:
+            raise ValueError("revision must be an integer")
+        if revision not in self.revisions:
+            raise ValueError("unknown revision %s" % revision)
 
-            events = self.trace[str(revision_)]
-            [_update_dict[type_](dict_, path, value) for path, value, type_ in events]
+        position = self.revisions.index(revision)
+        revisions = RevisionList(self.revisions[:position + 1])
 
-            trace.pop(str(revision_))
-            revisions.remove(revision_)
+        if isinstance(self[_trace_key], TraceStore):
+            trace = OverlayTraceStore(self[_trace_key], [
+                key for key in self[_trace_key] if key != uncommitted and revisions[0] < int(key) <= revision])
+        else:
+            trace = {}
+            for revision_ in revisions[1:]:
+                events = self[_trace_key].get(str(revision_))
+                if events is not None:
+                    trace[str(revision_)] = events
+
+        keyframes = dict(self.get(_keyframes_key, {}))
+        for revision_ in self.revisions[position + 1:]:
+            keyframes.pop(str(revision_), None)
+
+        base, events = self._replay_source(revision)
+
+        if shared:
+            editor = PathCopier(dict(base))
+            dict_ = editor.root
+            _update_dict = {
+                key_added: lambda d, k, v: editor.pop(k),
+                key_removed: lambda d, k, v: editor.setitem(k, v),
+                key_updated: lambda d, k, v: editor.setitem(k, v)
+            }
+        else:
+            if not isinstance(trace, TraceStore):
+                trace = copy.deepcopy(trace)
+            dict_ = copy.deepcopy(base)
+            _update_dict = _undo_copy
+
+        _replay(_update_dict, dict_, events)
 
         result = TraceableDict(dict_)
         result[_trace_key] = trace
         result[_revisions_key] = revisions
+        if keyframes:
+            result[_keyframes_key] = keyframes
         result._has_uncommitted_changes = False
+        result._keyframe_every_revisions = self._keyframe_every_revisions
+        result._keyframe_every_events = self._keyframe_every_events
+        result._retention = self._retention
+        result._array_events = self._array_events
+        result._compact_events = self._compact_events
+        result._paths = self._paths
+        if shared:
+            editor.owned.pop(id(dict_))
+            result._owned = editor.owned
+            self._owned = {}
         return result
 
     def _augment(self, path):
@@ -343,32 +1348,30 @@ class TraceableDict(dict):
             raise ValueError("path cannot be empty")
 
         trace_aug = {}
+        revisions_aug = []
 
         if self.revisions:
-            base_value = self._checkout(self.revisions[0])
-            is_path_in_base_revision = nested_getitem(base_value, path) != {}
-            revisions_aug = [self.revisions[0]] if is_path_in_base_revision else []
-        else:
-            revisions_aug = []
-
-        for revision in self.trace.keys():
-            events_aug = []
-            for event in self.trace[str(revision)]:
-                _path, value, type_ = event
-
-                if path == _path[1: len(path) + 1]:
-                    path_aug = (root, ) + tuple(_path[len(path):])
-                    events_aug.append((path_aug, value, type_))
-
-            if events_aug:
-                trace_aug[str(revision)] = events_aug
-                if revision != uncommitted:
-                    revisions_aug.append(int(revision))
+            try:
+                base_value = self._value_at(self.revisions[0], (root, ) + path)
+                is_path_in_base_revision = not isinstance(base_value, dict) or len(base_value) > 0
+            except KeyError:
+                is_path_in_base_revision = False
+            if is_path_in_base_revision:
+                revisions_aug.append(self.revisions[0])
+
+        for revision, offsets in self._trace_index().find(path).iteritems():
+            events = self[_trace_key][revision]
+            events_aug = trace_aug[revision] = []
+            for i in offsets:
+                _path, value, type_ = events[i]
+                events_aug.append(((root, ) + tuple(_path[len(path):]), value, type_))
+            if revision != uncommitted:
+                revisions_aug.append(int(revision))
 
         result = TraceableDict({path[-1]: nested_getitem(self, path)})
         result[_trace_key] = trace_aug
         result._has_uncommitted_changes = (uncommitted in trace_aug.keys())
-        result[_revisions_key] = sorted(revisions_aug)
+        result[_revisions_key] = RevisionList(sorted(revisions_aug))
         return result
 
 __all__ += ['TraceableDict']
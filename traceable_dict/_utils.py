@@ -90,7 +90,7 @@ def nested_getitem(d, nested_k):
     for k in nested_k:
         if k == root:
             continue
-        d = d.get(k, {})
+        d = d.get(k, {}) if isinstance(d, dict) else d[k]
 
     return d
 
@@ -0,0 +1,179 @@
+import collections
+
+from _diff import DictDiff
+from _utils import root
+
+__all__ = []
+
+
+class TrackedView(collections.MutableMapping):
+    """
+    A lightweight tracking proxy over a nested dict inside a traceable dict.
+    Writes made through the view are recorded into the trace of the traceable dict
+    right away, under their full nested path, at a cost proportional to the depth
+    of the path (and not to the size of the whole dict).
+
+    Nested dict values read through the view are returned as tracking views as well.
+
+    Example:
+
+        >>> from traceable_dict import TraceableDict
+        >>>
+        >>> D1 = TraceableDict({'a': {'b': 0}})
+        >>> D1.commit(revision=1)
+        >>>
+        >>> D1.tracked()['a']['b'] = 1
+        >>> D1.trace
+        {'_uncommitted_': [(('_root_', 'a', 'b'), 0, '__u__')]}
+        >>> D1.as_dict()
+        {'a': {'b': 1}}
+
+    """
+
+    __slots__ = ('_owner', '_path')
+
+    def __init__(self, owner, path=(root, )):
+        self._owner = owner
+        self._path = tuple(path)
+
+    def __getitem__(self, key):
+        if self._is_root:
+            snapshot = self._owner._snapshot([key])
+            if key not in snapshot:
+                raise KeyError(key)
+            value = snapshot[key]
+        else:
+            value = self._target()[key]
+
+        if isinstance(value, dict):
+            return TrackedView(self._owner, self._path + (key, ))
+        return value
+
+    def __setitem__(self, key, value):
+        if self._is_root:
+            self._owner[key] = value
+            return
+
+        d = self._owner._writable(self._path)
+        before = {key: d[key]} if key in d else {}
+        d[key] = value
+        self._record(before, {key: value})
+
+    def __delitem__(self, key):
+        if self._is_root:
+            if key not in self._owner._snapshot([key]):
+                raise KeyError(key)
+            del self._owner[key]
+            return
+
+        d = self._owner._writable(self._path)
+        before = {key: d[key]}
+        del d[key]
+        self._record(before, {})
+
+    def __iter__(self):
+        if self._is_root:
+            return iter(self._owner.as_dict())
+        return iter(self._target())
+
+    def __len__(self):
+        if self._is_root:
+            return len(self._owner.as_dict())
+        return len(self._target())
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+    @property
+    def path(self):
+        return self._path
+
+    def as_dict(self):
+        """
+        Return the nested dict this view is tracking.
+        """
+        if self._is_root:
+            return self._owner.as_dict()
+        return self._target()
+
+    @property
+    def _is_root(self):
+        return len(self._path) == 1
+
+    def _target(self):
+        d = self._owner
+        for k in self._path[1:]:
+            d = d[k]
+        return d
+
+    def _record(self, before, after):
+        trace = DictDiff.find_diff(before, after, list(self._path), array_events=self._owner._array_events)
+        if len(trace) > 0:
+            self._owner.update_trace(trace)
+
+
+__all__ += ['TrackedView']
+
+
+class RevisionView(collections.Mapping):
+    """
+    A lazy, read-only view of a stored revision of a traceable dict.
+    Nothing is materialized when the view is created. When a key is accessed, its historical value
+    is resolved from the current value of the key plus only the trace events under its path.
+
+    Example:
+
+        >>> from traceable_dict import TraceableDict
+        >>>
+        >>> D1 = TraceableDict({'a': 'old_value', 'b': {'c': 1}})
+        >>> D1.commit(revision=1)
+        >>> D1['a'] = 'new_value'
+        >>> D1.commit(revision=2)
+        >>>
+        >>> view = D1.checkout(revision=1, lazy=True)
+        >>> view['a']
+        'old_value'
+        >>> view['b']
+        {'c': 1}
+
+    """
+
+    __slots__ = ('_owner', '_revision')
+
+    def __init__(self, owner, revision):
+        self._owner = owner
+        self._revision = revision
+
+    def __getitem__(self, key):
+        return self._owner._value_at(self._revision, (root, key))
+
+    def __iter__(self):
+        base, events = self._owner._replay_source(self._revision)
+
+        keys = set(base)
+        touched = set(path[1] for path, _, _ in events)
+        for key in touched:
+            if key in self:
+                keys.add(key)
+            else:
+                keys.discard(key)
+        return iter(keys)
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+    @property
+    def revision(self):
+        return self._revision
+
+    def as_dict(self):
+        """
+        Return the full dict represntation of the revision.
+        """
+        return dict((k, self[k]) for k in self)
+
+
+__all__ += ['RevisionView']